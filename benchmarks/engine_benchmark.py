@@ -0,0 +1,107 @@
+"""Compare the execution engines on the example programs.
+
+Each program is run through the full pipeline with every engine. The best
+wall time over the repetitions is reported with the speedup relative to the
+tree-walking interpreter, and the output and exit code of every engine are
+checked against the tree-walking result. Memory is not compared, because
+pointer values are distinct objects in every run.
+
+Usage:
+
+    PYTHONPATH=src python3 benchmarks/engine_benchmark.py [--repeat N] [program.pas ...]
+"""
+import argparse
+import io
+import sys
+import time
+from pathlib import Path
+
+from pascal_interpreter.engines import ENGINES, DEFAULT_ENGINE
+from pascal_interpreter.pascal import run_program
+
+
+ROOT = Path(__file__).resolve().parents[1]
+EXAMPLES_DIR = ROOT / "examples"
+
+# example programs that run to completion without reading standard input
+DEFAULT_PROGRAMS = [
+    "First1000Primes.pas",
+    "arraytest.pas",
+    "chrExample.pas",
+    "count.pas",
+    "diag.pas",
+    "factorial.pas",
+    "hello.pas",
+    "PascalConstants.pas",
+    "realformatting.pas",
+]
+
+
+def time_program(source, engine, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        original_stdin = sys.stdin
+        sys.stdin = io.StringIO("")
+        try:
+            start = time.perf_counter()
+            result = run_program(source, engine=engine)
+            elapsed = time.perf_counter() - start
+        finally:
+            sys.stdin = original_stdin
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Pascal execution engines")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per program and engine; the best time is kept")
+    parser.add_argument("--engine", action="append", choices=sorted(ENGINES), help="engine to measure (default: all)")
+    parser.add_argument("programs", nargs="*", help="Pascal programs to run (default: the examples)")
+    args = parser.parse_args(argv)
+
+    engines = args.engine or list(ENGINES)
+    if DEFAULT_ENGINE not in engines:
+        engines.insert(0, DEFAULT_ENGINE)
+    programs = [Path(name) for name in args.programs] or [EXAMPLES_DIR / name for name in DEFAULT_PROGRAMS]
+
+    header = f"{'program':<24}" + "".join(f"{engine:>12}" for engine in engines)
+    header += "".join(f"{engine + ' x':>12}" for engine in engines if engine != DEFAULT_ENGINE)
+    print(header)
+
+    totals = {engine: 0.0 for engine in engines}
+    mismatches = []
+    for program in programs:
+        source = program.read_text()
+        timings = {}
+        results = {}
+        for engine in engines:
+            timings[engine], results[engine] = time_program(source, engine, args.repeat)
+            totals[engine] += timings[engine]
+        for engine in engines:
+            if results[engine][1:] != results[DEFAULT_ENGINE][1:]:
+                mismatches.append((program.name, engine))
+
+        row = f"{program.name:<24}" + "".join(f"{timings[engine]:>11.4f}s" for engine in engines)
+        row += "".join(
+            f"{timings[DEFAULT_ENGINE] / timings[engine]:>11.2f}x"
+            for engine in engines
+            if engine != DEFAULT_ENGINE
+        )
+        print(row)
+
+    row = f"{'total':<24}" + "".join(f"{totals[engine]:>11.4f}s" for engine in engines)
+    row += "".join(
+        f"{totals[DEFAULT_ENGINE] / totals[engine]:>11.2f}x"
+        for engine in engines
+        if engine != DEFAULT_ENGINE
+    )
+    print(row)
+
+    for name, engine in mismatches:
+        print(f"MISMATCH: {engine} result differs from {DEFAULT_ENGINE} for {name}", file=sys.stderr)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Measure the memory taken by the token list and the AST of a large program.
+
+A program of the requested number of statement lines is generated, tokenized
+into a list and parsed. tracemalloc reports the memory allocated for the
+tokens and for everything the parser and the semantic analyzer keep, and the
+average footprint of a token and of an AST node is printed alongside the
+counts.
+
+Usage:
+
+    PYTHONPATH=src python3 benchmarks/memory_benchmark.py [--lines N]
+"""
+import argparse
+import gc
+import tracemalloc
+
+from pascal_interpreter.pascal_ast import count_nodes
+from pascal_interpreter.parser import Parser
+from pascal_interpreter.semantic_analyzer import SemanticAnalyzer
+from pascal_interpreter.tokenizer import Tokenizer
+
+
+def generate_program(lines):
+    """A program of roughly `lines` statement lines over a few variables, in the style of generated code."""
+    statements = []
+    for number in range(lines):
+        statements.append(
+            f"  total := (total + {number}) * 3 DIV 7; "
+            f"IF total >= limit THEN count := count - 1 ELSE name := 'line {number}';"
+        )
+    return "\n".join([
+        "PROGRAM Generated;",
+        "VAR total, count, limit: INTEGER; name: STRING;",
+        "BEGIN",
+        "  limit := 100; total := 0; count := 0;",
+        *statements,
+        "END.",
+        "",
+    ])
+
+
+def measure(source):
+    gc.collect()
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    tokens = Tokenizer(source).get_tokens()
+    token_bytes = tracemalloc.get_traced_memory()[0] - start
+
+    tree = Parser(tokens).parse()
+    SemanticAnalyzer(tree).analyze()
+    token_count = len(tokens)
+    del tokens
+    gc.collect()
+    tree_bytes = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    return token_count, token_bytes, count_nodes(tree), tree_bytes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure token and AST memory on a generated program")
+    parser.add_argument("--lines", type=int, default=5000, help="statement lines in the generated program")
+    args = parser.parse_args(argv)
+
+    source = generate_program(args.lines)
+    token_count, token_bytes, node_count, tree_bytes = measure(source)
+
+    print(f"{'source lines':<24}{args.lines + 6:>12}")
+    print(f"{'tokens':<24}{token_count:>12}")
+    print(f"{'token list bytes':<24}{token_bytes:>12}")
+    print(f"{'bytes per token':<24}{token_bytes / token_count:>12.1f}")
+    print(f"{'AST nodes':<24}{node_count:>12}")
+    print(f"{'AST bytes':<24}{tree_bytes:>12}")
+    print(f"{'bytes per node':<24}{tree_bytes / node_count:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,25 @@
+program Ackermann;
+
+var
+  calls : Integer;
+  answer : Integer;
+  trial : Integer;
+
+function ack(m : Integer; n : Integer) : Integer;
+begin
+  calls := calls + 1;
+  if m = 0 then
+    ack := n + 1
+  else if n = 0 then
+    ack := ack(m - 1, 1)
+  else
+    ack := ack(m - 1, ack(m, n - 1));
+end;
+
+begin
+  calls := 0;
+  for trial := 1 to 20 do
+    answer := ack(2, 30);
+  writeln(answer);
+  writeln(calls);
+end.
@@ -0,0 +1,33 @@
+program BubbleSort;
+
+const
+  size = 300;
+
+var
+  data : array[1..size] of Integer;
+  i : Integer;
+  j : Integer;
+  swap : Integer;
+  seed : Integer;
+  checksum : Integer;
+
+begin
+  seed := 12345;
+  for i := 1 to size do
+  begin
+    seed := (seed * 1103 + 12345) mod 32768;
+    data[i] := seed;
+  end;
+  for i := 1 to size - 1 do
+    for j := 1 to size - i do
+      if data[j] > data[j + 1] then
+      begin
+        swap := data[j];
+        data[j] := data[j + 1];
+        data[j + 1] := swap;
+      end;
+  checksum := 0;
+  for i := 1 to size do
+    checksum := (checksum * 31 + data[i]) mod 1000003;
+  writeln(data[1], ' ', data[size], ' ', checksum);
+end.
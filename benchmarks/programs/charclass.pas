@@ -0,0 +1,35 @@
+program CharClass;
+
+var
+  i : Integer;
+  c : Char;
+  letters : Integer;
+  digits : Integer;
+  vowels : Integer;
+  others : Integer;
+  seen : set of Char;
+
+begin
+  letters := 0;
+  digits := 0;
+  vowels := 0;
+  others := 0;
+  seen := [];
+  for i := 1 to 50000 do
+  begin
+    c := chr(32 + (i * 37) mod 95);
+    if c in ['a'..'z', 'A'..'Z'] then
+    begin
+      letters := letters + 1;
+      if c in ['a', 'e', 'i', 'o', 'u', 'A', 'E', 'I', 'O', 'U'] then
+        vowels := vowels + 1;
+    end
+    else if c in ['0'..'9'] then
+      digits := digits + 1
+    else
+      others := others + 1;
+    if i mod 1000 = 0 then
+      seen := seen + [c];
+  end;
+  writeln(letters, ' ', vowels, ' ', digits, ' ', others);
+end.
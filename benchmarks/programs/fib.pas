@@ -0,0 +1,21 @@
+program Fib;
+
+var
+  calls : Integer;
+  answer : Integer;
+
+function fib(n : Integer) : Integer;
+begin
+  calls := calls + 1;
+  if n < 2 then
+    fib := n
+  else
+    fib := fib(n - 1) + fib(n - 2);
+end;
+
+begin
+  calls := 0;
+  answer := fib(18);
+  writeln(answer);
+  writeln(calls);
+end.
@@ -0,0 +1,50 @@
+program FileIO;
+
+const
+  lines = 3000;
+
+var
+  text_file : Text;
+  numbers : file of Integer;
+  name : String;
+  i : Integer;
+  value : Integer;
+  total : Integer;
+  count : Integer;
+
+begin
+  assign(text_file, 'fileio_benchmark.txt');
+  rewrite(text_file);
+  for i := 1 to lines do
+    writeln(text_file, 'row', i mod 10, ' ', i * 3);
+  close(text_file);
+
+  total := 0;
+  count := 0;
+  reset(text_file);
+  while not eof(text_file) do
+  begin
+    readln(text_file, name, value);
+    total := total + value;
+    count := count + 1;
+  end;
+  close(text_file);
+
+  assign(numbers, 'fileio_benchmark.dat');
+  rewrite(numbers);
+  for i := 1 to lines do
+    write(numbers, i mod 97);
+  close(numbers);
+
+  reset(numbers);
+  while not eof(numbers) do
+  begin
+    read(numbers, value);
+    total := total + value;
+  end;
+  close(numbers);
+
+  erase(text_file);
+  erase(numbers);
+  writeln(count, ' ', total);
+end.
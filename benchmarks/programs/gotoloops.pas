@@ -0,0 +1,43 @@
+program GotoLoops;
+
+label 1, 2, 3, 4, 5;
+
+var
+  i, j, n : Integer;
+  total : Integer;
+
+begin
+  { nested counting loops written with labels and conditional GOTOs }
+  total := 0;
+  i := 0;
+1:
+  i := i + 1;
+  j := 0;
+2:
+  j := j + 1;
+  if (i + j) mod 3 = 0 then
+    goto 3;
+  total := total + j;
+3:
+  if j < 100 then
+    goto 2;
+  if i < 300 then
+    goto 1;
+
+  { leaving a WHILE loop with a GOTO }
+  n := 0;
+4:
+  n := n + 1;
+  i := 0;
+  while True do
+  begin
+    i := i + 1;
+    if i >= 50 then
+      goto 5;
+    total := total + 1
+  end;
+5:
+  if n < 200 then
+    goto 4;
+  writeln(total)
+end.
@@ -0,0 +1,59 @@
+program LinkedList;
+
+const
+  size = 4000;
+
+type
+  NodePtr = ^Node;
+  Node = record
+    value : Integer;
+    next : NodePtr;
+  end;
+
+var
+  head : NodePtr;
+  current : NodePtr;
+  previous : NodePtr;
+  following : NodePtr;
+  i : Integer;
+  pass : Integer;
+  sum : Integer;
+  count : Integer;
+
+begin
+  sum := 0;
+  for pass := 1 to 3 do
+  begin
+    head := nil;
+    for i := 1 to size do
+    begin
+      new(current);
+      current^.value := (i * 7 + pass) mod 1000;
+      current^.next := head;
+      head := current;
+    end;
+
+    previous := nil;
+    current := head;
+    while current <> nil do
+    begin
+      following := current^.next;
+      current^.next := previous;
+      previous := current;
+      current := following;
+    end;
+    head := previous;
+
+    count := 0;
+    current := head;
+    while current <> nil do
+    begin
+      sum := sum + current^.value;
+      count := count + 1;
+      following := current^.next;
+      dispose(current);
+      current := following;
+    end;
+  end;
+  writeln(count, ' ', sum);
+end.
@@ -0,0 +1,33 @@
+program MatMul;
+
+const
+  n = 60;
+
+var
+  a : array[1..n, 1..n] of Integer;
+  b : array[1..n, 1..n] of Integer;
+  c : array[1..n, 1..n] of Integer;
+  i, j, k : Integer;
+  sum : Integer;
+  trace : Integer;
+
+begin
+  for i := 1 to n do
+    for j := 1 to n do
+    begin
+      a[i, j] := (i + j) mod 7;
+      b[i, j] := (i * j + i) mod 5;
+    end;
+  for i := 1 to n do
+    for j := 1 to n do
+    begin
+      sum := 0;
+      for k := 1 to n do
+        sum := sum + a[i, k] * b[k, j];
+      c[i, j] := sum;
+    end;
+  trace := 0;
+  for i := 1 to n do
+    trace := trace + c[i, i];
+  writeln(trace, ' ', c[1, n], ' ', c[n, 1]);
+end.
@@ -0,0 +1,57 @@
+program Records;
+
+const
+  n = 250;
+
+type
+  EmployeePtr = ^Employee;
+  Employee = record
+    id : Integer;
+    salary : Integer;
+    bonus : Integer;
+  end;
+
+var
+  staff : array[1..n] of EmployeePtr;
+  moving : EmployeePtr;
+  current : EmployeePtr;
+  i : Integer;
+  j : Integer;
+  payroll : Integer;
+
+begin
+  for i := 1 to n do
+  begin
+    new(current);
+    current^.id := i;
+    current^.salary := 1000 + (i * 7919) mod 5000;
+    current^.bonus := 0;
+    staff[i] := current;
+  end;
+
+  for i := 2 to n do
+  begin
+    moving := staff[i];
+    j := i - 1;
+    current := staff[j];
+    while (j > 0) and (current^.salary > moving^.salary) do
+    begin
+      staff[j + 1] := current;
+      j := j - 1;
+      if j > 0 then
+        current := staff[j];
+    end;
+    staff[j + 1] := moving;
+  end;
+
+  payroll := 0;
+  for i := 1 to n do
+  begin
+    current := staff[i];
+    current^.bonus := current^.salary div 10 + i;
+    payroll := payroll + current^.salary + current^.bonus;
+  end;
+  current := staff[1];
+  moving := staff[n];
+  writeln(current^.id, ' ', moving^.id, ' ', payroll);
+end.
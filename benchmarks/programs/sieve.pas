@@ -0,0 +1,32 @@
+program Sieve;
+
+const
+  limit = 20000;
+
+var
+  composite : array[2..limit] of Boolean;
+  i : Integer;
+  multiple : Integer;
+  count : Integer;
+  pass : Integer;
+
+begin
+  for pass := 1 to 3 do
+  begin
+    for i := 2 to limit do
+      composite[i] := false;
+    count := 0;
+    for i := 2 to limit do
+      if not composite[i] then
+      begin
+        count := count + 1;
+        multiple := i + i;
+        while multiple <= limit do
+        begin
+          composite[multiple] := true;
+          multiple := multiple + i;
+        end;
+      end;
+  end;
+  writeln(count);
+end.
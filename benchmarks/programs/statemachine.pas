@@ -0,0 +1,44 @@
+program StateMachine;
+
+var
+  i : Integer;
+  state : Integer;
+  total : Integer;
+  c : Char;
+
+begin
+  total := 0;
+  state := 0;
+  for i := 1 to 50000 do
+  begin
+    state := (state * 7 + i) mod 40;
+    case state of
+      0: total := total + 1;
+      1, 2: total := total + 2;
+      3: total := total + 3;
+      4: total := total + 4;
+      5: total := total + 5;
+      6: total := total + 6;
+      7: total := total + 7;
+      8: total := total + 8;
+      9, 10, 11: total := total + 9;
+      12: total := total + 12;
+      13: total := total + 13;
+      14: total := total + 14;
+      15..19: total := total + 15;
+      20..24: total := total - 1;
+      25: total := total + 25;
+      26..30: total := total + 26;
+      31: total := total + 31
+    else
+      total := total - 2
+    end;
+    c := chr(ord('a') + state mod 26);
+    case c of
+      'a'..'e': total := total + 1;
+      'f', 'g': total := total + 2;
+      'x'..'z': total := total + 3
+    end
+  end;
+  writeln(total);
+end.
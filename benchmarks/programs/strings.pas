@@ -0,0 +1,34 @@
+program Strings;
+
+const
+  rounds = 300;
+
+var
+  line : String;
+  word : String;
+  i : Integer;
+  pass : Integer;
+  found : Integer;
+  total : Integer;
+
+begin
+  total := 0;
+  for pass := 1 to rounds do
+  begin
+    line := '';
+    for i := 1 to 20 do
+    begin
+      word := chr(ord('a') + (pass + i) mod 26);
+      line := concat(line, word, '-', word);
+    end;
+    insert('<start>', line, 1);
+    insert('<middle>', line, length(line) div 2);
+    found := pos('<middle>', line);
+    delete(line, found, 8);
+    delete(line, 1, 7);
+    while pos('-', line) > 0 do
+      delete(line, pos('-', line), 1);
+    total := total + length(line) + length(copy(line, 5, 10));
+  end;
+  writeln(total, ' ', line);
+end.
@@ -0,0 +1,145 @@
+"""Time the benchmark programs and compare the times with a stored baseline.
+
+Every program is compiled and run --warmup times untimed, then --repeat times
+timed, with each selected engine. The median, best, and mean of the front end
+(compile) and of the run are reported. A run writes its files to a temporary
+directory and reads empty standard input.
+
+With --output the results are written as JSON. With --baseline they are
+compared with a results file written earlier: a program whose median compile
+or run time grew by more than --threshold (a fraction, 0.10 is 10%) over the
+baseline is a regression, and the exit status is 1.
+
+Usage:
+
+    PYTHONPATH=src python3 benchmarks/regression_benchmark.py [--engine NAME ...] [--warmup N] [--repeat N]
+        [--output results.json] [--baseline baseline.json] [--threshold 0.10] [program.pas ...]
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from pascal_interpreter.engines import ENGINES, DEFAULT_ENGINE
+from pascal_interpreter.pascal import compile_program
+
+
+ROOT = Path(__file__).resolve().parents[1]
+PROGRAMS_DIR = ROOT / "benchmarks" / "programs"
+
+# the times compared with the baseline
+MEASURES = ("compile", "run")
+
+
+def summarize(times):
+    return {
+        "median": statistics.median(times),
+        "best": min(times),
+        "mean": statistics.fmean(times),
+    }
+
+
+def measure(source, engine, warmup, repeat):
+    """Compile and run source warmup + repeat times and summarize the timed ones; None if a run failed."""
+    compile_times = []
+    run_times = []
+    for index in range(warmup + repeat):
+        with tempfile.TemporaryDirectory() as files_dir:
+            start = time.perf_counter()
+            compiled = compile_program(source, engine=engine)
+            compiled_at = time.perf_counter()
+            (_, _, exitcode) = compiled.run(stdin="", files_dir=files_dir)
+            finished = time.perf_counter()
+        if exitcode != 0:
+            return None
+        if index >= warmup:
+            compile_times.append(compiled_at - start)
+            run_times.append(finished - compiled_at)
+    return {"compile": summarize(compile_times), "run": summarize(run_times)}
+
+
+def by_program(report):
+    """The entries of a results report keyed by (program, engine)."""
+    return {(entry["program"], entry["engine"]): entry for entry in report["results"]}
+
+
+def compare(results, previous, threshold):
+    """The (program, engine, measure, baseline median, median) of every time that regressed."""
+    regressions = []
+    for entry in results:
+        before = previous.get((entry["program"], entry["engine"]))
+        if before is None:
+            continue
+        for name in MEASURES:
+            old, new = before[name]["median"], entry[name]["median"]
+            if new > old * (1 + threshold):
+                regressions.append((entry["program"], entry["engine"], name, old, new))
+    return regressions
+
+
+def change(entry, before, name):
+    if before is None:
+        return f"{'-':>9}"
+    return f"{100 * (entry[name]['median'] / before[name]['median'] - 1):>+8.1f}%"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the benchmark programs and compare them with a baseline")
+    parser.add_argument("--engine", action="append", choices=sorted(ENGINES),
+                        help=f"engine to measure, repeatable (default: {DEFAULT_ENGINE})")
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per program and engine")
+    parser.add_argument("--repeat", type=int, default=5, help="timed runs per program and engine")
+    parser.add_argument("--output", metavar="FILE", help="write the results to FILE as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare with the results stored in FILE")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="fraction a median may grow over the baseline before it is a regression")
+    parser.add_argument("programs", nargs="*", help="Pascal programs to run (default: benchmarks/programs)")
+    args = parser.parse_args(argv)
+
+    engines = args.engine or [DEFAULT_ENGINE]
+    programs = [Path(name) for name in args.programs] or sorted(PROGRAMS_DIR.glob("*.pas"))
+    previous = by_program(json.loads(Path(args.baseline).read_text())) if args.baseline else {}
+
+    print(f"{'program':<20}{'engine':<10}{'compile':>12}{'run':>12}{'compile +/-':>12}{'run +/-':>12}")
+    results = []
+    failures = []
+    for program in programs:
+        source = program.read_text()
+        for engine in engines:
+            measured = measure(source, engine, args.warmup, args.repeat)
+            if measured is None:
+                failures.append((program.name, engine))
+                continue
+            entry = {"program": program.name, "engine": engine, **measured}
+            results.append(entry)
+            before = previous.get((program.name, engine))
+            print(
+                f"{program.name:<20}{engine:<10}"
+                f"{entry['compile']['median']:>11.4f}s{entry['run']['median']:>11.4f}s"
+                f"   {change(entry, before, 'compile')}   {change(entry, before, 'run')}"
+            )
+
+    if args.output:
+        report = {
+            "python": platform.python_version(),
+            "warmup": args.warmup,
+            "repeat": args.repeat,
+            "results": results,
+        }
+        Path(args.output).write_text(json.dumps(report, indent=2) + "\n")
+
+    regressions = compare(results, previous, args.threshold)
+    for name, engine in failures:
+        print(f"FAILED: {name} did not run to completion with {engine}", file=sys.stderr)
+    for name, engine, measure_name, old, new in regressions:
+        print(f"REGRESSION: {name} {engine} {measure_name} median {old:.4f}s -> {new:.4f}s "
+              f"(threshold {100 * args.threshold:.0f}%)", file=sys.stderr)
+    return 1 if failures or regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
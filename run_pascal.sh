@@ -5,7 +5,7 @@ ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 export PYTHONPATH="${ROOT_DIR}/src${PYTHONPATH:+:${PYTHONPATH}}"
 
 if [[ $# -lt 1 ]]; then
-    echo "Usage: $0 [--debug] [--verbose] [--trace-tokens] [--trace-source] [--trace-all] path/to/program.pas" >&2
+    echo "Usage: $0 [--debug] [--verbose] [--trace-tokens] [--trace-source] [--trace-all] [--engine ENGINE] path/to/program.pas" >&2
     exit 2
 fi
 
@@ -4,29 +4,46 @@ set -euo pipefail
 ROOT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 export PYTHONPATH="${ROOT_DIR}/src:${ROOT_DIR}${PYTHONPATH:+:${PYTHONPATH}}"
 
-VERBOSE=0
-if [[ "${1:-}" == "--verbose" ]]; then
-    VERBOSE=1
-    export PASCAL_TEST_VERBOSE=1
-    shift
-fi
-
-if [[ $# -ne 0 ]]; then
-    echo "Usage: $0 [--verbose]" >&2
+usage() {
+    echo "Usage: $0 [--verbose] [--jobs N] [--slowest N]" >&2
     exit 2
-fi
+}
+
+VERBOSE=0
+JOBS=0
+SLOWEST=0
+while [[ $# -gt 0 ]]; do
+    case "$1" in
+        --verbose)
+            VERBOSE=1
+            export PASCAL_TEST_VERBOSE=1
+            shift
+            ;;
+        --jobs|--slowest)
+            [[ $# -ge 2 && "$2" =~ ^[0-9]+$ ]] || usage
+            if [[ "$1" == "--jobs" ]]; then JOBS="$2"; else SLOWEST="$2"; fi
+            shift 2
+            ;;
+        *)
+            usage
+            ;;
+    esac
+done
 
 cd "${ROOT_DIR}"
 
-python3 - "${VERBOSE}" <<'PY'
+python3 - "${VERBOSE}" "${JOBS}" "${SLOWEST}" <<'PY'
 import sys
+import time
 import unittest
 from pathlib import Path
 
 from test.test_expression import ExpressionTestCase
-from test.test_program import ProgramTestCase
+from test.test_program import ProgramTestCase, ClosureProgramTestCase, VMProgramTestCase, TranspiledProgramTestCase
 from test.test_statement import StatementTestCase
 from test.test_cli import CLITestCase
+from test.test_compiled_program import CompiledProgramTestCase
+from test.fixture_pool import run_parallel
 
 
 ROOT = Path.cwd()
@@ -35,7 +52,11 @@ TEST_GROUPS = (
     ("Expressions", ExpressionTestCase),
     ("Statements", StatementTestCase),
     ("Programs", ProgramTestCase),
+    ("Programs (closure)", ClosureProgramTestCase),
+    ("Programs (vm)", VMProgramTestCase),
+    ("Programs (python)", TranspiledProgramTestCase),
     ("CLI", CLITestCase),
+    ("API", CompiledProgramTestCase),
 )
 
 
@@ -57,7 +78,7 @@ def add_statement_tests(test_suite):
             test_suite.addTest(test_case)
 
 
-def add_program_tests(test_suite):
+def add_program_tests(test_suite, test_class=ProgramTestCase):
     test_directory = TEST_FILES_DIR / "programs"
     for testfile in sorted(test_directory.iterdir()):
         if testfile.suffix != ".pas":
@@ -65,7 +86,7 @@ def add_program_tests(test_suite):
 
         expectfile = testfile.with_suffix(".exp")
         if expectfile.is_file():
-            test_case = ProgramTestCase()
+            test_case = test_class()
             test_case.set_testfile(str(testfile))
             test_suite.addTest(test_case)
 
@@ -74,6 +95,56 @@ def add_cli_tests(test_suite):
     test_suite.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(CLITestCase))
 
 
+def add_api_tests(test_suite):
+    test_suite.addTests(unittest.defaultTestLoader.loadTestsFromTestCase(CompiledProgramTestCase))
+
+
+class TimedTextTestResult(unittest.TextTestResult):
+    """Records how long each test took, for the --slowest report."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.seconds = {}
+
+    def startTest(self, test):
+        self.started = time.perf_counter()
+        super().startTest(test)
+
+    def stopTest(self, test):
+        super().stopTest(test)
+        self.seconds[id(test)] = time.perf_counter() - self.started
+
+
+def test_name(test):
+    testfile = getattr(test, "testfile", None)
+    if testfile is None:
+        return test.id()
+    path = Path(testfile)
+    return str(path.relative_to(ROOT)) if path.is_relative_to(ROOT) else testfile
+
+
+def run_in_pool(tests, jobs, verbose):
+    """Run tests across jobs worker processes, reporting like TextTestRunner; returns (failed tests, seconds per test)."""
+    start = time.perf_counter()
+    outcomes = run_parallel(tests, jobs)
+    elapsed = time.perf_counter() - start
+
+    failed = []
+    for test, (passed, _, reports) in zip(tests, outcomes):
+        if verbose:
+            print(f"{test_name(test)} ... {'ok' if passed else 'FAIL'}", file=sys.stderr)
+        if not passed:
+            failed.append(test)
+            for report in reports:
+                print("=" * 70, file=sys.stderr)
+                print(report, file=sys.stderr)
+    print("-" * 70, file=sys.stderr)
+    print(f"Ran {len(tests)} tests in {elapsed:.3f}s across {jobs} processes", file=sys.stderr)
+    print(file=sys.stderr)
+    print(f"FAILED (failures={len(failed)})" if failed else "OK", file=sys.stderr)
+    return failed, [seconds for _, seconds, _ in outcomes]
+
+
 def iter_tests(test_suite):
     for test in test_suite:
         if isinstance(test, unittest.TestSuite):
@@ -86,28 +157,44 @@ suite = unittest.TestSuite()
 add_expression_tests(suite)
 add_statement_tests(suite)
 add_program_tests(suite)
+add_program_tests(suite, ClosureProgramTestCase)
+add_program_tests(suite, VMProgramTestCase)
+add_program_tests(suite, TranspiledProgramTestCase)
 add_cli_tests(suite)
+add_api_tests(suite)
 
+# the runner releases finished tests from the suite, so keep our own list
+tests = list(iter_tests(suite))
 totals = {test_class: 0 for _, test_class in TEST_GROUPS}
-for test in iter_tests(suite):
+for test in tests:
     totals[type(test)] += 1
 
 verbose = sys.argv[1] == "1"
-runner = unittest.TextTestRunner(verbosity=2 if verbose else 1)
-result = runner.run(suite)
+jobs = int(sys.argv[2])
+slowest = int(sys.argv[3])
 
 def test_key(test):
-    return getattr(test, "testfile", test.id())
-
-
-failed_test_keys = {
-    test_key(test)
-    for test, _ in (
-        result.failures
-        + result.errors
-        + result.unexpectedSuccesses
-    )
-}
+    return (type(test), getattr(test, "testfile", test.id()))
+
+
+if jobs:
+    # each test runs in its own temporary directory with empty stdin, in one of jobs processes
+    (failed_tests, seconds) = run_in_pool(tests, jobs, verbose)
+    failed_test_keys = {test_key(test) for test in failed_tests}
+    successful = not failed_tests
+else:
+    runner = unittest.TextTestRunner(verbosity=2 if verbose else 1, resultclass=TimedTextTestResult)
+    result = runner.run(suite)
+    failed_test_keys = {
+        test_key(test)
+        for test, _ in (
+            result.failures
+            + result.errors
+            + result.unexpectedSuccesses
+        )
+    }
+    successful = result.wasSuccessful()
+    seconds = [result.seconds.get(id(test), 0.0) for test in tests]
 
 print()
 print("Test summary:")
@@ -117,8 +204,8 @@ for label, test_class in TEST_GROUPS:
     total = totals[test_class]
     failed = sum(
         1
-        for test in iter_tests(suite)
-        if isinstance(test, test_class) and test_key(test) in failed_test_keys
+        for test in tests
+        if type(test) is test_class and test_key(test) in failed_test_keys
     )
     passed = total - failed
     combined_total += total
@@ -128,6 +215,13 @@ for label, test_class in TEST_GROUPS:
 combined_passed = combined_total - combined_failed
 print(f"  Combined: {combined_passed} passed, {combined_failed} failed, {combined_total} total")
 
-if not result.wasSuccessful():
+if slowest:
+    labels = {test_class: label for label, test_class in TEST_GROUPS}
+    print()
+    print(f"Slowest {min(slowest, len(tests))} tests:")
+    for test_seconds, test in sorted(zip(seconds, tests), key=lambda pair: -pair[0])[:slowest]:
+        print(f"  {test_seconds:8.3f}s  {labels[type(test)]}: {test_name(test)}")
+
+if not successful:
     raise SystemExit(1)
 PY
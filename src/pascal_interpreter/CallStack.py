@@ -1,16 +1,34 @@
 class CallStack:
     def __init__(self):
         self._records = []
+        # the display: the innermost live activation record at each nesting
+        # level, with the entry each push shadowed so pop can restore it
+        self._display = [None]
+        self._shadowed = []
 
     def push(self, ar):
+        level = ar.nesting_level
+        display = self._display
+        if level >= len(display):
+            display.extend([None] * (level + 1 - len(display)))
+        self._shadowed.append(display[level])
+        display[level] = ar
         self._records.append(ar)
 
     def pop(self):
-        return self._records.pop()
+        ar = self._records.pop()
+        self._display[ar.nesting_level] = self._shadowed.pop()
+        return ar
+
+    def __len__(self):
+        return len(self._records)
 
     def peek(self):
         return self._records[-1]
 
+    def frame(self, nesting_level):
+        return self._display[nesting_level]
+
     def __str__(self):
         s = '\n'.join(repr(ar) for ar in reversed(self._records))
         s = f'CALL STACK\n{s}\n'
@@ -18,5 +36,3 @@ class CallStack:
 
     def __repr__(self):
         return self.__str__()
-
-    
\ No newline at end of file
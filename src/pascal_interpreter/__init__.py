@@ -1 +1,3 @@
 """Pascal interpreter package."""
+
+__version__ = "0.1.0"
@@ -1,5 +1,7 @@
 from enum import Enum
 
+from .data_type import DataType
+
 
 class ARType(Enum):
     PROGRAM = 'PROGRAM'
@@ -8,103 +10,171 @@ class ARType(Enum):
 
 
 class Reference:
-    def __init__(self, ar, name):
+    __slots__ = ('ar', 'slot')
+
+    def __init__(self, ar, slot):
         self.ar = ar
-        self.name = name
+        self.slot = slot
 
     def get(self):
-        return self.ar.get(self.name)
+        return self.ar.slots[self.slot]
 
     def set(self, value):
-        self.ar.assign_existing(self.name, value)
+        self.ar.store(self.slot, value)
+
+
+# data types whose variables start with a fresh value on every activation
+STRUCTURED_TYPES = [DataType.ARRAY, DataType.RECORD, DataType.SET, DataType.FILE, DataType.TEXT]
+
+
+class FrameLayout:
+    """The slots of every activation record of one program or routine.
+
+    The semantic analyzer builds one layout per routine: parameters first, then the
+    function result, then the local variables. A call copies template and gives each
+    slot listed in fresh a new array, record, set or file value."""
+    __slots__ = ('names', 'index', 'types', 'bounds', 'template', 'fresh')
+
+    def __init__(self):
+        self.names = []
+        self.index = {}
+        self.types = []
+        self.bounds = []
+        self.template = []
+        self.fresh = []
+
+    def add(self, name, data_type=None, bounds=None, type_node=None):
+        slot = len(self.names)
+        self.names.append(name)
+        self.index[name] = slot
+        self.types.append(data_type)
+        self.bounds.append(bounds)
+        self.template.append(None)
+        if type_node is not None and data_type is not None and data_type in STRUCTURED_TYPES:
+            self.fresh.append((slot, type_node))
+        return slot
+
+    def __len__(self):
+        return len(self.names)
 
 
 class ActivationRecord:
-    def __init__(self, name, ar_type, nesting_level, parent_ar=None):
+    __slots__ = ('name', 'ar_type', 'nesting_level', 'parent_ar', 'layout', 'slots')
+
+    def __init__(self, name, ar_type, nesting_level, parent_ar=None, layout=None):
         self.name = name
         self.ar_type = ar_type
         self.nesting_level = nesting_level
         self.parent_ar = parent_ar
-        self.members = {}
-        self.member_types = {}
-        self.member_bounds = {}
+        # a record without a shared layout grows its own as members are added
+        self.layout = layout if layout is not None else FrameLayout()
+        self.slots = self.layout.template.copy()
+
+    @property
+    def members(self):
+        return dict(zip(self.layout.names, self.slots))
+
+    @property
+    def member_types(self):
+        return {
+            name: data_type
+            for name, data_type in zip(self.layout.names, self.layout.types)
+            if data_type is not None
+        }
+
+    @property
+    def member_bounds(self):
+        return {
+            name: bounds
+            for name, bounds in zip(self.layout.names, self.layout.bounds)
+            if bounds is not None
+        }
 
     def __setitem__(self, key, value):
-        self.members[key] = value
+        self.slots[self.layout.index[key]] = value
 
     def __getitem__(self, key):
-        value = self.members[key]
+        return self.load(self.layout.index[key])
+
+    def load(self, slot):
+        value = self.slots[slot]
         if isinstance(value, Reference):
-            return value.get()
+            return value.ar.slots[value.slot]
         return value
 
-    def set_new(self, var_name, var_value, data_type=None, bounds=None):
-        self.members[var_name] = var_value
-        if data_type is not None:
-            self.member_types[var_name] = data_type
-        if bounds is not None:
-            self.member_bounds[var_name] = bounds
+    def store(self, slot, value):
+        bounds = self.layout.bounds[slot]
+        if bounds is not None and (value < bounds[0] or value > bounds[1]):
+            self.bounds_error(value, bounds)
+        current_value = self.slots[slot]
+        if isinstance(current_value, Reference):
+            current_value.set(value)
+        else:
+            self.slots[slot] = value
 
-    def set_reference(self, var_name, target_ar, target_name, data_type=None):
-        target_value = target_ar.members[target_name]
+    def bind_reference(self, slot, target_ar, target_slot):
+        target_value = target_ar.slots[target_slot]
         if isinstance(target_value, Reference):
-            self.members[var_name] = target_value
+            self.slots[slot] = target_value
         else:
-            self.members[var_name] = Reference(target_ar, target_name)
-        if data_type is not None:
-            self.member_types[var_name] = data_type
+            self.slots[slot] = Reference(target_ar, target_slot)
+
+    def set_new(self, var_name, var_value, data_type=None, bounds=None):
+        slot = self.layout.index.get(var_name)
+        if slot is None:
+            self.layout.add(var_name, data_type, bounds)
+            self.slots.append(var_value)
+        else:
+            self.slots[slot] = var_value
+
+    def set_reference(self, var_name, target_ar, target_name, data_type=None):
+        slot = self.layout.index.get(var_name)
+        if slot is None:
+            slot = self.layout.add(var_name, data_type)
+            self.slots.append(None)
+        self.bind_reference(slot, target_ar, target_ar.layout.index[target_name])
 
     def assign_existing(self, var_name, new_value):
-        ar = self
-        while ar is not None:
-            if ar.contains(var_name) is True:
-                ar.check_bounds(var_name, new_value)
-                current_value = ar.members[var_name]
-                if isinstance(current_value, Reference):
-                    current_value.set(new_value)
-                else:
-                    ar[var_name] = new_value
-                return
-            ar = ar.parent_ar
+        ar = self.find_record_containing(var_name)
+        if ar is not None:
+            ar.store(ar.layout.index[var_name], new_value)
 
     def check_bounds(self, var_name, value):
-        if var_name not in self.member_bounds:
+        slot = self.layout.index.get(var_name)
+        if slot is None:
             return
-        lower, upper = self.member_bounds[var_name]
-        if value < lower or value > upper:
-            from .error_code import ErrorCode, PascalRuntimeError
-            raise PascalRuntimeError(
-                error_code=ErrorCode.RUNTIME_ERROR,
-                message=f"Value {value} outside bounds {lower}..{upper}",
-            )
+        bounds = self.layout.bounds[slot]
+        if bounds is not None and (value < bounds[0] or value > bounds[1]):
+            self.bounds_error(value, bounds)
+
+    def bounds_error(self, value, bounds):
+        from .error_code import ErrorCode, PascalRuntimeError
+        lower, upper = bounds
+        raise PascalRuntimeError(
+            error_code=ErrorCode.RUNTIME_ERROR,
+            message=f"Value {value} outside bounds {lower}..{upper}",
+        )
 
     def get(self, key):
-        ar = self
-        while ar is not None:
-            if ar.contains(key) is True:
-                value = ar.members.get(key)
-                if isinstance(value, Reference):
-                    return value.get()
-                return value
-            ar = ar.parent_ar
+        ar = self.find_record_containing(key)
+        if ar is not None:
+            return ar.load(ar.layout.index[key])
 
     def find_record_containing(self, key):
         ar = self
         while ar is not None:
-            if ar.contains(key):
+            if key in ar.layout.index:
                 return ar
             ar = ar.parent_ar
         return None
 
     def get_type(self, key):
-        ar = self
-        while ar is not None:
-            if key in ar.member_types:
-                return ar.member_types[key]
-            ar = ar.parent_ar
+        ar = self.find_record_containing(key)
+        if ar is not None:
+            return ar.layout.types[ar.layout.index[key]]
 
     def contains(self, key):
-        return key in self.members
+        return key in self.layout.index
 
     def __str__(self):
         lines = [
@@ -114,7 +184,7 @@ class ActivationRecord:
                 name=self.name,
             )
         ]
-        for name, val in self.members.items():
+        for name, val in zip(self.layout.names, self.slots):
             if isinstance(val, Reference):
                 val = val.get()
             lines.append(f'    {name:<20}: {val}')
@@ -0,0 +1,573 @@
+from array import array
+from enum import IntEnum
+
+from .activation_record import ARType
+from .interpreter import PascalSet
+from .pascal_ast import NodeVisitor, Program, LabelStatement, Ident, IndexedVariable, \
+    FieldVariable, DereferenceVariable, Constant, constant_value
+from .symbol import BuiltinFunctionSymbol, BuiltinProcedureSymbol
+from .token_type import TokenType
+
+
+class Op(IntEnum):
+    # hot instructions first; the virtual machine tests them in this order
+    LOAD_VAR = 0
+    LOAD_CONST = 1
+    STORE_VAR = 2
+    JUMP_IF_FALSE = 3
+    JUMP = 4
+    TICK = 5
+    ADD = 6
+    SUB = 7
+    MUL = 8
+    EQ = 9
+    NE = 10
+    LT = 11
+    LE = 12
+    GT = 13
+    GE = 14
+    AND = 15
+    OR = 16
+    INTEGER_DIV = 17
+    MOD = 18
+    REAL_DIV = 19
+    IN = 20
+    NEG = 21
+    POS = 22
+    NOT = 23
+    LOAD_INDEX = 24
+    STORE_INDEX = 25
+    FOR_TEST = 26
+    FOR_STEP = 27
+    CALL = 28
+    RETURN = 29
+    BUILTIN_FUNCTION = 30
+    WRITE = 31
+    LOAD_FIELD = 32
+    STORE_FIELD = 33
+    LOAD_DEREF = 34
+    STORE_DEREF = 35
+    CASE = 36
+    GOTO = 37
+    # cold instructions dispatched through the handler table
+    POP = 38
+    SWAP = 39
+    STATEMENT = 40
+    BUILD_SET = 41
+    RAISE_GOTO = 42
+    READ_BEGIN = 43
+    READ_IS_FILE = 44
+    READ_FILE_SOURCE = 45
+    READ_VALUE = 46
+    READ_END = 47
+    FILE_METHOD = 48
+    NEW_POINTER = 49
+    DISPOSE = 50
+    DELETE_STRING = 51
+    INSERT_STRING = 52
+    VAL_CONVERT = 53
+    STR = 54
+    ENTER_PROGRAM = 55
+    HALT = 56
+
+
+BINARY_OPS = {
+    TokenType.PLUS: Op.ADD,
+    TokenType.MINUS: Op.SUB,
+    TokenType.MUL: Op.MUL,
+    TokenType.REAL_DIV: Op.REAL_DIV,
+    TokenType.INTEGER_DIV: Op.INTEGER_DIV,
+    TokenType.MOD: Op.MOD,
+    TokenType.IN: Op.IN,
+    TokenType.EQUAL: Op.EQ,
+    TokenType.NOT_EQUAL: Op.NE,
+    TokenType.GREATER: Op.GT,
+    TokenType.GREATER_EQUAL: Op.GE,
+    TokenType.LESS: Op.LT,
+    TokenType.LESS_EQUAL: Op.LE,
+    TokenType.AND: Op.AND,
+    TokenType.OR: Op.OR,
+}
+
+UNARY_OPS = {
+    TokenType.PLUS: Op.POS,
+    TokenType.MINUS: Op.NEG,
+    TokenType.NOT: Op.NOT,
+}
+
+FILE_METHODS = {
+    "ASSIGN": "assign",
+    "RESET": "reset",
+    "REWRITE": "rewrite",
+    "APPEND": "append",
+    "CLOSE": "close",
+    "ERASE": "erase",
+    "RENAME": "rename",
+    "FLUSH": "flush",
+}
+
+
+class Routine:
+    """A compiled procedure or function; entry is the address of its first instruction."""
+    def __init__(self, symbol, ar_type):
+        self.symbol = symbol
+        self.name = symbol.name
+        self.ar_type = ar_type
+        self.scope_level = symbol.scope_level
+        self.nesting_level = symbol.scope_level + 1
+        self.layout = symbol.frame_layout
+        self.result_slot = symbol.result_slot if ar_type == ARType.FUNCTION else None
+        self.entry = None
+
+
+class CallSite:
+    """Operand of a CALL instruction.
+
+    value_slots lists the frame slot of every by-value parameter, whose arguments have
+    already been pushed on the stack in order; references lists (slot, nesting level,
+    target slot) for every VAR parameter and the variable it aliases."""
+    def __init__(self, routine, value_slots, references):
+        self.routine = routine
+        self.value_slots = value_slots
+        self.references = references
+        self.value_count = len(value_slots)
+
+
+class CodeObject:
+    """Flat bytecode: one opcode per instruction in ops and its operand at the same index in args.
+
+    label_scopes holds a LabelScope for every compound statement with labels, with the address range
+    of its code, so a GOTO out of a routine can find the compound that handles its label."""
+    def __init__(self):
+        self.ops = array('B')
+        self.args = []
+        self.label_scopes = []
+
+    def __len__(self):
+        return len(self.ops)
+
+    def label_scope(self, address, label):
+        """The innermost label scope whose code holds address and that has label, or None."""
+        found = None
+        for scope in self.label_scopes:
+            if scope.start <= address < scope.end and label in scope.addresses:
+                if found is None or scope.start > found.start:
+                    found = scope
+        return found
+
+    def disassemble(self):
+        lines = []
+        for address, (op, arg) in enumerate(zip(self.ops, self.args)):
+            operand = '' if arg is None else repr(arg)
+            lines.append(f'{address:5} {Op(op).name:<18} {operand}')
+        return '\n'.join(lines)
+
+
+class LabelScope:
+    """The labels of a compound statement being compiled; loop_depth counts the FOR values its routine
+    has on the operand stack while the compound runs, and start and end bound the compound's code."""
+    def __init__(self, labels, loop_depth):
+        self.labels = labels
+        self.loop_depth = loop_depth
+        self.addresses = {}
+        self.fixups = []
+        self.start = None
+        self.end = None
+
+
+def build_set(ranges, values):
+    """The PascalSet for a BUILD_SET operand: one flag per element saying whether
+    it is a range, which takes two of values, or a single member, which takes one."""
+    result = PascalSet()
+    position = 0
+    for is_range in ranges:
+        if is_range:
+            result.include_range(values[position], values[position + 1])
+            position += 2
+        else:
+            result.include(values[position])
+            position += 1
+    return result
+
+
+class BytecodeCompiler(NodeVisitor):
+    """BytecodeCompiler - lowers an analyzed Program into a flat CodeObject for the VirtualMachine.
+
+        Expressions leave exactly one value on the operand stack and statements leave the stack as they
+        found it, except that a FOR loop keeps its final value on the stack while the loop runs."""
+
+    def __init__(self, tree: Program, *, statement_hooks=False, count_steps=False):
+        self.tree = tree
+        self.statement_hooks = statement_hooks
+        # emit TICK at loop iterations, calls and GOTOs for the engine's execution limits
+        self.count_steps = count_steps
+        self.code = CodeObject()
+        self.routines = {}
+        self.pending_routines = []
+        self.label_scopes = []
+        self.loop_depth = 0
+
+    def compile(self):
+        self.visit(self.tree)
+        while self.pending_routines:
+            self.compile_routine(self.pending_routines.pop())
+        return self.code
+
+    def emit(self, op, arg=None):
+        self.code.ops.append(op)
+        self.code.args.append(arg)
+        return len(self.code.ops) - 1
+
+    def tick(self, call=False):
+        if self.count_steps:
+            self.emit(Op.TICK, call)
+
+    def here(self):
+        return len(self.code.ops)
+
+    def patch(self, address, target):
+        self.code.args[address] = target
+
+    def statement_hook(self, node):
+        if self.statement_hooks:
+            self.emit(Op.STATEMENT, node)
+
+    def routine(self, symbol, ar_type):
+        routine = self.routines.get(id(symbol))
+        if routine is None:
+            routine = Routine(symbol, ar_type)
+            self.routines[id(symbol)] = routine
+            self.pending_routines.append(routine)
+        return routine
+
+    def compile_routine(self, routine):
+        routine.entry = self.here()
+        self.visit(routine.symbol.block_ast)
+        self.emit(Op.RETURN, routine)
+
+    def visit_Program(self, node: Program):
+        self.emit(Op.ENTER_PROGRAM, node)
+        self.visit(node.block)
+        self.emit(Op.HALT)
+
+    def visit_Block(self, node):
+        # variables are initialized with the frame from the routine's layout
+        self.visit(node.compound_statement)
+
+    def visit_Compound(self, node):
+        if node.table is None:
+            for child in node.children:
+                self.visit(child)
+            return
+
+        # GOTOs are jumps here already, so only the labels of the table are needed
+        scope = LabelScope(node.table.labels, self.loop_depth)
+        scope.start = self.here()
+        self.label_scopes.append(scope)
+        for child in node.children:
+            if isinstance(child, LabelStatement):
+                scope.addresses[child.label] = self.here()
+            self.visit(child)
+        self.label_scopes.pop()
+        scope.end = self.here()
+        self.code.label_scopes.append(scope)
+        for address, label in scope.fixups:
+            target, pops = self.code.args[address]
+            self.patch(address, (scope.addresses[label], pops))
+
+    def visit_NoOp(self, node):
+        pass
+
+    def visit_LabelStatement(self, node):
+        self.statement_hook(node)
+        self.visit(node.statement)
+
+    def visit_GotoStatement(self, node):
+        self.statement_hook(node)
+        self.tick()
+        for scope in reversed(self.label_scopes):
+            if node.label in scope.labels:
+                address = self.emit(Op.GOTO, (None, self.loop_depth - scope.loop_depth))
+                scope.fixups.append((address, node.label))
+                return
+        self.emit(Op.RAISE_GOTO, node.label)
+
+    def visit_Assign(self, node):
+        self.statement_hook(node)
+        self.visit(node.rhs)
+        self.store(node.lhs)
+
+    def store(self, variable):
+        """Emit code that stores the value on top of the stack into variable."""
+        if isinstance(variable, FieldVariable):
+            self.visit(variable.record)
+            self.emit(Op.STORE_FIELD, variable.field_name.value)
+        elif isinstance(variable, DereferenceVariable):
+            self.visit(variable.pointer)
+            self.emit(Op.STORE_DEREF)
+        elif isinstance(variable, IndexedVariable):
+            for expr in variable.index_expressions:
+                self.visit(expr)
+            self.emit(Op.STORE_INDEX, (variable.name.scope_level, variable.name.slot, len(variable.index_expressions)))
+        else:
+            self.emit(Op.STORE_VAR, (variable.scope_level, variable.slot))
+
+    def visit_Ident(self, node):
+        self.emit(Op.LOAD_VAR, (node.scope_level, node.slot))
+
+    def visit_IndexedVariable(self, node):
+        for expr in node.index_expressions:
+            self.visit(expr)
+        self.emit(Op.LOAD_INDEX, (node.name.scope_level, node.name.slot, len(node.index_expressions)))
+
+    def visit_FieldVariable(self, node):
+        self.visit(node.record)
+        self.emit(Op.LOAD_FIELD, node.field_name.value)
+
+    def visit_DereferenceVariable(self, node):
+        self.visit(node.pointer)
+        self.emit(Op.LOAD_DEREF)
+
+    def visit_IntegerConstant(self, node):
+        self.emit(Op.LOAD_CONST, node.value)
+
+    visit_RealConstant = visit_IntegerConstant
+    visit_StringConstant = visit_IntegerConstant
+    visit_CharConstant = visit_IntegerConstant
+    visit_EnumConstant = visit_IntegerConstant
+    visit_NilConstant = visit_IntegerConstant
+    visit_SetConstant = visit_IntegerConstant
+
+    def visit_BooleanConstant(self, node):
+        self.emit(Op.LOAD_CONST, node.value == "TRUE")
+
+    def visit_SetLiteral(self, node):
+        ranges = tuple(isinstance(element, tuple) for element in node.elements)
+        parts = [part for element in node.elements for part in (element if isinstance(element, tuple) else (element,))]
+        if all(isinstance(part, Constant) for part in parts):
+            # sets are never changed once built, so a constant literal is built here once
+            self.emit(Op.LOAD_CONST, build_set(ranges, [constant_value(part) for part in parts]))
+            return
+        for part in parts:
+            self.visit(part)
+        self.emit(Op.BUILD_SET, ranges)
+
+    def visit_BinaryOp(self, node):
+        if node.short_circuit:
+            self.short_circuit(node)
+            return
+        self.visit(node.lhs)
+        self.visit(node.rhs)
+        self.emit(BINARY_OPS[node.token.type])
+
+    def short_circuit(self, node):
+        """An AND or OR under {$B-}: rhs is jumped over when lhs decides the result."""
+        self.visit(node.lhs)
+        false_jump = self.emit(Op.JUMP_IF_FALSE)
+        if node.token.type == TokenType.OR:
+            self.emit(Op.LOAD_CONST, True)
+            end_jump = self.emit(Op.JUMP)
+            self.patch(false_jump, self.here())
+            self.visit(node.rhs)
+        else:
+            self.visit(node.rhs)
+            end_jump = self.emit(Op.JUMP)
+            self.patch(false_jump, self.here())
+            self.emit(Op.LOAD_CONST, False)
+        self.patch(end_jump, self.here())
+
+    def visit_UnaryOp(self, node):
+        self.visit(node.operand)
+        self.emit(UNARY_OPS[node.op.type])
+
+    # the specialized operators the optimizer lowers to keep their operator token, and the opcode
+    # chosen for it here already evaluates as a single operation
+    visit_Add = visit_Subtract = visit_Multiply = visit_RealDivide = visit_IntegerDivide = visit_Modulo = \
+        visit_Equal = visit_NotEqual = visit_Less = visit_LessEqual = visit_Greater = visit_GreaterEqual = \
+        visit_SetUnion = visit_SetDifference = visit_SetIntersection = visit_SetMembership = visit_And = visit_Or = \
+        visit_AndThen = visit_OrElse = visit_BinaryOp
+    visit_Negate = visit_Not = visit_UnaryOp
+
+    def visit_Output(self, node):
+        self.statement_hook(node)
+        arguments = node.arguments if node.arguments is not None else []
+        fields = []
+        for field in arguments:
+            self.visit(field.value)
+            if field.width is not None:
+                self.visit(field.width)
+            if field.precision is not None:
+                self.visit(field.precision)
+            fields.append((field.width is not None, field.precision is not None))
+        first_argument = arguments[0] if arguments else None
+        self.emit(Op.WRITE, (node.op.value == "WRITELN", tuple(fields), first_argument))
+
+    def visit_Input(self, node):
+        self.statement_hook(node)
+        arguments = node.arguments
+        self.emit(Op.READ_BEGIN)
+        end_jumps = []
+        if arguments and isinstance(arguments[0], (Ident, IndexedVariable, FieldVariable)):
+            self.emit(Op.READ_IS_FILE, arguments[0])
+            console_jump = self.emit(Op.JUMP_IF_FALSE)
+            self.visit(arguments[0])
+            self.emit(Op.READ_FILE_SOURCE)
+            self.read_targets(arguments[1:])
+            end_jumps.append(self.emit(Op.JUMP))
+            self.patch(console_jump, self.here())
+        self.read_targets(arguments)
+        for address in end_jumps:
+            self.patch(address, self.here())
+        self.emit(Op.READ_END, node.op.value == "READLN")
+
+    def read_targets(self, targets):
+        for target in targets:
+            self.emit(Op.READ_VALUE, target)
+            self.store(target)
+
+    def visit_ProcedureCall(self, node):
+        self.statement_hook(node)
+        proc_symbol = node.proc_symbol
+        if isinstance(proc_symbol, BuiltinProcedureSymbol):
+            self.builtin_procedure(node)
+            return
+        self.call(node.actual_params, self.routine(proc_symbol, ARType.PROCEDURE))
+
+    def call(self, actual_params, routine):
+        self.tick(call=True)
+        value_slots = []
+        references = []
+        for slot, (param_symbol, argument_node) in enumerate(zip(routine.symbol.formal_params, actual_params)):
+            if param_symbol.by_reference:
+                references.append((slot, argument_node.scope_level, argument_node.slot))
+            else:
+                self.visit(argument_node)
+                value_slots.append(slot)
+        self.emit(Op.CALL, CallSite(routine, value_slots, references))
+
+    def builtin_procedure(self, node):
+        proc_name = node.proc_name
+        params = node.actual_params
+        if proc_name in FILE_METHODS:
+            for param in params:
+                self.visit(param)
+            self.emit(Op.FILE_METHOD, (FILE_METHODS[proc_name], len(params) - 1))
+        elif proc_name == "NEW":
+            self.emit(Op.NEW_POINTER, params[0].pointer_type.referenced_type)
+            self.store(params[0])
+        elif proc_name == "DISPOSE":
+            self.visit(params[0])
+            self.emit(Op.DISPOSE)
+            self.emit(Op.LOAD_CONST, None)
+            self.store(params[0])
+        elif proc_name == "DELETE":
+            for param in params:
+                self.visit(param)
+            self.emit(Op.DELETE_STRING)
+            self.store(params[0])
+        elif proc_name == "INSERT":
+            for param in params:
+                self.visit(param)
+            self.emit(Op.INSERT_STRING)
+            self.store(params[1])
+        elif proc_name in ["INC", "DEC"]:
+            if len(params) == 2:
+                self.visit(params[1])
+            else:
+                self.emit(Op.LOAD_CONST, 1)
+            self.visit(params[0])
+            self.emit(Op.SWAP)
+            self.emit(Op.ADD if proc_name == "INC" else Op.SUB)
+            self.store(params[0])
+        elif proc_name == "VAL":
+            self.visit(params[0])
+            self.emit(Op.VAL_CONVERT, params[1])
+            failed_jump = self.emit(Op.JUMP_IF_FALSE)
+            self.store(params[1])
+            self.store(params[2])
+            end_jump = self.emit(Op.JUMP)
+            self.patch(failed_jump, self.here())
+            self.store(params[2])
+            self.patch(end_jump, self.here())
+        elif proc_name == "STR":
+            self.visit(params[0])
+            self.emit(Op.STR)
+            self.store(params[1])
+
+    def visit_FunctionCall(self, node):
+        func_symbol = node.func_symbol
+        if isinstance(func_symbol, BuiltinFunctionSymbol):
+            for param in node.actual_params:
+                self.visit(param)
+            self.emit(Op.BUILTIN_FUNCTION, (node.func_name, len(node.actual_params), node))
+            return
+        self.call(node.actual_params, self.routine(func_symbol, ARType.FUNCTION))
+
+    def visit_IFStatement(self, node):
+        self.statement_hook(node)
+        self.visit(node.expr)
+        else_jump = self.emit(Op.JUMP_IF_FALSE)
+        self.visit(node.statement)
+        if node.else_statement is None:
+            self.patch(else_jump, self.here())
+            return
+        end_jump = self.emit(Op.JUMP)
+        self.patch(else_jump, self.here())
+        self.visit(node.else_statement)
+        self.patch(end_jump, self.here())
+
+    def visit_CaseStatement(self, node):
+        self.statement_hook(node)
+        self.visit(node.expr)
+        case_address = self.emit(Op.CASE)
+        targets = []
+        end_jumps = []
+        for _, statement in node.branches:
+            targets.append(self.here())
+            self.visit(statement)
+            end_jumps.append(self.emit(Op.JUMP))
+        else_target = self.here()
+        self.visit(node.else_statement)
+        for address in end_jumps:
+            self.patch(address, self.here())
+        self.patch(case_address, (node.table.lookup_function(), tuple(targets), else_target))
+
+    def visit_WhileStatement(self, node):
+        self.statement_hook(node)
+        test = self.here()
+        self.visit(node.expr)
+        exit_jump = self.emit(Op.JUMP_IF_FALSE)
+        self.tick()
+        self.visit(node.statement)
+        self.emit(Op.JUMP, test)
+        self.patch(exit_jump, self.here())
+
+    def visit_RepeatUntilStatement(self, node):
+        self.statement_hook(node)
+        start = self.here()
+        self.tick()
+        for statement in node.statements:
+            self.visit(statement)
+        self.visit(node.expr)
+        self.emit(Op.JUMP_IF_FALSE, start)
+
+    def visit_ForStatement(self, node):
+        self.statement_hook(node)
+        level = node.id.scope_level
+        slot = node.id.slot
+        step = 1 if node.dir.type == TokenType.TO else -1
+        self.visit(node.expr1)
+        self.emit(Op.STORE_VAR, (level, slot))
+        self.visit(node.expr2)
+        test = self.emit(Op.FOR_TEST)
+        self.tick()
+        self.loop_depth += 1
+        self.visit(node.statement)
+        self.loop_depth -= 1
+        self.emit(Op.FOR_STEP, (level, slot, step))
+        self.emit(Op.JUMP, test)
+        self.patch(test, (level, slot, step, self.here()))
+
+    def visit_WithStatement(self, node):
+        self.statement_hook(node)
+        self.visit(node.statement)
@@ -0,0 +1,65 @@
+from bisect import bisect_right
+
+
+# ranges of at most this many integers or characters are stored value by value, so most tables
+# are a single dict lookup
+EXPANDED_RANGE_SIZE = 256
+
+
+def range_values(lower, upper):
+    """The values lower..upper when they are integers or characters few enough to list, otherwise None."""
+    if isinstance(lower, int) and upper - lower < EXPANDED_RANGE_SIZE:
+        return range(lower, upper + 1)
+    if isinstance(lower, str) and len(lower) == 1 and len(upper) == 1 and ord(upper) - ord(lower) < EXPANDED_RANGE_SIZE:
+        return map(chr, range(ord(lower), ord(upper) + 1))
+    return None
+
+
+class CaseTable:
+    """CaseTable - selects the branch of a CASE statement for a value without trying its labels in turn.
+
+        Single labels, and the values of short ranges, are kept in a dict from value to branch index.
+        Longer ranges go in a list of (lower, upper, branch) intervals sorted by their lower bound and
+        searched with bisect, so a branch is found in constant time, or logarithmic time in the number of
+        long ranges. The semantic analyzer builds one for every CASE statement: its labels are constants
+        and it rejects labels that overlap."""
+
+    __slots__ = ('values', 'lowers', 'ranges')
+
+    def __init__(self, branch_labels):
+        """branch_labels lists the labels of each branch in order: a value, or a (lower, upper) pair for a range."""
+        self.values = {}
+        ranges = []
+        for branch, labels in enumerate(branch_labels):
+            for label in labels:
+                if isinstance(label, tuple):
+                    lower, upper = label
+                    # a range whose bounds are the wrong way round matches nothing
+                    if lower > upper:
+                        continue
+                    values = range_values(lower, upper)
+                    if values is None:
+                        ranges.append((lower, upper, branch))
+                    else:
+                        for value in values:
+                            self.values.setdefault(value, branch)
+                else:
+                    self.values.setdefault(label, branch)
+        ranges.sort(key=lambda interval: interval[0])
+        self.lowers = [lower for lower, _, _ in ranges]
+        self.ranges = ranges
+
+    def lookup(self, value):
+        """The index of the branch with a label matching value, or None when there is none."""
+        branch = self.values.get(value)
+        if branch is None and self.ranges:
+            index = bisect_right(self.lowers, value) - 1
+            if index >= 0:
+                _, upper, branch = self.ranges[index]
+                if value > upper:
+                    return None
+        return branch
+
+    def lookup_function(self):
+        """The quickest function doing lookup: the dict's own get when there are no ranges."""
+        return self.lookup if self.ranges else self.values.get
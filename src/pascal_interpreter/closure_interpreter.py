@@ -0,0 +1,944 @@
+import math
+
+from .activation_record import ActivationRecord, ARType
+from .data_type import DataType
+from .debugger import DebuggerQuit
+from .interpreter import Interpreter, GotoSignal, PascalFile, PascalSet, PointerValue
+from .label_table import STATEMENT, HOOK, TICK, JUMP, JUMP_IF_FALSE
+from .pascal_ast import Ident, IndexedVariable, FieldVariable, DereferenceVariable, Constant
+from .symbol import BuiltinFunctionSymbol, BuiltinProcedureSymbol
+from .token_type import TokenType
+
+
+def _noop():
+    pass
+
+
+BINARY_OPERATIONS = {
+    TokenType.PLUS: lambda lhs, rhs: lhs + rhs,
+    TokenType.MINUS: lambda lhs, rhs: lhs - rhs,
+    TokenType.MUL: lambda lhs, rhs: lhs * rhs,
+    TokenType.REAL_DIV: lambda lhs, rhs: float(lhs / rhs),
+    TokenType.INTEGER_DIV: lambda lhs, rhs: lhs // rhs,
+    TokenType.MOD: lambda lhs, rhs: lhs % rhs,
+    TokenType.IN: lambda lhs, rhs: lhs in rhs,
+    TokenType.EQUAL: lambda lhs, rhs: lhs == rhs,
+    TokenType.NOT_EQUAL: lambda lhs, rhs: lhs != rhs,
+    TokenType.GREATER: lambda lhs, rhs: lhs > rhs,
+    TokenType.GREATER_EQUAL: lambda lhs, rhs: lhs >= rhs,
+    TokenType.LESS: lambda lhs, rhs: lhs < rhs,
+    TokenType.LESS_EQUAL: lambda lhs, rhs: lhs <= rhs,
+    TokenType.AND: lambda lhs, rhs: lhs and rhs,
+    TokenType.OR: lambda lhs, rhs: lhs or rhs,
+}
+
+
+class ClosureInterpreter(Interpreter):
+    """ClosureInterpreter - compiles the analyzed AST once into a tree of Python closures and runs them.
+
+        Every node becomes a zero-argument closure with its children already compiled and bound, so
+        executing a statement no longer pays for building a 'visit_' method name and looking it up.
+        Runtime state (call stack, activation records, files, output) is shared with Interpreter."""
+
+    def __init__(self, tree, **kwargs):
+        super().__init__(tree, **kwargs)
+        self.routine_bodies = {}
+
+    def interpret(self):
+        self.output = self.open_output()
+        tree = self.tree
+        if tree is None:
+            return ''
+        program = self.compile(tree)
+        self.start_limits()
+        quit_requested = False
+        try:
+            rv = program()
+        except DebuggerQuit:
+            quit_requested = True
+            rv = self.call_stack.peek() if self.call_stack._records else None
+        finally:
+            self.output.flush()
+
+        if self.debugger is not None and not quit_requested:
+            self.debugger.program_finished(rv)
+
+        return (rv, self.output.getvalue())
+
+    def compile(self, node):
+        if node is None:
+            return _noop
+        compiler = getattr(self, 'compile_' + type(node).__name__, None)
+        if compiler is None:
+            return _noop
+        return compiler(node)
+
+    def compile_statement(self, node, run):
+        """Wrap a compiled statement with the statement hook when a debugger or profiler is attached."""
+        if self.debugger is None and self.profiler is None:
+            return run
+        before_statement = self.before_statement
+
+        def run_with_debugger():
+            before_statement(node)
+            return run()
+        return run_with_debugger
+
+    def compile_counted(self, run):
+        """Wrap a loop body so each iteration counts as a step, when limits are set."""
+        if not self.limited:
+            return run
+        countdown = self.countdown
+        check_limits = self.check_limits
+
+        def run_counted():
+            countdown[0] -= 1
+            if not countdown[0]:
+                check_limits()
+            return run()
+        return run_counted
+
+    def routine_body(self, symbol):
+        """Return a one-element cell holding the compiled routine body.
+
+        The cell is registered before the body is compiled so recursive calls can refer to it."""
+        cell = self.routine_bodies.get(id(symbol))
+        if cell is None:
+            cell = []
+            self.routine_bodies[id(symbol)] = cell
+            cell.append(self.compile(symbol.block_ast))
+        return cell
+
+    def compile_Program(self, node):
+        program_name = node.name
+        layout = node.frame_layout
+        block = self.compile(node.block)
+        initialize_frame = self.initialize_frame
+        push = self.call_stack.push
+        pop = self.call_stack.pop
+
+        def run():
+            ar = ActivationRecord(
+                name=program_name,
+                ar_type=ARType.PROGRAM,
+                nesting_level=1,
+                layout=layout,
+            )
+            initialize_frame(ar)
+            push(ar)
+            block()
+            return pop()
+        return run
+
+    def compile_Block(self, node):
+        # variables are initialized with the frame from the routine's layout
+        return self.compile(node.compound_statement)
+
+    def compile_Compound(self, node):
+        if node.table is None:
+            children = [self.compile(child) for child in node.children]
+
+            def run():
+                for child in children:
+                    child()
+            return run
+
+        labels = node.table.labels
+        steps = [self.compile_step(*step) for step in node.table.steps]
+        end = len(steps)
+        call_stack = self.call_stack
+
+        def run_steps():
+            # a lowered GOTO is a jump, any other one a GotoSignal
+            depth = len(call_stack)
+            index = 0
+            while True:
+                try:
+                    while index < end:
+                        operation, run, target = steps[index]
+                        index += 1
+                        if operation == JUMP_IF_FALSE:
+                            if not run():
+                                index = target
+                        elif operation == JUMP:
+                            index = target
+                        else:
+                            run()
+                    return
+                except GotoSignal as signal:
+                    if signal.label not in labels:
+                        raise
+                    # a GOTO out of a routine leaves the frames of the routines it jumps out of
+                    while len(call_stack) > depth:
+                        call_stack.pop()
+                    index = labels[signal.label]
+        return run_steps
+
+    def compile_step(self, operation, node, target):
+        """Compile a LabelTable step into (operation, closure, target); a STATEMENT, HOOK or TICK just calls its closure."""
+        if operation == STATEMENT:
+            return (STATEMENT, self.compile(node), target)
+        if operation == JUMP_IF_FALSE:
+            return (JUMP_IF_FALSE, self.compile(node.expr), target)
+        if operation == TICK:
+            return (TICK, self.tick if self.limited else _noop, target)
+        if operation == HOOK:
+            return (HOOK, self.compile_statement(node, _noop), target)
+        return (JUMP, None, target)
+
+    def compile_NoOp(self, node):
+        return _noop
+
+    def compile_Assign(self, node):
+        rhs = self.compile(node.rhs)
+        store = self.compile_store(node.lhs)
+
+        def run():
+            store(rhs())
+        return self.compile_statement(node, run)
+
+    def compile_store(self, variable):
+        """Compile an assignment target into a closure that accepts the new value."""
+        peek = self.call_stack.peek
+        if isinstance(variable, FieldVariable):
+            record = self.compile(variable.record)
+            field_name = variable.field_name.value
+
+            def store_field(value):
+                record()[field_name] = value
+            return store_field
+
+        if isinstance(variable, DereferenceVariable):
+            pointer = self.compile(variable.pointer)
+            check_pointer = self.check_pointer
+
+            def store_dereference(value):
+                pointer_value = pointer()
+                check_pointer(pointer_value)
+                pointer_value.value = value
+            return store_dereference
+
+        if hasattr(variable, "index_expression"):
+            array = self.compile(variable.name)
+            indexes = [self.compile(expr) for expr in variable.index_expressions]
+
+            if len(indexes) == 1:
+                index = indexes[0]
+
+                def store_index(value):
+                    array().set(index(), value)
+                return store_index
+
+            if len(indexes) == 2:
+                row, column = indexes
+
+                def store_pair(value):
+                    array().set_pair(row(), column(), value)
+                return store_pair
+
+            def store_indexes(value):
+                array().set_indexes([index() for index in indexes], value)
+            return store_indexes
+
+        name = variable.value
+        level = getattr(variable, "scope_level", None)
+        if level is not None:
+            display = self.call_stack._display
+            slot = variable.slot
+
+            def store_slot(value):
+                display[level].store(slot, value)
+            return store_slot
+
+        def store_name(value):
+            peek().assign_existing(name, value)
+        return store_name
+
+    def compile_LabelStatement(self, node):
+        return self.compile_statement(node, self.compile(node.statement))
+
+    def compile_GotoStatement(self, node):
+        label = node.label
+        tick = self.tick
+
+        def run():
+            tick()
+            raise GotoSignal(label)
+        return self.compile_statement(node, run)
+
+    def compile_Ident(self, node):
+        name = node.value
+        level = getattr(node, "scope_level", None)
+        if level is not None:
+            # resolved by the analyzer: read the slot of the display entry for
+            # the variable's nesting level instead of walking the call chain
+            display = self.call_stack._display
+            slot = node.slot
+
+            def run_slot():
+                return display[level].load(slot)
+            return run_slot
+
+        peek = self.call_stack.peek
+
+        def run():
+            return peek().get(name)
+        return run
+
+    def compile_IndexedVariable(self, node):
+        array = self.compile(node.name)
+        indexes = [self.compile(expr) for expr in node.index_expressions]
+
+        if len(indexes) == 1:
+            index = indexes[0]
+
+            def run():
+                return array().get_index(index())
+            return run
+
+        if len(indexes) == 2:
+            row, column = indexes
+
+            def run_pair():
+                return array().get_pair(row(), column())
+            return run_pair
+
+        def run_multi():
+            return array().get_indexes([index() for index in indexes])
+        return run_multi
+
+    def compile_FieldVariable(self, node):
+        record = self.compile(node.record)
+        field_name = node.field_name.value
+
+        def run():
+            return record().get(field_name)
+        return run
+
+    def compile_DereferenceVariable(self, node):
+        pointer = self.compile(node.pointer)
+        check_pointer = self.check_pointer
+
+        def run():
+            pointer_value = pointer()
+            check_pointer(pointer_value)
+            return pointer_value.value
+        return run
+
+    def compile_Output(self, node):
+        arguments = node.arguments if node.arguments is not None else []
+        newline = node.op.value == "WRITELN"
+        fields = [self.compile_output_field(arg) for arg in arguments]
+        record_values = [self.compile(arg.value) for arg in arguments[1:]]
+        may_target_file = bool(arguments) and self.may_be_file_output_field(arguments[0])
+        first_argument = arguments[0] if arguments else None
+        file_target = self.compile(first_argument.value) if may_target_file else None
+        file_fields = fields[1:]
+        echo_output = self.debugger is not None
+
+        def run():
+            output_target = self.output
+            active_fields = fields
+            if may_target_file and self.is_file_output_field(first_argument):
+                file_value = file_target()
+                if file_value.component_type is not None:
+                    for record_value in record_values:
+                        file_value.write_record(record_value())
+                    return
+                output_target = file_value.handle
+                active_fields = file_fields
+
+            text = "".join([field() for field in active_fields])
+            output_target.write(text)
+            if newline:
+                output_target.write('\n')
+
+            if echo_output and self.show_output():
+                self.debugger.notify_program_output()
+        return self.compile_statement(node, run)
+
+    def may_be_file_output_field(self, field):
+        return (
+            getattr(field, "width", None) is None and
+            getattr(field, "precision", None) is None and
+            self.may_be_file_variable(field.value)
+        )
+
+    def may_be_file_variable(self, node):
+        return isinstance(node, (Ident, IndexedVariable, FieldVariable))
+
+    def compile_output_field(self, field):
+        value = self.compile(field.value)
+        if field.width is None and field.precision is None:
+            def run():
+                return str(value())
+            return run
+
+        width = self.compile(field.width) if field.width is not None else None
+        precision = self.compile(field.precision) if field.precision is not None else None
+
+        def run_formatted():
+            field_value = value()
+            if precision is not None:
+                text = f"{float(field_value):.{precision()}f}"
+            else:
+                text = str(field_value)
+            if width is not None:
+                text = f"{text:>{width()}}"
+            return text
+        return run_formatted
+
+    def compile_Input(self, node):
+        arguments = node.arguments
+        readln = node.op.value == "READLN"
+        may_read_file = bool(arguments) and self.may_be_file_variable(arguments[0])
+        file_source = self.compile(arguments[0]) if may_read_file else None
+        all_targets = [(arg, self.compile_store(arg)) for arg in arguments]
+
+        def run():
+            if self.interactive_input:
+                self.show_output()
+
+            input_source = self.input
+            typed_file = None
+            targets = all_targets
+            if may_read_file and self.is_file_variable(arguments[0]):
+                file_value = file_source()
+                if file_value.component_type is not None:
+                    typed_file = file_value
+                else:
+                    input_source = file_value.input
+                targets = all_targets[1:]
+
+            for arg, store in targets:
+                if typed_file is not None:
+                    value = typed_file.read_record()
+                else:
+                    value = input_source.read_token()
+                store(self.convert_input(value, self.variable_type(arg)))
+
+            if readln and typed_file is None:
+                input_source.discard_line()
+        return self.compile_statement(node, run)
+
+    def compile_IntegerConstant(self, node):
+        value = node.value
+        return lambda: value
+
+    compile_RealConstant = compile_IntegerConstant
+    compile_StringConstant = compile_IntegerConstant
+    compile_CharConstant = compile_IntegerConstant
+    compile_EnumConstant = compile_IntegerConstant
+    compile_NilConstant = compile_IntegerConstant
+    compile_SetConstant = compile_IntegerConstant
+
+    def compile_BooleanConstant(self, node):
+        value = node.value == "TRUE"
+        return lambda: value
+
+    def compile_SetLiteral(self, node):
+        elements = []
+        for element in node.elements:
+            if isinstance(element, tuple):
+                elements.append((self.compile(element[0]), self.compile(element[1])))
+            else:
+                elements.append(self.compile(element))
+
+        def run():
+            result = PascalSet()
+            for element in elements:
+                if isinstance(element, tuple):
+                    result.include_range(element[0](), element[1]())
+                else:
+                    result.include(element())
+            return result
+
+        if all(isinstance(part, Constant) for element in node.elements
+               for part in (element if isinstance(element, tuple) else (element,))):
+            # sets are never changed once built, so a constant literal is built once
+            value = run()
+            return lambda: value
+        return run
+
+    def compile_ProcedureCall(self, node):
+        proc_symbol = node.proc_symbol
+        if isinstance(proc_symbol, BuiltinProcedureSymbol):
+            return self.compile_statement(node, self.compile_builtin_procedure(node))
+
+        body = self.routine_body(proc_symbol)
+        run = self.compile_routine_call(
+            node.proc_name,
+            ARType.PROCEDURE,
+            proc_symbol,
+            node.actual_params,
+            body,
+        )
+        return self.compile_statement(node, run)
+
+    def compile_routine_call(self, name, ar_type, symbol, actual_params, body):
+        """Compile a user procedure or function call; functions return their result slot.
+
+        Parameters fill the first slots of the frame, so by-value arguments are stored by
+        position and VAR arguments bind to the (nesting level, slot) of the caller's variable."""
+        scope_level = symbol.scope_level
+        nesting_level = scope_level + 1
+        layout = symbol.frame_layout
+        fresh = layout.fresh
+        values = []
+        references = []
+        for slot, (param_symbol, argument_node) in enumerate(zip(symbol.formal_params, actual_params)):
+            if param_symbol.by_reference:
+                references.append((slot, argument_node.scope_level, argument_node.slot))
+            else:
+                values.append((slot, self.compile(argument_node)))
+        result_slot = symbol.result_slot if ar_type == ARType.FUNCTION else None
+        initial_value = self.initial_value
+        display = self.call_stack._display
+        push = self.call_stack.push
+        pop = self.call_stack.pop
+
+        def run():
+            ar = ActivationRecord(
+                name=name,
+                ar_type=ar_type,
+                nesting_level=nesting_level,
+                parent_ar=display[scope_level],
+                layout=layout,
+            )
+            slots = ar.slots
+            for slot, type_node in fresh:
+                slots[slot] = initial_value(type_node)
+            for slot, argument in values:
+                slots[slot] = argument()
+            for slot, level, target_slot in references:
+                ar.bind_reference(slot, display[level], target_slot)
+
+            push(ar)
+            body[0]()
+            pop()
+            if result_slot is not None:
+                return slots[result_slot]
+
+        if self.limited:
+            count_call = self.count_call
+
+            def run_counted():
+                count_call()
+                return run()
+            return run_counted
+        return run
+
+    def compile_builtin_procedure(self, node):
+        proc_name = node.proc_name
+        params = node.actual_params
+        args = [self.compile(param) for param in params]
+
+        if proc_name == "ASSIGN":
+            return lambda: args[0]().assign(args[1]())
+        if proc_name == "RESET":
+            return lambda: args[0]().reset()
+        if proc_name == "REWRITE":
+            return lambda: args[0]().rewrite()
+        if proc_name == "APPEND":
+            return lambda: args[0]().append()
+        if proc_name == "CLOSE":
+            return lambda: args[0]().close()
+        if proc_name == "ERASE":
+            return lambda: args[0]().erase()
+        if proc_name == "RENAME":
+            return lambda: args[0]().rename(args[1]())
+        if proc_name == "FLUSH":
+            return lambda: args[0]().flush()
+
+        if proc_name == "NEW":
+            store = self.compile_store(params[0])
+            referenced_type = params[0].pointer_type.referenced_type
+            initial_value = self.initial_value
+            return lambda: store(PointerValue(initial_value(referenced_type)))
+
+        if proc_name == "DISPOSE":
+            store = self.compile_store(params[0])
+
+            def dispose():
+                pointer_value = args[0]()
+                if pointer_value is not None:
+                    pointer_value.disposed = True
+                store(None)
+            return dispose
+
+        if proc_name == "DELETE":
+            store = self.compile_store(params[0])
+
+            def delete():
+                value = args[0]()
+                start = args[1]()
+                count = args[2]()
+                index = max(start - 1, 0)
+                store(value[:index] + value[index + count:])
+            return delete
+
+        if proc_name == "INSERT":
+            store = self.compile_store(params[1])
+
+            def insert():
+                source = args[0]()
+                value = args[1]()
+                start = args[2]()
+                index = min(max(start - 1, 0), len(value))
+                store(value[:index] + source + value[index:])
+            return insert
+
+        if proc_name in ["INC", "DEC"]:
+            store = self.compile_store(params[0])
+            target = args[0]
+            delta = args[1] if len(args) == 2 else (lambda: 1)
+            if proc_name == "INC":
+                def increment():
+                    amount = delta()
+                    store(target() + amount)
+                return increment
+
+            def decrement():
+                amount = delta()
+                store(target() - amount)
+            return decrement
+
+        if proc_name == "VAL":
+            store = self.compile_store(params[1])
+            store_code = self.compile_store(params[2])
+            target = params[1]
+
+            def val():
+                text = args[0]().strip()
+                try:
+                    if self.variable_type(target) == DataType.INTEGER:
+                        converted = int(text)
+                    else:
+                        converted = float(text)
+                except ValueError:
+                    store_code(1)
+                else:
+                    store(converted)
+                    store_code(0)
+            return val
+
+        if proc_name == "STR":
+            store = self.compile_store(params[1])
+            return lambda: store(str(args[0]()))
+
+        return _noop
+
+    def compile_FunctionCall(self, node):
+        func_symbol = node.func_symbol
+        if isinstance(func_symbol, BuiltinFunctionSymbol):
+            return self.compile_builtin_function(node)
+
+        return self.compile_routine_call(
+            node.func_name,
+            ARType.FUNCTION,
+            func_symbol,
+            node.actual_params,
+            self.routine_body(func_symbol),
+        )
+
+    def compile_builtin_function(self, node):
+        func_name = node.func_name
+        args = [self.compile(param) for param in node.actual_params]
+        arg = args[0] if args else None
+
+        if func_name == "ABS":
+            return lambda: abs(arg())
+        if func_name == "SQR":
+            def sqr():
+                value = arg()
+                return value * value
+            return sqr
+        if func_name == "ODD":
+            return lambda: arg() % 2 != 0
+        if func_name == "ORD":
+            def ordinal():
+                value = arg()
+                if isinstance(value, bool):
+                    return int(value)
+                if isinstance(value, str):
+                    return ord(value[0])
+                return value
+            return ordinal
+        if func_name == "CHR":
+            return lambda: chr(arg())
+        if func_name in ["PRED", "SUCC"]:
+            delta = -1 if func_name == "PRED" else 1
+            bounds = getattr(node, "ordinal_bounds", None)
+            ordinal_step = self.ordinal_step
+            return lambda: ordinal_step(arg(), delta, bounds)
+        if func_name == "TRUNC":
+            return lambda: math.trunc(arg())
+        if func_name == "ROUND":
+            def round_half_away():
+                value = arg()
+                if value >= 0:
+                    return math.floor(value + 0.5)
+                return math.ceil(value - 0.5)
+            return round_half_away
+        if func_name == "SQRT":
+            return lambda: math.sqrt(arg())
+        if func_name == "EXP":
+            return lambda: math.exp(arg())
+        if func_name == "LN":
+            return lambda: math.log(arg())
+        if func_name == "SIN":
+            return lambda: math.sin(arg())
+        if func_name == "COS":
+            return lambda: math.cos(arg())
+        if func_name == "ARCTAN":
+            return lambda: math.atan(arg())
+        if func_name == "EOF":
+            if not args:
+                return lambda: self.input.eof()
+
+            def eof():
+                file_value = arg()
+                if isinstance(file_value, PascalFile):
+                    return file_value.eof()
+                return file_value.input.eof()
+            return eof
+        if func_name == "EOLN":
+            if not args:
+                return lambda: self.input.eoln()
+            return lambda: arg().input.eoln()
+        if func_name == "LENGTH":
+            return lambda: len(arg())
+        if func_name == "COPY":
+            def copy():
+                value = args[0]()
+                start = args[1]()
+                count = args[2]()
+                return value[max(start - 1, 0):max(start - 1, 0) + count]
+            return copy
+        if func_name == "POS":
+            def position():
+                needle = args[0]()
+                haystack = args[1]()
+                index = haystack.find(needle)
+                return 0 if index == -1 else index + 1
+            return position
+        if func_name == "CONCAT":
+            return lambda: "".join([param() for param in args])
+        if func_name == "UPCASE":
+            return lambda: arg().upper()
+        return _noop
+
+    def compile_BinaryOp(self, node):
+        if node.short_circuit:
+            return self.compile_OrElse(node) if node.token.type == TokenType.OR else self.compile_AndThen(node)
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        operation = BINARY_OPERATIONS[node.token.type]
+        return lambda: operation(lhs(), rhs())
+
+    def compile_UnaryOp(self, node):
+        operand = self.compile(node.operand)
+        op = node.op.type
+        if op == TokenType.PLUS:
+            return lambda: +operand()
+        if op == TokenType.MINUS:
+            return lambda: -operand()
+        if op == TokenType.NOT:
+            return lambda: not operand()
+        return _noop
+
+    # the specialized operators the optimizer lowers BinaryOp and UnaryOp to
+
+    def compile_Add(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() + rhs()
+
+    def compile_Subtract(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() - rhs()
+
+    def compile_Multiply(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() * rhs()
+
+    def compile_RealDivide(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() / rhs()
+
+    def compile_IntegerDivide(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() // rhs()
+
+    def compile_Modulo(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() % rhs()
+
+    def compile_Equal(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() == rhs()
+
+    def compile_NotEqual(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() != rhs()
+
+    def compile_Less(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() < rhs()
+
+    def compile_LessEqual(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() <= rhs()
+
+    def compile_Greater(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() > rhs()
+
+    def compile_GreaterEqual(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() >= rhs()
+
+    def compile_SetUnion(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() + rhs()
+
+    def compile_SetDifference(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() - rhs()
+
+    def compile_SetIntersection(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() * rhs()
+
+    def compile_SetMembership(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() in rhs()
+
+    def compile_And(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+
+        def run():
+            lhs_value = lhs()
+            rhs_value = rhs()
+            return lhs_value and rhs_value
+        return run
+
+    def compile_Or(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+
+        def run():
+            lhs_value = lhs()
+            rhs_value = rhs()
+            return lhs_value or rhs_value
+        return run
+
+    def compile_AndThen(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() and rhs()
+
+    def compile_OrElse(self, node):
+        lhs = self.compile(node.lhs)
+        rhs = self.compile(node.rhs)
+        return lambda: lhs() or rhs()
+
+    def compile_Negate(self, node):
+        operand = self.compile(node.operand)
+        return lambda: -operand()
+
+    def compile_Not(self, node):
+        operand = self.compile(node.operand)
+        return lambda: not operand()
+
+    def compile_IFStatement(self, node):
+        condition = self.compile(node.expr)
+        statement = self.compile(node.statement)
+        else_statement = self.compile(node.else_statement)
+
+        def run():
+            if condition():
+                statement()
+            else:
+                else_statement()
+        return self.compile_statement(node, run)
+
+    def compile_CaseStatement(self, node):
+        expr = self.compile(node.expr)
+        lookup = node.table.lookup_function()
+        statements = [self.compile(statement) for _, statement in node.branches]
+        else_statement = self.compile(node.else_statement)
+
+        def run():
+            branch = lookup(expr())
+            if branch is None:
+                else_statement()
+            else:
+                statements[branch]()
+        return self.compile_statement(node, run)
+
+    def compile_WhileStatement(self, node):
+        condition = self.compile(node.expr)
+        statement = self.compile_counted(self.compile(node.statement))
+
+        def run():
+            while condition():
+                statement()
+        return self.compile_statement(node, run)
+
+    def compile_RepeatUntilStatement(self, node):
+        statements = [self.compile(statement) for statement in node.statements]
+        condition = self.compile(node.expr)
+        # the condition is evaluated once per iteration, so counting it counts the iterations
+        condition = self.compile_counted(condition)
+
+        def run():
+            while True:
+                for statement in statements:
+                    statement()
+                if condition():
+                    break
+        return self.compile_statement(node, run)
+
+    def compile_ForStatement(self, node):
+        initial = self.compile(node.expr1)
+        final = self.compile(node.expr2)
+        statement = self.compile_counted(self.compile(node.statement))
+        step = 1 if node.dir.type == TokenType.TO else -1
+        level = node.id.scope_level
+        slot = node.id.slot
+        display = self.call_stack._display
+
+        def run():
+            val_init = initial()
+            ar = display[level]
+            ar.store(slot, val_init)
+            val_final = final()
+            if step > 0:
+                while ar.load(slot) <= val_final:
+                    statement()
+                    ar.store(slot, ar.load(slot) + 1)
+            else:
+                while ar.load(slot) >= val_final:
+                    statement()
+                    ar.store(slot, ar.load(slot) - 1)
+        return self.compile_statement(node, run)
+
+    def compile_WithStatement(self, node):
+        return self.compile_statement(node, self.compile(node.statement))
@@ -18,3 +18,6 @@ class DataType(enum.Enum):
 
     def __eq__(self, other):
         return self.name == other.name
+
+    def __hash__(self):
+        return hash(self.name)
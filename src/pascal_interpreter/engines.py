@@ -0,0 +1,15 @@
+from .interpreter import Interpreter
+from .closure_interpreter import ClosureInterpreter
+from .vm import VirtualMachine
+from .transpiler import TranspilingInterpreter
+
+
+# execution engines selectable from run_program and the command line
+ENGINES = {
+    "tree": Interpreter,
+    "closure": ClosureInterpreter,
+    "vm": VirtualMachine,
+    "python": TranspilingInterpreter,
+}
+
+DEFAULT_ENGINE = "tree"
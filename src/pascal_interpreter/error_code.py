@@ -12,6 +12,9 @@ class ErrorCode(Enum):
     TYPE_ERROR = ("Type Error", 107)
     INVALID_OPERATION = ("Invalid Operation", 108)
     RUNTIME_ERROR = ("Runtime Error", 109)
+    STEP_LIMIT_EXCEEDED = ("Step Limit Exceeded", 110)
+    TIME_LIMIT_EXCEEDED = ("Time Limit Exceeded", 111)
+    CALL_DEPTH_EXCEEDED = ("Call Depth Exceeded", 112)
 
     @property
     def values(self):
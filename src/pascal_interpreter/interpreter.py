@@ -50,12 +50,14 @@ import io
 import math
 import os
 import sys
+import time
 from pathlib import Path
 
 from .CallStack import CallStack
 from .activation_record import ActivationRecord, ARType
 from .data_type import DataType
 from .error_code import ErrorCode, PascalRuntimeError
+from .label_table import STATEMENT, JUMP, JUMP_IF_FALSE, TICK
 from .symbol import BuiltinFunctionSymbol, BuiltinProcedureSymbol
 from .tokenizer import TokenType
 
@@ -63,8 +65,9 @@ from .tokenizer import TokenType
 #from pascal_symbol import SymbolTableBuilder
 from .pascal_ast import NodeVisitor, Program, Block, Assign, ProcedureCall, FunctionCall, \
     VariableDeclaration, LabelStatement, GotoStatement, ForStatement, RepeatUntilStatement, CaseStatement
-from .pascal_ast import Ident, IndexedVariable, FieldVariable, DereferenceVariable, RecordType, ArrayType, SetType, FileType, PointerType, SetLiteral, WithStatement
+from .pascal_ast import Ident, IndexedVariable, FieldVariable, DereferenceVariable, RecordType, ArrayType, SetType, FileType, PointerType, EnumType, SetLiteral, WithStatement
 from .debugger import DebuggerQuit
+from .profiler import ProfiledCallStack
 
 
 #from pascal_semantic_analyzer import SemanticAnalyzer
@@ -190,6 +193,51 @@ class PascalInput:
         return self.line[self.pos] == "\n"
 
 
+DEFAULT_OUTPUT_BUFFER_SIZE = 8192
+
+
+class StreamingOutput:
+    """Program output passed on to a writable text stream while the program runs.
+
+        Writes are collected until buffer_size characters are pending and then handed to the sink
+        in one write; a buffer_size of 0 passes every write straight through. Nothing is kept once
+        it has been written, so getvalue() is always empty."""
+
+    __slots__ = ('sink', 'buffer_size', 'chunks', 'pending', 'written')
+
+    def __init__(self, sink, buffer_size=DEFAULT_OUTPUT_BUFFER_SIZE):
+        self.sink = sink
+        self.buffer_size = buffer_size
+        self.chunks = []
+        self.pending = 0
+        # whether anything has been written since the last flush
+        self.written = False
+
+    def write(self, text):
+        self.chunks.append(text)
+        self.pending += len(text)
+        self.written = True
+        if self.pending >= self.buffer_size:
+            self.drain()
+
+    def drain(self):
+        if self.chunks:
+            self.sink.write("".join(self.chunks))
+            self.chunks.clear()
+            self.pending = 0
+
+    def flush(self):
+        """Write out everything pending and flush the sink; returns whether anything was written since the last flush."""
+        self.drain()
+        if hasattr(self.sink, "flush"):
+            self.sink.flush()
+        written, self.written = self.written, False
+        return written
+
+    def getvalue(self):
+        return ""
+
+
 class PascalFile:
     def __init__(self, base_dir=None, component_type=None):
         self.path = None
@@ -269,26 +317,233 @@ class PascalFile:
         self.handle.seek(pos)
         return rest.strip() == ""
 
+    def as_dict(self):
+        """The file's name, mode and whether it is open, the form used by test fixtures."""
+        return {
+            "path": self.path,
+            "mode": self.mode,
+            "open": self.handle is not None,
+        }
+
     def __eq__(self, other):
         if other is None:
             return self.path is None and self.handle is None
+        if isinstance(other, PascalFile):
+            return self.as_dict() == other.as_dict()
         if isinstance(other, dict):
-            return other == {
-                "path": self.path,
-                "mode": self.mode,
-                "open": self.handle is not None,
-            }
+            return other == self.as_dict()
         return False
 
     def __repr__(self):
-        return str({
-            "path": self.path,
-            "mode": self.mode,
-            "open": self.handle is not None,
-        })
+        return str(self.as_dict())
+
+
+class PascalArray:
+    """A one-dimensional array whose index type has declared bounds.
+
+    Elements are kept in a list preallocated to the size of the index range and
+    addressed by index - lower, so reads and writes need no hashing."""
+    __slots__ = ('lower', 'upper', 'offset', 'size', 'elements')
+
+    def __init__(self, lower, upper):
+        self.lower = lower
+        self.upper = upper
+        self.offset = self.ordinal(lower)
+        self.size = max(self.ordinal(upper) - self.offset + 1, 0)
+        self.elements = [None] * self.size
+
+    def ordinal(self, index):
+        return index
+
+    def index_value(self, position):
+        return type(self.lower)(self.offset + position)
+
+    def index_error(self, index):
+        raise PascalRuntimeError(
+            error_code=ErrorCode.RUNTIME_ERROR,
+            message=f"Array index {index} outside bounds {self.lower}..{self.upper}",
+        )
+
+    def check_index(self, index):
+        if not 0 <= self.ordinal(index) - self.offset < self.size:
+            self.index_error(index)
+
+    def set(self, index, value):
+        position = index - self.offset
+        if 0 <= position < self.size:
+            self.elements[position] = value
+        else:
+            self.index_error(index)
+
+    def get_index(self, index):
+        position = index - self.offset
+        if 0 <= position < self.size:
+            return self.elements[position]
+        self.index_error(index)
+
+    def get_indexes(self, indexes):
+        return self.get_index(indexes[0])
+
+    def set_indexes(self, indexes, value):
+        self.set(indexes[0], value)
+
+    def as_dict(self):
+        """The assigned elements keyed by str(index), the form used by test fixtures."""
+        return {
+            str(self.index_value(position)): value
+            for position, value in enumerate(self.elements)
+            if value is not None
+        }
+
+    def __eq__(self, other):
+        if isinstance(other, (PascalArray, PascalMultiArray)):
+            return self.as_dict() == other.as_dict()
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return False
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+
+class CharIndexedArray(PascalArray):
+    """A PascalArray indexed by CHAR values, stored by their character codes."""
+    __slots__ = ()
 
+    def ordinal(self, index):
+        return ord(index)
 
-class PascalArray(dict):
+    def index_value(self, position):
+        return chr(self.offset + position)
+
+    def set(self, index, value):
+        super().set(ord(index), value)
+
+    def get_index(self, index):
+        return super().get_index(ord(index))
+
+    def index_error(self, index):
+        super().index_error(index if isinstance(index, str) else chr(index))
+
+
+class PascalMultiArray:
+    """An array of two or more dimensions whose index types all have declared bounds.
+
+    The elements are one flat list in row-major order. An access computes a single
+    offset from the per-dimension strides, checking every index on the way."""
+    __slots__ = ('bounds', 'offsets', 'sizes', 'strides', 'char_dimensions', 'elements')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.char_dimensions = [isinstance(lower, str) for lower, _ in bounds]
+        if not any(self.char_dimensions):
+            self.char_dimensions = None
+        self.offsets = [ord(lower) if isinstance(lower, str) else lower for lower, _ in bounds]
+        self.sizes = [
+            max((ord(upper) if isinstance(upper, str) else upper) - offset + 1, 0)
+            for (_, upper), offset in zip(bounds, self.offsets)
+        ]
+        self.strides = []
+        stride = 1
+        for size in reversed(self.sizes):
+            self.strides.insert(0, stride)
+            stride *= size
+        self.elements = [None] * stride
+
+    def position(self, indexes):
+        if self.char_dimensions is not None:
+            indexes = [ord(index) if is_char else index for index, is_char in zip(indexes, self.char_dimensions)]
+        position = 0
+        for dimension, (index, offset, size, stride) in enumerate(zip(indexes, self.offsets, self.sizes, self.strides)):
+            index -= offset
+            if not 0 <= index < size:
+                self.index_error(dimension, index + offset)
+            position += index * stride
+        return position
+
+    def index_error(self, dimension, ordinal):
+        lower, upper = self.bounds[dimension]
+        index = chr(ordinal) if isinstance(lower, str) else ordinal
+        raise PascalRuntimeError(
+            error_code=ErrorCode.RUNTIME_ERROR,
+            message=f"Array index {index} outside bounds {lower}..{upper}",
+        )
+
+    def get_indexes(self, indexes):
+        return self.elements[self.position(indexes)]
+
+    def set_indexes(self, indexes, value):
+        self.elements[self.position(indexes)] = value
+
+    def get_pair(self, row, column):
+        return self.elements[self.position((row, column))]
+
+    def set_pair(self, row, column, value):
+        self.elements[self.position((row, column))] = value
+
+    def index_value(self, dimension, ordinal):
+        lower = self.bounds[dimension][0]
+        if isinstance(lower, str):
+            return chr(ordinal)
+        return type(lower)(ordinal)
+
+    def as_dict(self):
+        """The assigned elements as nested dicts keyed by str(index), one level per dimension."""
+        result = {}
+        for position, value in enumerate(self.elements):
+            if value is None:
+                continue
+            keys = []
+            for dimension, (offset, size, stride) in enumerate(zip(self.offsets, self.sizes, self.strides)):
+                keys.append(str(self.index_value(dimension, offset + position // stride % size)))
+            row = result
+            for key in keys[:-1]:
+                row = row.setdefault(key, {})
+            row[keys[-1]] = value
+        return result
+
+    def __eq__(self, other):
+        if isinstance(other, (PascalArray, PascalMultiArray)):
+            return self.as_dict() == other.as_dict()
+        if isinstance(other, dict):
+            return self.as_dict() == other
+        return False
+
+    def __repr__(self):
+        return repr(self.as_dict())
+
+
+class PascalMatrix(PascalMultiArray):
+    """A two-dimensional PascalMultiArray with ordinal (non-CHAR) index types, the
+    common case. The offsets and sizes are held in plain attributes and the offset
+    computation is unrolled into each access."""
+    __slots__ = ('row_offset', 'column_offset', 'row_size', 'column_size')
+
+    def __init__(self, bounds):
+        super().__init__(bounds)
+        self.row_offset, self.column_offset = self.offsets
+        self.row_size, self.column_size = self.sizes
+
+    def get_pair(self, row, column):
+        row_position = row - self.row_offset
+        column_position = column - self.column_offset
+        if 0 <= row_position < self.row_size and 0 <= column_position < self.column_size:
+            return self.elements[row_position * self.column_size + column_position]
+        return self.elements[self.position((row, column))]
+
+    def set_pair(self, row, column, value):
+        row_position = row - self.row_offset
+        column_position = column - self.column_offset
+        if 0 <= row_position < self.row_size and 0 <= column_position < self.column_size:
+            self.elements[row_position * self.column_size + column_position] = value
+        else:
+            self.elements[self.position((row, column))] = value
+
+
+class SparsePascalArray(dict):
+    """One dimension of an array with an index type without declared bounds, such as
+    INTEGER, or with such an index type in a later dimension. Elements are keyed by
+    str(index), and the rows of the next dimension are created on first use."""
     def __init__(self, lower=None, upper=None, component_type=None, dimension=0):
         super().__init__()
         self.lower = lower
@@ -320,28 +575,133 @@ class PascalArray(dict):
             self[key] = array_value_for_type(self.component_type, self.dimension + 1)
         return self[key]
 
+    def get_indexes(self, indexes):
+        if len(indexes) == 1:
+            return self.get_index(indexes[0])
+        return self.get_or_create_index(indexes[0]).get_indexes(indexes[1:])
+
+    def set_indexes(self, indexes, value):
+        if len(indexes) == 1:
+            self.set(indexes[0], value)
+        else:
+            self.get_or_create_index(indexes[0]).set_indexes(indexes[1:], value)
+
+    def get_pair(self, row, column):
+        return self.get_or_create_index(row).get_indexes((column,))
+
+    def set_pair(self, row, column, value):
+        self.get_or_create_index(row).set_indexes((column,), value)
+
 
 def array_bounds(index_type):
     lower = upper = None
     if hasattr(index_type, "lower"):
         lower = index_type.lower.value
         upper = index_type.upper.value
+    elif isinstance(index_type, EnumType):
+        lower, upper = 0, len(index_type.values) - 1
+    elif index_type.data_type == DataType.BOOLEAN:
+        lower, upper = False, True
+    elif index_type.data_type == DataType.CHAR:
+        lower, upper = chr(0), chr(255)
     return lower, upper
 
 
 def array_value_for_type(type_node, dimension=0):
+    """A new array holding the dimensions of type_node from dimension onwards."""
     if isinstance(type_node, ArrayType):
-        index_type = type_node.indexTypes[dimension]
-        lower, upper = array_bounds(index_type)
-        return PascalArray(lower, upper, type_node, dimension)
+        bounds = [array_bounds(index_type) for index_type in type_node.indexTypes[dimension:]]
+        if any(lower is None or upper is None for lower, upper in bounds):
+            lower, upper = bounds[0]
+            return SparsePascalArray(lower, upper, type_node, dimension)
+        if len(bounds) == 2 and not isinstance(bounds[0][0], str) and not isinstance(bounds[1][0], str):
+            return PascalMatrix(bounds)
+        if len(bounds) > 1:
+            return PascalMultiArray(bounds)
+        lower, upper = bounds[0]
+        if isinstance(lower, str):
+            return CharIndexedArray(lower, upper)
+        return PascalArray(lower, upper)
     return None
 
 
-class PascalSet(set):
+# the conversion from an ordinal back to a set member, by the type of the members
+SET_ELEMENT_TYPES = {str: chr, bool: bool}
+
+
+class PascalSet:
+    """A set of an ordinal type (subrange, enumeration, CHAR or BOOLEAN) held as an
+    integer bitmask: bit n is set when the member with ordinal n is in the set.
+
+    Union (+), difference (-), intersection (*), IN and equality are each a single
+    integer operation. A set is not changed once built, so a literal with
+    constant members can be built once and shared."""
+    __slots__ = ('mask', 'element')
+
+    def __init__(self, elements=(), mask=0, element=None):
+        self.mask = mask
+        # turns a bit position back into a member; None until the set first holds one
+        self.element = element
+        for value in elements:
+            self.include(value)
+
+    def ordinal(self, value):
+        if self.element is None:
+            self.element = SET_ELEMENT_TYPES.get(type(value), int)
+        if value.__class__ is str:
+            value = ord(value)
+        if value < 0:
+            raise PascalRuntimeError(
+                error_code=ErrorCode.RUNTIME_ERROR,
+                message=f"Set element {value} is negative",
+            )
+        return value
+
+    def include(self, value):
+        self.mask |= 1 << self.ordinal(value)
+
+    def include_range(self, lower, upper):
+        lower = self.ordinal(lower)
+        upper = self.ordinal(upper)
+        if upper >= lower:
+            self.mask |= ((1 << (upper - lower + 1)) - 1) << lower
+
+    def __contains__(self, value):
+        if value.__class__ is str:
+            value = ord(value)
+        return value >= 0 and (self.mask >> value) & 1 == 1
+
+    def __add__(self, other):
+        return PascalSet(mask=self.mask | other.mask, element=self.element or other.element)
+
+    def __sub__(self, other):
+        return PascalSet(mask=self.mask & ~other.mask, element=self.element or other.element)
+
+    def __mul__(self, other):
+        return PascalSet(mask=self.mask & other.mask, element=self.element or other.element)
+
+    def __iter__(self):
+        mask = self.mask
+        element = self.element
+        while mask:
+            lowest = mask & -mask
+            yield element(lowest.bit_length() - 1)
+            mask ^= lowest
+
+    def __len__(self):
+        return bin(self.mask).count('1')
+
     def __eq__(self, other):
+        if isinstance(other, PascalSet):
+            return self.mask == other.mask
         if isinstance(other, list):
-            return sorted(self) == other
-        return super().__eq__(other)
+            return list(self) == other
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
 
 
 class PointerValue:
@@ -350,26 +710,143 @@ class PointerValue:
         self.disposed = False
 
 
+# steps taken between two looks at the clock when a time limit is set
+LIMIT_CHECK_INTERVAL = 1000
+
+
 class Interpreter(NodeVisitor):
-    def __init__(self, tree, *, interactive_input=False, debugger=None, file_base_dir=None):
+    def __init__(self, tree, *, interactive_input=False, debugger=None, file_base_dir=None,
+                 output=None, output_buffer_size=DEFAULT_OUTPUT_BUFFER_SIZE, stdin=None,
+                 max_steps=None, time_limit=None, max_call_depth=None, profiler=None, count_steps=False,
+                 compiled_forms=None):
         self.tree = tree
-        self.call_stack = CallStack()
+        # the compiling engines keep what they compile the tree into here, so runs that share the dict
+        # compile it once
+        self.compiled_forms = compiled_forms
+        # a profiler hears of every statement started and every activation record pushed and popped
+        self.profiler = profiler
+        self.call_stack = CallStack() if profiler is None else ProfiledCallStack(profiler)
         self.interactive_input = interactive_input
         self.debugger = debugger
-        self.input = PascalInput(sys.stdin)
+        # READ and READLN without a file take their input from stdin, sys.stdin when none is given
+        self.input = PascalInput(stdin if stdin is not None else sys.stdin)
         self.file_base_dir = file_base_dir
+        # every file variable made during the run, closed by close_files() when it ends
+        self.files = []
+        # program output streams to this sink as it is written; without one it is collected
+        # and returned by interpret()
+        self.output_sink = output
+        self.output_buffer_size = output_buffer_size
+        # a step is a loop iteration, a call to a user routine or a GOTO; max_steps bounds how many
+        # a run takes, time_limit its wall-clock seconds and max_call_depth the routines active at once
+        self.max_steps = max_steps
+        self.time_limit = time_limit
+        self.max_call_depth = max_call_depth
+        # whether steps are counted, because a limit is set or count_steps asks for steps_taken(); the
+        # compiling engines only build the checks in when they are
+        self.limited = count_steps or max_steps is not None or time_limit is not None or max_call_depth is not None
+        # steps left before the limits are next looked at, in a list so the compiling engines can bind it
+        # once and count down inline
+        self.countdown = [0]
+        self.start_limits()
+
+    def compiled_form(self, key, build):
+        """The compiled form of the tree stored under key, built and stored by the first run that needs it."""
+        if self.compiled_forms is None:
+            return build()
+        compiled = self.compiled_forms.get(key)
+        if compiled is None:
+            compiled = self.compiled_forms[key] = build()
+        return compiled
+
+    def open_output(self):
+        if self.output_sink is None:
+            return io.StringIO()
+        return StreamingOutput(self.output_sink, self.output_buffer_size)
+
+    def show_output(self):
+        """Put the output written so far in front of the user before the program waits on them, at the
+        debugger prompt or for interactive input. Returns whether there was any."""
+        if self.output_sink is not None:
+            return self.output.flush()
+        text = self.output.getvalue()
+        if text:
+            print(text, end='', flush=True)
+            self.output = io.StringIO()
+        return bool(text)
+
+    def start_limits(self):
+        """Start counting steps and the clock for a run."""
+        self.steps = 0
+        self.deadline = time.monotonic() + self.time_limit if self.time_limit is not None else None
+        self.start_countdown()
+
+    def start_countdown(self):
+        # a step only counts down; the limits are looked at when the countdown reaches zero, which is
+        # at the step that would exceed max_steps or after LIMIT_CHECK_INTERVAL steps, whichever is first
+        chunk = LIMIT_CHECK_INTERVAL if self.deadline is not None else sys.maxsize
+        if self.max_steps is not None:
+            chunk = min(chunk, self.max_steps - self.steps + 1)
+        self.chunk = self.countdown[0] = chunk
+
+    def steps_taken(self):
+        """The steps taken so far in the run; exact only when steps are counted."""
+        return self.steps + self.chunk - self.countdown[0]
+
+    def tick(self):
+        """Count a step: called at loop back-edges, routine calls and GOTOs, never per expression."""
+        countdown = self.countdown
+        countdown[0] -= 1
+        if not countdown[0]:
+            self.check_limits()
+
+    def check_limits(self):
+        self.steps += self.chunk
+        # the chunk is in steps now, so steps_taken() must not count it again if a limit is exceeded
+        self.chunk = self.countdown[0] = 0
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise PascalRuntimeError(
+                error_code=ErrorCode.STEP_LIMIT_EXCEEDED,
+                message=f"Step limit of {self.max_steps} exceeded",
+            )
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise PascalRuntimeError(
+                error_code=ErrorCode.TIME_LIMIT_EXCEEDED,
+                message=f"Time limit of {self.time_limit} seconds exceeded",
+            )
+        self.start_countdown()
+
+    def count_call(self):
+        """Count a call to a user routine as a step; called before the callee's frame is pushed."""
+        if self.max_call_depth is not None and len(self.call_stack) > self.max_call_depth:
+            self.call_depth_error()
+        self.tick()
+
+    def call_depth_error(self):
+        raise PascalRuntimeError(
+            error_code=ErrorCode.CALL_DEPTH_EXCEEDED,
+            message=f"Call depth limit of {self.max_call_depth} exceeded",
+        )
+
+    def close_files(self):
+        """Close the files the program left open so what it wrote is on disk once the run is over."""
+        for pascal_file in self.files:
+            pascal_file.close()
 
     def interpret(self):
-        self.output = io.StringIO()
+        self.output = self.open_output()
         tree = self.tree
         if tree is None:
             return ''
+        self.start_limits()
         quit_requested = False
         try:
             rv = self.visit(self.tree)
         except DebuggerQuit:
             quit_requested = True
             rv = self.call_stack.peek() if self.call_stack._records else None
+        finally:
+            self.output.flush()
 
         if self.debugger is not None and not quit_requested:
             self.debugger.program_finished(rv)
@@ -384,11 +861,9 @@ class Interpreter(NodeVisitor):
             name=program_name,
             ar_type=ARType.PROGRAM,
             nesting_level=1,
+            layout=node.frame_layout,
         )
-
-        for decl in node.block.declarations:
-            if isinstance(decl, VariableDeclaration):
-                ar.set_new(decl.name, self.initial_value(decl.type), decl.type.data_type, self.declaration_bounds(decl))
+        self.initialize_frame(ar)
 
         self.call_stack.push(ar)
 
@@ -400,22 +875,21 @@ class Interpreter(NodeVisitor):
         return self.call_stack.pop()
 
     def visit_Block(self, node: Block):
-        for declaration in node.declarations:
-            self.visit(declaration)
+        # variables were laid out by the semantic analyzer and initialized with the frame
         self.visit(node.compound_statement)
 
-    def visit_VariableDeclaration(self, node: VariableDeclaration):
-        ar = self.call_stack.peek()
-        ar.set_new(node.name, self.initial_value(node.type), node.type.data_type, self.declaration_bounds(node))
+    def initialize_frame(self, ar):
+        slots = ar.slots
+        for slot, type_node in ar.layout.fresh:
+            slots[slot] = self.initial_value(type_node)
 
     def initial_value(self, type_node):
         if isinstance(type_node, ArrayType):
-            lower, upper = array_bounds(type_node.indexType)
-            return PascalArray(lower, upper, type_node)
+            return array_value_for_type(type_node)
         if isinstance(type_node, SetType):
             return PascalSet()
         if isinstance(type_node, FileType):
-            return PascalFile(self.file_base_dir, type_node.componentType)
+            return self.new_file(type_node.componentType)
         if isinstance(type_node, PointerType):
             return None
         if isinstance(type_node, RecordType):
@@ -424,35 +898,57 @@ class Interpreter(NodeVisitor):
                 for field in type_node.fields
             }
         if type_node.data_type == DataType.TEXT:
-            return PascalFile(self.file_base_dir)
+            return self.new_file()
         return None
 
-    def declaration_bounds(self, declaration):
-        if hasattr(declaration.type, "lower"):
-            return (declaration.type.lower.value, declaration.type.upper.value)
-        return None
+    def new_file(self, component_type=None):
+        pascal_file = PascalFile(self.file_base_dir, component_type)
+        self.files.append(pascal_file)
+        return pascal_file
 
     def visit_Type(self, node):
         pass
 
     def visit_Compound(self, node):
-        label_indexes = {
-            child.label: index
-            for index, child in enumerate(node.children)
-            if isinstance(child, LabelStatement)
-        }
+        if node.table is None:
+            for child in node.children:
+                self.visit(child)
+            return
 
+        # run the flattened steps: a lowered GOTO is a jump, any other one a GotoSignal
+        labels = node.table.labels
+        steps = node.table.steps
+        end = len(steps)
+        depth = len(self.call_stack)
         index = 0
-        while index < len(node.children):
+        while True:
             try:
-                self.visit(node.children[index])
-                index += 1
+                while index < end:
+                    operation, statement, target = steps[index]
+                    index += 1
+                    if operation == STATEMENT:
+                        self.visit(statement)
+                    elif operation == JUMP_IF_FALSE:
+                        if not self.visit(statement.expr):
+                            index = target
+                    elif operation == JUMP:
+                        index = target
+                    elif operation == TICK:
+                        self.tick()
+                    else:
+                        self.before_statement(statement)
+                return
             except GotoSignal as signal:
-                if signal.label not in label_indexes:
+                if signal.label not in labels:
                     raise
-                index = label_indexes[signal.label]
+                # a GOTO out of a routine leaves the frames of the routines it jumps out of
+                while len(self.call_stack) > depth:
+                    self.call_stack.pop()
+                index = labels[signal.label]
 
     def before_statement(self, node):
+        if self.profiler is not None:
+            self.profiler.statement(node)
         if self.debugger is not None:
             self.debugger.before_statement(node, self.call_stack)
 
@@ -462,8 +958,14 @@ class Interpreter(NodeVisitor):
         self.assign_variable(node.lhs, val)
 
     def assign_variable(self, variable, val):
-        ar = self.call_stack.peek()
-        if isinstance(variable, FieldVariable):
+        if type(variable) is Ident:
+            level = getattr(variable, "scope_level", None)
+            if level is not None:
+                self.call_stack._display[level].store(variable.slot, val)
+                return
+            ar, slot = self.variable_location(variable)
+            ar.store(slot, val)
+        elif isinstance(variable, FieldVariable):
             record_value = self.visit(variable.record)
             record_value[variable.field_name.value] = val
         elif isinstance(variable, DereferenceVariable):
@@ -471,14 +973,28 @@ class Interpreter(NodeVisitor):
             self.check_pointer(pointer_value)
             pointer_value.value = val
         elif hasattr(variable, "index_expression"):
-            array_name = variable.name.value
-            array_value = ar.get(array_name)
-            indexes = [self.visit(expr) for expr in variable.index_expressions]
-            for index in indexes[:-1]:
-                array_value = array_value.get_or_create_index(index)
-            array_value.set(indexes[-1], val)
+            ar, slot = self.variable_location(variable.name)
+            array_value = ar.load(slot)
+            index_expressions = variable.index_expressions
+            if len(index_expressions) == 1:
+                array_value.set(self.visit(variable.index_expression), val)
+            elif len(index_expressions) == 2:
+                array_value.set_pair(self.visit(index_expressions[0]), self.visit(index_expressions[1]), val)
+            else:
+                array_value.set_indexes([self.visit(expr) for expr in index_expressions], val)
         else:
-            ar.assign_existing(variable.value, val)
+            ar, slot = self.variable_location(variable)
+            ar.store(slot, val)
+
+    def variable_location(self, node):
+        # the analyzer records the nesting level of the frame declaring each
+        # variable and its slot there; the display then gives that frame
+        # without a chain walk
+        level = getattr(node, "scope_level", None)
+        if level is None:
+            ar = self.call_stack.peek().find_record_containing(node.value)
+            return ar, ar.layout.index[node.value]
+        return self.call_stack._display[level], node.slot
 
     def visit_LabelStatement(self, node: LabelStatement):
         self.before_statement(node)
@@ -486,23 +1002,26 @@ class Interpreter(NodeVisitor):
 
     def visit_GotoStatement(self, node: GotoStatement):
         self.before_statement(node)
+        self.tick()
         raise GotoSignal(node.label)
 
     def visit_Ident(self, node):
-        var_name = node.value
-
-        ar = self.call_stack.peek()
-        var_value = ar.get(var_name)
-
-        return var_value
+        # the common case of variable_location, inline: reading variables is the hottest path
+        level = getattr(node, "scope_level", None)
+        if level is not None:
+            return self.call_stack._display[level].load(node.slot)
+        ar, slot = self.variable_location(node)
+        return ar.load(slot)
 
     def visit_IndexedVariable(self, node):
-        ar = self.call_stack.peek()
-        array_value = ar.get(node.name.value)
-        indexes = [self.visit(expr) for expr in node.index_expressions]
-        for index in indexes[:-1]:
-            array_value = array_value.get_or_create_index(index)
-        return array_value.get_index(indexes[-1])
+        ar, slot = self.variable_location(node.name)
+        array_value = ar.load(slot)
+        index_expressions = node.index_expressions
+        if len(index_expressions) == 1:
+            return array_value.get_index(self.visit(node.index_expression))
+        if len(index_expressions) == 2:
+            return array_value.get_pair(self.visit(index_expressions[0]), self.visit(index_expressions[1]))
+        return array_value.get_indexes([self.visit(expr) for expr in index_expressions])
 
     def visit_FieldVariable(self, node):
         record_value = self.visit(node.record)
@@ -551,16 +1070,13 @@ class Interpreter(NodeVisitor):
         elif node.op.value == "WRITE":
             output_target.write("".join(l))
 
-        if self.debugger is not None and self.output.getvalue():
-            print(self.output.getvalue(), end='', flush=True)
+        if self.debugger is not None and self.show_output():
             self.debugger.notify_program_output()
-            self.output = io.StringIO()
 
     def visit_Input(self, node):
         self.before_statement(node)
         if self.interactive_input:
-            print(self.output.getvalue(), end='', flush=True)
-            self.output = io.StringIO()
+            self.show_output()
 
         arguments = node.arguments
         input_source = self.input
@@ -588,7 +1104,8 @@ class Interpreter(NodeVisitor):
             return variable.field_declaration.type.data_type
         if hasattr(variable, "index_expressions"):
             return variable.component_type
-        return self.call_stack.peek().get_type(variable.value)
+        ar, slot = self.variable_location(variable)
+        return ar.layout.types[slot]
 
     def is_text_file_variable(self, node):
         return self.is_file_variable(node) and self.variable_type(node) is DataType.TEXT
@@ -640,6 +1157,9 @@ class Interpreter(NodeVisitor):
     def visit_CharConstant(self, node):
         return node.value
 
+    def visit_SetConstant(self, node):
+        return node.value
+
     def visit_BooleanConstant(self, node):
         return node.value == "TRUE"
 
@@ -650,14 +1170,9 @@ class Interpreter(NodeVisitor):
         result = PascalSet()
         for element in node.elements:
             if isinstance(element, tuple):
-                lower = self.visit(element[0])
-                upper = self.visit(element[1])
-                if isinstance(lower, str) and isinstance(upper, str):
-                    result.update(chr(value) for value in range(ord(lower), ord(upper) + 1))
-                else:
-                    result.update(range(lower, upper + 1))
+                result.include_range(self.visit(element[0]), self.visit(element[1]))
             else:
-                result.add(self.visit(element))
+                result.include(self.visit(element))
         return result
 
     def visit_ProcedureCall(self, node: ProcedureCall):
@@ -730,24 +1245,28 @@ class Interpreter(NodeVisitor):
                 self.visit(node.actual_params[0]).flush()
             return
 
+        self.count_call()
         ar = ActivationRecord(
             name=proc_name,
             ar_type=ARType.PROCEDURE,
             nesting_level=proc_symbol.scope_level + 1,
-            parent_ar=self.call_stack.peek(),
+            parent_ar=self.call_stack._display[proc_symbol.scope_level],
+            layout=proc_symbol.frame_layout,
         )
+        self.initialize_frame(ar)
 
 
         # store the arguments in the activation record
         formal_params = proc_symbol.formal_params
         actual_params = node.actual_params
 
-        for param_symbol, argument_node in zip(formal_params, actual_params):
+        # the parameters occupy the first slots of the frame, in order
+        for slot, (param_symbol, argument_node) in enumerate(zip(formal_params, actual_params)):
             if param_symbol.by_reference:
-                target_ar = self.call_stack.peek().find_record_containing(argument_node.value)
-                ar.set_reference(param_symbol.name, target_ar, argument_node.value, param_symbol.type)
+                target_ar, target_slot = self.variable_location(argument_node)
+                ar.bind_reference(slot, target_ar, target_slot)
             else:
-                ar.set_new(param_symbol.name, self.visit(argument_node), param_symbol.type)
+                ar.slots[slot] = self.visit(argument_node)
 
         self.call_stack.push(ar)
 
@@ -838,27 +1357,28 @@ class Interpreter(NodeVisitor):
             if func_name == "UPCASE":
                 return self.visit(node.actual_params[0]).upper()
 
+        self.count_call()
         ar = ActivationRecord(
             name=func_name,
             ar_type=ARType.FUNCTION,
             nesting_level=func_symbol.scope_level + 1,
-            parent_ar=self.call_stack.peek(),
+            parent_ar=self.call_stack._display[func_symbol.scope_level],
+            layout=func_symbol.frame_layout,
         )
+        self.initialize_frame(ar)
 
 
         # store the arguments in the activation record
         formal_params = func_symbol.formal_params
         actual_params = node.actual_params
 
-        for param_symbol, argument_node in zip(formal_params, actual_params):
+        # the parameters occupy the first slots of the frame, in order
+        for slot, (param_symbol, argument_node) in enumerate(zip(formal_params, actual_params)):
             if param_symbol.by_reference:
-                target_ar = self.call_stack.peek().find_record_containing(argument_node.value)
-                ar.set_reference(param_symbol.name, target_ar, argument_node.value, param_symbol.type)
+                target_ar, target_slot = self.variable_location(argument_node)
+                ar.bind_reference(slot, target_ar, target_slot)
             else:
-                ar.set_new(param_symbol.name, self.visit(argument_node), param_symbol.type)
-        # add a member with the function name for the return
-        ar.set_new(func_name, None, func_symbol.return_type)
-
+                ar.slots[slot] = self.visit(argument_node)
         self.call_stack.push(ar)
 
         #print(f'ENTER: FUNCTION {func_name}')
@@ -868,7 +1388,7 @@ class Interpreter(NodeVisitor):
         self.visit(func_symbol.block_ast)
 
         #get the return value from the activation record
-        rv = ar[func_name]
+        rv = ar.slots[func_symbol.result_slot]
 
         #print(f'LEAVE: FUNCTION {func_name}')
         #print(str(self.call_stack))
@@ -902,16 +1422,12 @@ class Interpreter(NodeVisitor):
 
     def visit_BinaryOp(self, node):
         lhs = self.visit(node.lhs)
-        rhs = self.visit(node.rhs)
         op = node.token.type
+        # under {$B-} a false lhs decides an AND and a true one an OR
+        if node.short_circuit and bool(lhs) == (op == TokenType.OR):
+            return lhs
+        rhs = self.visit(node.rhs)
 
-        if isinstance(lhs, set) and isinstance(rhs, set):
-            if op == TokenType.PLUS:
-                return PascalSet(lhs | rhs)
-            if op == TokenType.MINUS:
-                return PascalSet(lhs - rhs)
-            if op == TokenType.MUL:
-                return PascalSet(lhs & rhs)
         if op == TokenType.PLUS:
             return lhs + rhs
         if op == TokenType.MINUS:
@@ -952,6 +1468,78 @@ class Interpreter(NodeVisitor):
         elif op == TokenType.NOT:
             return not self.visit(node.operand)
 
+    # the specialized operators the optimizer lowers BinaryOp and UnaryOp to
+
+    def visit_Add(self, node):
+        return self.visit(node.lhs) + self.visit(node.rhs)
+
+    def visit_Subtract(self, node):
+        return self.visit(node.lhs) - self.visit(node.rhs)
+
+    def visit_Multiply(self, node):
+        return self.visit(node.lhs) * self.visit(node.rhs)
+
+    def visit_RealDivide(self, node):
+        return self.visit(node.lhs) / self.visit(node.rhs)
+
+    def visit_IntegerDivide(self, node):
+        return self.visit(node.lhs) // self.visit(node.rhs)
+
+    def visit_Modulo(self, node):
+        return self.visit(node.lhs) % self.visit(node.rhs)
+
+    def visit_Equal(self, node):
+        return self.visit(node.lhs) == self.visit(node.rhs)
+
+    def visit_NotEqual(self, node):
+        return self.visit(node.lhs) != self.visit(node.rhs)
+
+    def visit_Less(self, node):
+        return self.visit(node.lhs) < self.visit(node.rhs)
+
+    def visit_LessEqual(self, node):
+        return self.visit(node.lhs) <= self.visit(node.rhs)
+
+    def visit_Greater(self, node):
+        return self.visit(node.lhs) > self.visit(node.rhs)
+
+    def visit_GreaterEqual(self, node):
+        return self.visit(node.lhs) >= self.visit(node.rhs)
+
+    def visit_SetUnion(self, node):
+        return self.visit(node.lhs) + self.visit(node.rhs)
+
+    def visit_SetDifference(self, node):
+        return self.visit(node.lhs) - self.visit(node.rhs)
+
+    def visit_SetIntersection(self, node):
+        return self.visit(node.lhs) * self.visit(node.rhs)
+
+    def visit_SetMembership(self, node):
+        return self.visit(node.lhs) in self.visit(node.rhs)
+
+    def visit_And(self, node):
+        lhs = self.visit(node.lhs)
+        rhs = self.visit(node.rhs)
+        return lhs and rhs
+
+    def visit_Or(self, node):
+        lhs = self.visit(node.lhs)
+        rhs = self.visit(node.rhs)
+        return lhs or rhs
+
+    def visit_AndThen(self, node):
+        return self.visit(node.lhs) and self.visit(node.rhs)
+
+    def visit_OrElse(self, node):
+        return self.visit(node.lhs) or self.visit(node.rhs)
+
+    def visit_Negate(self, node):
+        return -self.visit(node.operand)
+
+    def visit_Not(self, node):
+        return not self.visit(node.operand)
+
     def visit_NoOp(self, node):
         pass
 
@@ -964,27 +1552,24 @@ class Interpreter(NodeVisitor):
 
     def visit_CaseStatement(self, node: CaseStatement):
         self.before_statement(node)
-        case_value = self.visit(node.expr)
-        for labels, statement in node.branches:
-            for label in labels:
-                if self.case_label_matches(case_value, label):
-                    self.visit(statement)
-                    return
-        self.visit(node.else_statement)
-
-    def case_label_matches(self, case_value, label):
-        if isinstance(label, tuple):
-            return self.visit(label[0]) <= case_value <= self.visit(label[1])
-        return case_value == self.visit(label)
+        branch = node.table.lookup(self.visit(node.expr))
+        if branch is None:
+            self.visit(node.else_statement)
+        else:
+            self.visit(node.branches[branch][1])
 
     def visit_WhileStatement(self, node):
         self.before_statement(node)
+        tick = self.tick
         while(self.visit(node.expr)):
+            tick()
             self.visit(node.statement)
 
     def visit_RepeatUntilStatement(self, node: RepeatUntilStatement):
         self.before_statement(node)
+        tick = self.tick
         while True:
+            tick()
             for statement in node.statements:
                 self.visit(statement)
             if self.visit(node.expr):
@@ -992,19 +1577,21 @@ class Interpreter(NodeVisitor):
 
     def visit_ForStatement(self, node: ForStatement):
         self.before_statement(node)
-        var_name = node.id.value
         val_init = self.visit(node.expr1)
-        ar = self.call_stack.peek()
-        ar.assign_existing(var_name, val_init)
+        ar, slot = self.variable_location(node.id)
+        ar.store(slot, val_init)
         val_final = self.visit(node.expr2)
+        tick = self.tick
         if node.dir.type == TokenType.TO:
-            while ar.get(var_name) <= val_final:
+            while ar.load(slot) <= val_final:
+                tick()
                 self.visit(node.statement)
-                ar.assign_existing(var_name, ar.get(var_name) + 1)
+                ar.store(slot, ar.load(slot) + 1)
         else:
-            while ar.get(var_name) >= val_final:
+            while ar.load(slot) >= val_final:
+                tick()
                 self.visit(node.statement)
-                ar.assign_existing(var_name, ar.get(var_name) - 1)
+                ar.store(slot, ar.load(slot) - 1)
 
     def visit_WithStatement(self, node: WithStatement):
         self.before_statement(node)
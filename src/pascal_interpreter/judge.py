@@ -0,0 +1,121 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+
+INPUT_SUFFIX = ".in"
+EXPECTED_SUFFIX = ".out"
+
+# errors a run can end with that are not Pascal runtime errors: input that runs out or does not
+# convert to the type READ asks for
+INPUT_ERRORS = (EOFError, ValueError)
+
+# the program a worker process runs its cases with and the execution limits of each run, set once
+# when the worker starts
+_compiled = None
+_limits = {}
+
+
+class OutputDiverged(Exception):
+    """Raised by ExpectedOutput to stop a case at the first write that differs from the expected output."""
+
+
+class ExpectedOutput:
+    """Output sink that compares program output with the expected output as it is written.
+
+        A write that does not continue the expected output raises OutputDiverged, which ends the
+        run there. Without expected output the writes are only counted."""
+
+    __slots__ = ('expected', 'position', 'diverged')
+
+    def __init__(self, expected=None):
+        self.expected = expected
+        self.position = 0
+        self.diverged = False
+
+    def write(self, text):
+        if self.expected is not None:
+            end = self.position + len(text)
+            if self.diverged or self.expected[self.position:end] != text:
+                self.diverged = True
+                raise OutputDiverged()
+        self.position += len(text)
+
+    def matched(self):
+        """Whether everything expected was written and nothing else."""
+        return not self.diverged and self.position == len(self.expected)
+
+
+def find_cases(input_dir):
+    """The (name, input path, expected path or None) of every input file in input_dir, by name."""
+    cases = []
+    for input_path in sorted(Path(input_dir).glob("*" + INPUT_SUFFIX)):
+        expected_path = input_path.with_suffix(EXPECTED_SUFFIX)
+        cases.append((input_path.stem, str(input_path), str(expected_path) if expected_path.is_file() else None))
+    return cases
+
+
+def _start_worker(compiled, limits):
+    global _compiled, _limits
+    _compiled = compiled
+    _limits = limits
+
+
+def run_case(case):
+    """Run one case in a worker and return its result: the exit code (None when stopped early), whether
+    its output matched (None without expected output), whether it was stopped early, how long it ran
+    and the error that ended it, if any. A case whose input runs out or cannot be read fails with
+    exit code 1 rather than stopping the judge."""
+    name, input_path, expected_path = case
+    stdin = Path(input_path).read_text()
+    sink = ExpectedOutput(Path(expected_path).read_text() if expected_path is not None else None)
+
+    error = None
+    start = time.perf_counter()
+    try:
+        (_, _, exitcode) = _compiled.run(stdin=stdin, output=sink, output_buffer_size=0, **_limits)
+    except OutputDiverged:
+        exitcode = None
+    except INPUT_ERRORS as e:
+        exitcode = 1
+        error = f"{type(e).__name__}: {e}"
+    seconds = time.perf_counter() - start
+
+    passed = None
+    if error is not None:
+        passed = False
+    elif expected_path is not None:
+        passed = exitcode == 0 and sink.matched()
+    return {
+        "name": name,
+        "exitcode": exitcode,
+        "passed": passed,
+        "stopped_early": sink.diverged,
+        "seconds": round(seconds, 6),
+        "error": error,
+    }
+
+
+def judge_program(compiled, input_dir, *, jobs=None, limits=None):
+    """Run compiled against every case in input_dir across a pool of jobs worker processes (one per
+    CPU by default) and return the summary. limits holds the max_steps, time_limit and max_call_depth
+    each case runs with.
+
+    The compiled program is sent to each worker once, when it starts, rather than with every case."""
+    cases = find_cases(input_dir)
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count(), initializer=_start_worker,
+                             initargs=(compiled, limits or {})) as executor:
+        results = list(executor.map(run_case, cases))
+    seconds = time.perf_counter() - start
+
+    return {
+        "program": compiled.source_name,
+        "engine": compiled.engine,
+        "cases": results,
+        "passed": sum(1 for result in results if result["passed"] is True),
+        "failed": sum(1 for result in results if result["passed"] is False),
+        "unchecked": sum(1 for result in results if result["passed"] is None),
+        "seconds": round(seconds, 6),
+    }
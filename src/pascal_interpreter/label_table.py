@@ -0,0 +1,111 @@
+from .pascal_ast import Compound, GotoStatement, IFStatement, LabelStatement, RepeatUntilStatement, WhileStatement
+
+
+# the operations of the (operation, node, target) steps of a LabelTable
+STATEMENT = 0       # run the statement node
+HOOK = 1            # the statement hook of node, whose parts follow as steps of their own
+TICK = 2            # count a step towards the execution limits
+JUMP = 3            # continue at step target
+JUMP_IF_FALSE = 4   # continue at step target when node.expr, the condition of node, is false
+
+
+def jumps_to(node, labels):
+    """Whether node holds a GOTO to one of labels that a LabelTable can lower to a jump."""
+    if isinstance(node, GotoStatement):
+        return node.label in labels
+    if isinstance(node, Compound):
+        # a compound with labels of its own keeps its own table
+        return node.table is None and any(jumps_to(child, labels) for child in node.children)
+    if isinstance(node, LabelStatement):
+        return jumps_to(node.statement, labels)
+    if isinstance(node, IFStatement):
+        return jumps_to(node.statement, labels) or jumps_to(node.else_statement, labels)
+    if isinstance(node, WhileStatement):
+        return jumps_to(node.statement, labels)
+    if isinstance(node, RepeatUntilStatement):
+        return any(jumps_to(statement, labels) for statement in node.statements)
+    return False
+
+
+class LabelTable:
+    """LabelTable - the children of a compound statement with labels, flattened into steps run with a program counter.
+
+        labels maps each label of the compound to the index of its first step. A GOTO to one of them
+        that sits in IF, WHILE and REPEAT statements and compound statements without labels is lowered
+        to a JUMP, and the statements around it are flattened into conditional jumps over their parts,
+        so a GOTO moves the program counter instead of raising GotoSignal. Any other statement is a
+        single STATEMENT step. A GOTO the table does not lower, such as one inside a FOR loop, still
+        raises GotoSignal, which the engines resolve through labels. The semantic analyzer builds one
+        for every compound statement with labels."""
+
+    __slots__ = ('labels', 'steps')
+
+    def __init__(self, compound):
+        self.labels = {}
+        self.steps = []
+        targets = {child.label for child in compound.children if isinstance(child, LabelStatement)}
+        gotos = []
+        for child in compound.children:
+            if isinstance(child, LabelStatement):
+                self.labels[child.label] = len(self.steps)
+            self.flatten(child, targets, gotos)
+        # a GOTO can jump forward, so the steps of the labels are known only now
+        for index in gotos:
+            _, node, _ = self.steps[index]
+            self.steps[index] = (JUMP, node, self.labels[node.label])
+
+    def emit(self, operation, node, target=None):
+        self.steps.append((operation, node, target))
+        return len(self.steps) - 1
+
+    def patch(self, index, target):
+        operation, node, _ = self.steps[index]
+        self.steps[index] = (operation, node, target)
+
+    def flatten(self, node, targets, gotos):
+        """Append the steps of node, keeping the statement hooks and step counts of the engines."""
+        if not jumps_to(node, targets):
+            self.emit(STATEMENT, node)
+        elif isinstance(node, GotoStatement):
+            self.emit(HOOK, node)
+            self.emit(TICK, node)
+            gotos.append(self.emit(JUMP, node))
+        elif isinstance(node, Compound):
+            for child in node.children:
+                self.flatten(child, targets, gotos)
+        elif isinstance(node, LabelStatement):
+            self.emit(HOOK, node)
+            self.flatten(node.statement, targets, gotos)
+        elif isinstance(node, IFStatement):
+            self.emit(HOOK, node)
+            branch = self.emit(JUMP_IF_FALSE, node)
+            self.flatten(node.statement, targets, gotos)
+            if node.else_statement is not None:
+                skip = self.emit(JUMP, node)
+                self.patch(branch, len(self.steps))
+                self.flatten(node.else_statement, targets, gotos)
+                self.patch(skip, len(self.steps))
+            else:
+                self.patch(branch, len(self.steps))
+        elif isinstance(node, WhileStatement):
+            self.emit(HOOK, node)
+            top = len(self.steps)
+            branch = self.emit(JUMP_IF_FALSE, node)
+            self.emit(TICK, node)
+            self.flatten(node.statement, targets, gotos)
+            self.emit(JUMP, node, top)
+            self.patch(branch, len(self.steps))
+        else:
+            self.emit(HOOK, node)
+            top = self.emit(TICK, node)
+            for statement in node.statements:
+                self.flatten(statement, targets, gotos)
+            self.emit(JUMP_IF_FALSE, node, top)
+
+    def jump_targets(self):
+        """The indexes of the steps a jump or a label can continue at, in order."""
+        targets = {0}
+        targets.update(self.labels.values())
+        targets.update(target for operation, _, target in self.steps if operation in (JUMP, JUMP_IF_FALSE))
+        # a jump past the last step ends the compound
+        return sorted(target for target in targets if target < len(self.steps))
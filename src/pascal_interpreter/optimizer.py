@@ -0,0 +1,220 @@
+from .bytecode import build_set, constant_value
+from .closure_interpreter import BINARY_OPERATIONS
+from .data_type import DataType
+from .error_code import PascalRuntimeError
+from .interpreter import PascalSet
+from .pascal_ast import slot_names, AST, Type, Constant, NilConstant, IntegerConstant, RealConstant, StringConstant, CharConstant, \
+    BooleanConstant, SetConstant, BinaryOp, UnaryOp, FunctionCall, SetLiteral, Add, Subtract, Multiply, RealDivide, \
+    IntegerDivide, Modulo, Equal, NotEqual, Less, LessEqual, Greater, GreaterEqual, SetUnion, SetDifference, \
+    SetIntersection, SetMembership, And, Or, AndThen, OrElse, Negate, Not
+from .symbol import BuiltinFunctionSymbol
+from .token_type import Token, TokenType
+from .vm import BUILTIN_FUNCTIONS
+
+
+UNARY_OPERATIONS = {
+    TokenType.PLUS: lambda operand: +operand,
+    TokenType.MINUS: lambda operand: -operand,
+    TokenType.NOT: lambda operand: not operand,
+}
+
+NUMERIC_TYPES = (DataType.INTEGER, DataType.REAL)
+
+# (operator, operand type) -> the specialized node an analyzed BinaryOp is lowered to
+LOWERED_BINARY_OPS = {
+    **{(TokenType.PLUS, data_type): Add for data_type in NUMERIC_TYPES},
+    **{(TokenType.MINUS, data_type): Subtract for data_type in NUMERIC_TYPES},
+    **{(TokenType.MUL, data_type): Multiply for data_type in NUMERIC_TYPES},
+    **{(TokenType.REAL_DIV, data_type): RealDivide for data_type in NUMERIC_TYPES},
+    (TokenType.INTEGER_DIV, DataType.INTEGER): IntegerDivide,
+    (TokenType.MOD, DataType.INTEGER): Modulo,
+    (TokenType.PLUS, DataType.SET): SetUnion,
+    (TokenType.MINUS, DataType.SET): SetDifference,
+    (TokenType.MUL, DataType.SET): SetIntersection,
+    (TokenType.AND, DataType.BOOLEAN): And,
+    (TokenType.OR, DataType.BOOLEAN): Or,
+}
+
+# operators lowered whatever the type of their operands, which the analyzer has already checked
+LOWERED_ANY_TYPE_OPS = {
+    TokenType.IN: SetMembership,
+    TokenType.EQUAL: Equal,
+    TokenType.NOT_EQUAL: NotEqual,
+    TokenType.LESS: Less,
+    TokenType.LESS_EQUAL: LessEqual,
+    TokenType.GREATER: Greater,
+    TokenType.GREATER_EQUAL: GreaterEqual,
+}
+
+# AND and OR compiled under {$B-}
+SHORT_CIRCUIT_OPS = {
+    TokenType.AND: AndThen,
+    TokenType.OR: OrElse,
+}
+
+LOWERED_UNARY_OPS = {
+    **{(TokenType.MINUS, data_type): Negate for data_type in NUMERIC_TYPES},
+    (TokenType.NOT, DataType.BOOLEAN): Not,
+}
+
+# an evaluation that fails is left in the tree so the program reports it when it runs
+FOLDING_ERRORS = (ArithmeticError, ValueError, TypeError, IndexError, PascalRuntimeError)
+
+
+class Optimizer:
+    """Optimizer - rewrites the analyzed AST in place before it is run.
+
+        Expressions whose operands are all constants are folded into a single constant node: binary and
+        unary operators, builtin functions that depend only on their arguments (SQR, ORD, CHR, SQRT, ...),
+        and set literals, which become a SetConstant holding the built PascalSet. The parser has already
+        replaced named constants, MAXINT and PI among them, by their constant nodes, so 2 * PI folds too.
+
+        Operators left after folding are lowered to the specialized node for their operator and the
+        operand type the analyzer resolved, such as Add for integers or reals, SetUnion for sets and
+        AndThen for an AND parsed under {$B-}, and a unary plus on a number is dropped. An operator
+        whose types were not resolved stays a generic BinaryOp or UnaryOp, which every engine still runs."""
+
+    def __init__(self, tree: AST):
+        self.tree = tree
+        # id(node) -> (node, replacement); a node can be reachable from more than one parent,
+        # such as the first of IndexedVariable.index_expressions, which is also index_expression
+        self.folded = {}
+
+    def optimize(self):
+        if self.tree is None:
+            return None
+        self.rewrite(self.tree)
+        return self.tree
+
+    def rewrite(self, node):
+        """Replace every child expression of node that folds to a constant."""
+        for name in slot_names(type(node)):
+            value = getattr(node, name, None)
+            replacement = self.fold_value(value)
+            if replacement is not value:
+                setattr(node, name, replacement)
+
+    def fold_value(self, value):
+        if isinstance(value, AST):
+            # types hold no run-time expressions, and enumeration types refer back to their constants
+            if isinstance(value, Type):
+                return value
+            return self.fold(value)
+        if isinstance(value, list):
+            replacements = [self.fold_value(item) for item in value]
+            if any(replacement is not item for replacement, item in zip(replacements, value)):
+                value[:] = replacements
+            return value
+        if isinstance(value, tuple):
+            replacements = tuple(self.fold_value(item) for item in value)
+            if any(replacement is not item for replacement, item in zip(replacements, value)):
+                return replacements
+        return value
+
+    def fold(self, node):
+        key = id(node)
+        if key in self.folded:
+            return self.folded[key][1]
+        self.folded[key] = (node, node)
+        self.rewrite(node)
+        folder = getattr(self, 'fold_' + type(node).__name__, None)
+        replacement = folder(node) if folder is not None else node
+        self.folded[key] = (node, replacement)
+        return replacement
+
+    def fold_BinaryOp(self, node: BinaryOp):
+        if not (is_constant(node.lhs) and is_constant(node.rhs)):
+            return lower_binary_op(node)
+        operation = BINARY_OPERATIONS[node.token.type]
+        try:
+            value = operation(constant_value(node.lhs), constant_value(node.rhs))
+        except FOLDING_ERRORS:
+            return lower_binary_op(node)
+        return constant_node(value, node.token) or lower_binary_op(node)
+
+    def fold_UnaryOp(self, node: UnaryOp):
+        operation = UNARY_OPERATIONS.get(node.op.type)
+        if operation is None or not is_constant(node.operand):
+            return lower_unary_op(node)
+        try:
+            value = operation(constant_value(node.operand))
+        except FOLDING_ERRORS:
+            return lower_unary_op(node)
+        return constant_node(value, node.op) or lower_unary_op(node)
+
+    def fold_FunctionCall(self, node: FunctionCall):
+        function = BUILTIN_FUNCTIONS.get(node.func_name)
+        if function is None or not isinstance(node.func_symbol, BuiltinFunctionSymbol):
+            return node
+        if not all(is_constant(param) and not isinstance(param, SetConstant) for param in node.actual_params):
+            return node
+        try:
+            value = function(*(constant_value(param) for param in node.actual_params))
+        except FOLDING_ERRORS:
+            return node
+        char = node.func_name == "CHR" or (node.func_name == "UPCASE" and isinstance(node.actual_params[0], CharConstant))
+        return constant_node(value, node.token, char=char) or node
+
+    def fold_SetLiteral(self, node: SetLiteral):
+        ranges = tuple(isinstance(element, tuple) for element in node.elements)
+        parts = [part for element in node.elements for part in (element if isinstance(element, tuple) else (element,))]
+        if not all(is_constant(part) for part in parts):
+            return node
+        try:
+            value = build_set(ranges, [constant_value(part) for part in parts])
+        except FOLDING_ERRORS:
+            return node
+        return SetConstant(node.token, value)
+
+
+def lower_binary_op(node: BinaryOp):
+    """The specialized node for node's operator and operand type, or node itself when there is none."""
+    if not isinstance(node.operand_type, DataType):
+        return node
+    if node.short_circuit:
+        lowered = SHORT_CIRCUIT_OPS.get(node.op.type)
+    else:
+        lowered = LOWERED_ANY_TYPE_OPS.get(node.op.type) or LOWERED_BINARY_OPS.get((node.op.type, node.operand_type))
+    if lowered is None:
+        return node
+    replacement = lowered(node.lhs, node.op, node.rhs)
+    replacement.short_circuit = node.short_circuit
+    replacement.operand_type = node.operand_type
+    replacement.result_type = node.result_type
+    return replacement
+
+
+def lower_unary_op(node: UnaryOp):
+    if not isinstance(node.operand_type, DataType):
+        return node
+    if node.op.type == TokenType.PLUS and node.operand_type in NUMERIC_TYPES:
+        return node.operand
+    lowered = LOWERED_UNARY_OPS.get((node.op.type, node.operand_type))
+    if lowered is None:
+        return node
+    replacement = lowered(node.op, node.operand)
+    replacement.operand_type = node.operand_type
+    replacement.result_type = node.result_type
+    return replacement
+
+
+def is_constant(node):
+    return isinstance(node, Constant) and not isinstance(node, NilConstant)
+
+
+def constant_node(value, token, char=False):
+    """A constant node for value at token's position, or None when no constant node can hold value."""
+    lineno, column = token.lineno, token.column
+    if isinstance(value, bool):
+        return BooleanConstant(Token(TokenType.BOOLEAN_CONST, "TRUE" if value else "FALSE", lineno, column))
+    if isinstance(value, int):
+        return IntegerConstant(Token(TokenType.INTEGER_CONST, value, lineno, column))
+    if isinstance(value, float):
+        return RealConstant(Token(TokenType.REAL_CONST, value, lineno, column))
+    if isinstance(value, str):
+        if char:
+            return CharConstant(Token(TokenType.CHAR_CONST, value, lineno, column))
+        return StringConstant(Token(TokenType.STRING_CONST, value, lineno, column))
+    if isinstance(value, PascalSet):
+        return SetConstant(token, value)
+    return None
@@ -1,3 +1,6 @@
+from bisect import bisect_right
+from collections import deque
+
 from .error_code import ParserError, ErrorCode
 from .data_type import DataType
 from .symbol import ScopedSymbolTable, VarSymbol, ProcedureSymbol, FunctionSymbol, BuiltinIOSymbol, ConstSymbol, TypeSymbol
@@ -13,12 +16,25 @@ from .token_type import Token
 
 
 class Parser(object):
-    """Parser accepts a list of tokens and returns an abstract syntax tree"""
-
-    def __init__(self, tokens) -> None:
-        self.tokens = tokens
-        self.token_pos = 0
-        self.current_token = self.tokens[self.token_pos]
+    """Parser accepts a list of tokens and returns an abstract syntax tree
+
+        Any iterable of tokens will do, such as the generator from Tokenizer.generate_tokens: tokens are
+        taken from it only as parsing reaches them, and the parser keeps no reference to a token once
+        it has moved past it.
+
+        Compiler directives are taken out of the stream as it is read. A {$B-} switches AND and OR to
+        short-circuit evaluation from where it appears, and {$B+} back to complete evaluation; before the
+        first switch the mode is short_circuit. Other directives are ignored."""
+
+    def __init__(self, tokens, short_circuit=False) -> None:
+        self.short_circuit = short_circuit
+        # (lineno, column) of each $B switch read so far, and whether it turned short-circuit evaluation on
+        self.boolean_switch_positions = []
+        self.boolean_switches = []
+        self.tokens = self.read_directives(iter(tokens))
+        # tokens taken from the stream to peek at but not consumed yet
+        self.lookahead = deque()
+        self.current_token = next(self.tokens)
         self.current_routine = None
 
         self.current_scope: ScopedSymbolTable = None
@@ -36,6 +52,23 @@ class Parser(object):
         self.RelationOperator = [TokenType.EQUAL, TokenType.NOT_EQUAL, TokenType.GREATER, TokenType.GREATER_EQUAL,
                                  TokenType.LESS, TokenType.LESS_EQUAL, TokenType.IN]
 
+    def read_directives(self, tokens):
+        """Pass tokens on without the DIRECTIVE tokens, recording the $B switches those set."""
+        for token in tokens:
+            if token.type is not TokenType.DIRECTIVE:
+                yield token
+                continue
+            for switch in token.value.split(','):
+                switch = switch.strip()
+                if switch in ('B-', 'B+'):
+                    self.boolean_switch_positions.append((token.lineno, token.column))
+                    self.boolean_switches.append(switch == 'B-')
+
+    def short_circuit_at(self, token) -> bool:
+        """Whether an AND or OR at token is evaluated short-circuit, by the last $B switch in front of it."""
+        index = bisect_right(self.boolean_switch_positions, (token.lineno, token.column))
+        return self.boolean_switches[index - 1] if index else self.short_circuit
+
     def set_location(self, node, token):
         node.line = token.lineno
         node.column = token.column
@@ -1054,6 +1087,8 @@ class Parser(object):
             rhs = self.term()
 
             root = BinaryOp(lhs, op, rhs)
+            if op.type == TokenType.OR:
+                root.short_circuit = self.short_circuit_at(op)
         return root
 
     def term(self) -> Expression:
@@ -1067,6 +1102,8 @@ class Parser(object):
 
             rhs = self.factor()
             root = BinaryOp(lhs, op, rhs)
+            if op.type == TokenType.AND:
+                root.short_circuit = self.short_circuit_at(op)
 
         return root
 
@@ -1211,17 +1248,16 @@ class Parser(object):
 
     def __advance_token(self) -> None:
         if self.current_token.type != TokenType.EOF:
-            self.token_pos = self.token_pos + 1
-            self.current_token = self.tokens[self.token_pos]
+            self.current_token = self.lookahead.popleft() if self.lookahead else next(self.tokens)
 
     def __peek_next_token_type(self):
         if self.current_token.type != TokenType.EOF:
-            next_pos = self.token_pos + 1
-            if next_pos > len(self.tokens) - 1:
-                return None
-            else:
-                next_token = self.tokens[next_pos]
-                return next_token.type
+            if not self.lookahead:
+                next_token = next(self.tokens, None)
+                if next_token is None:
+                    return None
+                self.lookahead.append(next_token)
+            return self.lookahead[0].type
 
     def __eat_token(self, token_type: TokenType) -> None:
         if self.current_token.type == token_type:
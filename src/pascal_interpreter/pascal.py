@@ -1,14 +1,25 @@
+import io
+import json
+import os
 import sys
 import argparse
+from contextlib import nullcontext
 from pathlib import Path
 
-from .interpreter import Interpreter
+from .engines import ENGINES, DEFAULT_ENGINE
 from .error_code import ErrorCode, LexerError, ParserError, SemanticError, PascalRuntimeError
-from .tokenizer import Tokenizer
+from .tokenizer import Tokenizer, echo_tokens
 from .parser import Parser
 #from pascal_symbol import SymbolTableBuilder
 from .semantic_analyzer import SemanticAnalyzer
+from .optimizer import Optimizer
 from .debugger import Debugger, SourceMap
+from .interpreter import DEFAULT_OUTPUT_BUFFER_SIZE
+from .program_cache import ProgramCache, DEFAULT_CACHE_MAX_BYTES
+from .judge import judge_program
+from .profiler import Profiler
+from .timings import PhaseTimings, TimedOutput
+from .pascal_ast import count_nodes
 
 
 def trace(enabled, *args):
@@ -16,36 +27,33 @@ def trace(enabled, *args):
         print(*args, file=sys.stderr)
 
 
-def run_program(
-    program,
-    *,
-    trace_tokens=False,
-    verbose=False,
-    interactive_input=False,
-    debug=False,
-    source_name=None,
-    report_errors=False,
-):
+def stage(timings, name):
+    """A context that times the named stage into timings, or does nothing without them."""
+    return timings.stage(name) if timings is not None else nullcontext()
 
-    tokenizer = Tokenizer(program)
-    try:
-        tokens = tokenizer.get_tokens()
-    except(LexerError) as e:
-        trace(report_errors or verbose or debug, e.message)
-        error_code = e.error_code or ErrorCode.UNKNOWN_ERROR
-        return ({}, str(error_code.values[1]), 1)
 
+def analyze_program(program, *, trace_tokens=False, verbose=False, optimize=True, short_circuit=False, timings=None):
+    """Tokenize, parse and analyze program and, unless optimize is False, fold its constant expressions.
+
+    Returns the tree the engines run; LexerError, ParserError and SemanticError propagate. With
+    short_circuit AND and OR are evaluated like {$B-} up to the program's first $B directive. With
+    PhaseTimings each stage is timed and the tokens are counted."""
+
+    # tokens are produced as the parser takes them, so a lexer error surfaces while parsing
+    tokens = Tokenizer(program).generate_tokens()
+    if timings is not None:
+        # scanned in full before parsing so the two stages are timed apart
+        with timings.stage("tokenize"):
+            tokens = list(tokens)
+        timings.counts["tokens"] = len(tokens)
     trace(trace_tokens, "tokens")
     if trace_tokens:
-        print(*tokens, sep='\n', file=sys.stderr)
+        tokens = echo_tokens(tokens, sys.stderr)
 
     trace(verbose, "Parsing")
-    try:
-        parser = Parser(tokens)
+    parser = Parser(tokens, short_circuit=short_circuit)
+    with stage(timings, "parse"):
         tree = parser.parse()
-    except ParserError as e:
-        trace(report_errors or verbose or debug, e.message)
-        return ({}, str(e.error_code.values[1]), 1)
 
 #    print("Parsed Tree")
 #    ast_printer = ASTPrinter(tree)
@@ -58,29 +66,224 @@ def run_program(
     # print(symtab_builder.symtab)
 
     analyzer = SemanticAnalyzer(tree)
-    try:
+    with stage(timings, "analyze"):
         analyzer.analyze()
-    except SemanticError as e:
-        trace(report_errors or verbose or debug, e.message)
-        return ({}, str(e.error_code.values[1]), 1)
 
 #    print(analyzer.current_scope)
 
-    debugger = None
-    if debug:
-        debugger = Debugger(SourceMap(source_name, program))
+    if optimize:
+        trace(verbose, "Optimizing")
+        with stage(timings, "optimize"):
+            Optimizer(tree).optimize()
+    return tree
+
+
+class CompiledProgram:
+    """A program that has been through the front end, ready to be run any number of times.
+
+    The analyzed tree is shared by every run and is not changed by running it. Everything a run changes
+    -- the call stack, the input, the output and the files the program opens -- belongs to the engine
+    made for that run, so runs with different inputs do not see each other.
+
+    The vm and python engines compile the tree on their first run, into bytecode and into a Python code
+    object, and keep the result for later runs with the same statement hooks and step counting. The
+    closure engine compiles the tree again on every run, because its closures are bound to the state
+    of the run they were made for. The compiled forms stay in this process: they are not pickled with
+    the program."""
+
+    def __init__(self, tree, *, source=None, source_name=None, engine=DEFAULT_ENGINE):
+        self.tree = tree
+        self.source = source
+        self.source_name = source_name
+        self.engine = engine
+        # (engine, options) -> what an engine compiled the tree into, reused by later runs
+        self.compiled_forms = {}
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        # code objects do not pickle; a worker process compiles its own on its first run
+        state["compiled_forms"] = {}
+        return state
+
+    def run(
+        self,
+        *,
+        stdin=None,
+        files_dir=None,
+        output=None,
+        output_buffer_size=DEFAULT_OUTPUT_BUFFER_SIZE,
+        engine=None,
+        interactive_input=False,
+        debugger=None,
+        verbose=False,
+        report_errors=False,
+        max_steps=None,
+        time_limit=None,
+        max_call_depth=None,
+        profiler=None,
+        timings=None,
+    ):
+        """Run the program once and return (memory, output, exitcode) as run_program does.
+
+        stdin is the text or text stream READ and READLN take their input from, sys.stdin when None.
+        Relative file names are opened in files_dir, which defaults to the directory of the source file
+        when it has a name. With an output stream the program output is written to it as it is produced;
+        otherwise it is collected and returned.
+
+        max_steps bounds the loop iterations, routine calls and GOTOs of the run, time_limit its
+        wall-clock seconds and max_call_depth how many routines are active at once; a run that goes
+        past one stops with a STEP_LIMIT_EXCEEDED, TIME_LIMIT_EXCEEDED or CALL_DEPTH_EXCEEDED error.
+        Recursion deep enough to exhaust Python's own stack is reported as CALL_DEPTH_EXCEEDED too.
+
+        A Profiler records the time the run spends on each line and in each routine, including a run
+        stopped by an error or a limit. The python engine runs on the tree engine when profiled.
+
+        PhaseTimings get the interpret stage, the time spent writing to the output stream as the
+        output stage and the number of steps the run took."""
+        if isinstance(stdin, str):
+            stdin = io.StringIO(stdin)
+        if files_dir is None and self.source_name is not None:
+            files_dir = Path(self.source_name).resolve().parent
+        timed_output = None
+        if timings is not None and output is not None:
+            output = timed_output = TimedOutput(output)
+
+        interpreter = ENGINES[engine or self.engine](
+            self.tree,
+            interactive_input=interactive_input,
+            debugger=debugger,
+            file_base_dir=files_dir,
+            output=output,
+            output_buffer_size=output_buffer_size,
+            stdin=stdin,
+            max_steps=max_steps,
+            time_limit=time_limit,
+            max_call_depth=max_call_depth,
+            profiler=profiler,
+            count_steps=timings is not None,
+            compiled_forms=self.compiled_forms,
+        )
+        trace(verbose, "Interpreting")
+        try:
+            with stage(timings, "interpret"):
+                (result, output) = interpreter.interpret()
+        except PascalRuntimeError as e:
+            trace(report_errors or verbose or debugger is not None, e.message)
+            return ({}, str(e.error_code.values[1]), 1)
+        except RecursionError:
+            trace(report_errors or verbose or debugger is not None,
+                  "PascalRuntimeError: Call depth exceeded the Python recursion limit")
+            return ({}, str(ErrorCode.CALL_DEPTH_EXCEEDED.values[1]), 1)
+        finally:
+            interpreter.close_files()
+            if profiler is not None:
+                profiler.stop()
+            if timings is not None:
+                timings.split_last_stage("output", timed_output.seconds if timed_output is not None else 0.0)
+                timings.counts["steps"] = interpreter.steps_taken()
+        trace(verbose, "Finished interpreting")
+
+        return (result.members if result is not None else {}, output, 0)
+
+
+def compile_program(
+    program,
+    *,
+    source_name=None,
+    engine=DEFAULT_ENGINE,
+    optimize=True,
+    short_circuit=False,
+    trace_tokens=False,
+    verbose=False,
+    cache_dir=None,
+    cache_max_bytes=DEFAULT_CACHE_MAX_BYTES,
+    timings=None,
+):
+    """Run program through the front end once and return a CompiledProgram to run it with.
+
+    With a cache directory, a program analyzed before is loaded instead. LexerError, ParserError and
+    SemanticError propagate. PhaseTimings get the front-end stages, or the cache load, and the number
+    of AST nodes."""
+
+    # tracing the tokens needs the tokenizer, so it bypasses the cache
+    cache = ProgramCache(cache_dir, cache_max_bytes) if cache_dir is not None and not trace_tokens else None
+    tree = None
+    if cache is not None:
+        with stage(timings, "load cache"):
+            tree = cache.load(program, optimize, short_circuit)
+    if tree is not None:
+        trace(verbose, "Loaded analyzed program from cache")
+    else:
+        tree = analyze_program(program, trace_tokens=trace_tokens, verbose=verbose, optimize=optimize,
+                               short_circuit=short_circuit, timings=timings)
+        if cache is not None:
+            with stage(timings, "store cache"):
+                stored = cache.store(program, optimize, tree, short_circuit)
+            if stored:
+                trace(verbose, "Stored analyzed program in cache")
+    if timings is not None:
+        timings.counts["ast_nodes"] = count_nodes(tree)
+    return CompiledProgram(tree, source=program, source_name=source_name, engine=engine)
+
+
+def run_program(
+    program,
+    *,
+    trace_tokens=False,
+    verbose=False,
+    interactive_input=False,
+    debug=False,
+    source_name=None,
+    report_errors=False,
+    engine=DEFAULT_ENGINE,
+    optimize=True,
+    short_circuit=False,
+    output=None,
+    output_buffer_size=DEFAULT_OUTPUT_BUFFER_SIZE,
+    cache_dir=None,
+    cache_max_bytes=DEFAULT_CACHE_MAX_BYTES,
+    max_steps=None,
+    time_limit=None,
+    max_call_depth=None,
+    profiler=None,
+    timings=None,
+):
 
-    file_base_dir = Path(source_name).resolve().parent if source_name is not None else None
-    interpreter = Interpreter(tree, interactive_input=interactive_input, debugger=debugger, file_base_dir=file_base_dir)
-    trace(verbose, "Interpreting")
     try:
-        (result, output) = interpreter.interpret()
-    except PascalRuntimeError as e:
+        compiled = compile_program(
+            program,
+            source_name=source_name,
+            engine=engine,
+            optimize=optimize,
+            short_circuit=short_circuit,
+            trace_tokens=trace_tokens,
+            verbose=verbose,
+            cache_dir=cache_dir,
+            cache_max_bytes=cache_max_bytes,
+            timings=timings,
+        )
+    except (LexerError, ParserError, SemanticError) as e:
         trace(report_errors or verbose or debug, e.message)
-        return ({}, str(e.error_code.values[1]), 1)
-    trace(verbose, "Finished interpreting")
+        error_code = e.error_code or ErrorCode.UNKNOWN_ERROR
+        return ({}, str(error_code.values[1]), 1)
+
+    debugger = None
+    if debug:
+        debugger = Debugger(SourceMap(source_name, program))
 
-    return (result.members if result is not None else {}, output, 0)
+    return compiled.run(
+        interactive_input=interactive_input,
+        debugger=debugger,
+        output=output,
+        output_buffer_size=output_buffer_size,
+        verbose=verbose,
+        report_errors=report_errors,
+        max_steps=max_steps,
+        time_limit=time_limit,
+        max_call_depth=max_call_depth,
+        profiler=profiler,
+        timings=timings,
+    )
     # print(interpreter.GLOBAL_MEMORY)
     #
     # print('')
@@ -89,6 +292,49 @@ def run_program(
     #     print('{} = {}'.format(k,v))
 
 
+def limits(args):
+    return {"max_steps": args.max_steps, "time_limit": args.time_limit, "max_call_depth": args.max_call_depth}
+
+
+def write_profile(profiler, prefix, source_map):
+    """Write the annotated source to PREFIX.txt and the collapsed stacks for flame graphs to PREFIX.folded."""
+    with open(prefix + ".txt", "w") as report:
+        profiler.write_report(report, source_map)
+    with open(prefix + ".folded", "w") as stacks:
+        profiler.write_collapsed_stacks(stacks)
+    trace(True, f"Profile written to {prefix}.txt and {prefix}.folded")
+
+
+def write_timings(timings, format):
+    if format == "json":
+        print(json.dumps(timings.as_dict(), indent=2), file=sys.stderr)
+    else:
+        timings.write_text(sys.stderr)
+
+
+def judge(program, args, *, trace_tokens=False, verbose=False):
+    """Compile program once and run it against the cases in args.judge; the exit code is 1 if any case failed."""
+    try:
+        compiled = compile_program(
+            program,
+            source_name=args.file,
+            engine=args.engine,
+            optimize=not args.no_optimize,
+            short_circuit=args.short_circuit,
+            trace_tokens=trace_tokens,
+            verbose=verbose,
+            cache_dir=args.cache_dir,
+            cache_max_bytes=args.cache_max_size,
+        )
+    except (LexerError, ParserError, SemanticError) as e:
+        trace(True, e.message)
+        return 1
+
+    summary = judge_program(compiled, args.judge, jobs=args.jobs, limits=limits(args))
+    print(json.dumps(summary, indent=2))
+    return 1 if summary["failed"] else 0
+
+
 def main(argv=None):
     parser = argparse.ArgumentParser(description="Pascal Interpreter")
     parser.add_argument("--verbose", action="store_true", help="print high-level execution trace to stderr")
@@ -96,9 +342,45 @@ def main(argv=None):
     parser.add_argument("--trace-source", action="store_true", help="print the source program to stderr before running")
     parser.add_argument("--trace-all", action="store_true", help="enable all trace output")
     parser.add_argument("--debug", action="store_true", help="run with the interactive Pascal debugger")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default=DEFAULT_ENGINE, help="execution engine used to run the program")
+    parser.add_argument("--no-optimize", action="store_true", help="run the program without folding constant expressions first")
+    parser.add_argument("--short-circuit", action="store_true",
+                        help="evaluate AND and OR like {$B-}, the right operand only when the left one does not "
+                             "decide the result; $B directives in the program override it from where they appear")
+    parser.add_argument("--output-buffer-size", type=int, default=DEFAULT_OUTPUT_BUFFER_SIZE, metavar="CHARS",
+                        help="characters of program output collected before it is written to stdout (0 writes immediately)")
+    parser.add_argument("--cache-dir", default=os.environ.get("PASCAL_CACHE_DIR"), metavar="DIR",
+                        help="reuse analyzed programs stored in DIR (default: $PASCAL_CACHE_DIR; no caching when unset)")
+    parser.add_argument("--cache-max-size", type=int, default=DEFAULT_CACHE_MAX_BYTES, metavar="BYTES",
+                        help="size the cache directory is kept under by removing the least recently used entries")
+    parser.add_argument("--max-steps", type=int, default=None, metavar="N",
+                        help="stop the program after N loop iterations, routine calls and GOTOs")
+    parser.add_argument("--time-limit", type=float, default=None, metavar="SECONDS",
+                        help="stop the program once it has run for SECONDS of wall-clock time")
+    parser.add_argument("--max-call-depth", type=int, default=None, metavar="N",
+                        help="stop the program when more than N routine calls are active at once")
+    parser.add_argument("--judge", metavar="DIR",
+                        help="run the program once per NAME.in file in DIR, comparing its output with NAME.out "
+                             "when present, and print a JSON summary")
+    parser.add_argument("--jobs", type=int, default=None, metavar="N",
+                        help="worker processes --judge runs cases in (default: one per CPU)")
+    parser.add_argument("--profile", metavar="PREFIX",
+                        help="record time and hits per source line and per routine and write the annotated "
+                             "source to PREFIX.txt and collapsed stacks for flame graphs to PREFIX.folded")
+    parser.add_argument("--timings", action="store_true",
+                        help="report the time and peak memory of each stage, with the token, AST node and "
+                             "step counts, to stderr")
+    parser.add_argument("--timings-format", choices=["text", "json"], default="text",
+                        help="format of the --timings report")
     parser.add_argument("file", help="Pascal source file")
 
     args = parser.parse_args(argv)
+    if args.judge is not None and args.debug:
+        parser.error("--judge cannot be combined with --debug")
+    if args.profile is not None and (args.judge is not None or args.debug):
+        parser.error("--profile cannot be combined with --judge or --debug")
+    if args.timings and args.judge is not None:
+        parser.error("--timings cannot be combined with --judge")
 
     program = open(args.file, 'r').read()
     verbose = args.verbose or args.trace_all
@@ -112,6 +394,11 @@ def main(argv=None):
         trace(True, program)
         trace(True, "")
 
+    if args.judge is not None:
+        return judge(program, args, trace_tokens=trace_tokens, verbose=verbose)
+
+    profiler = Profiler() if args.profile is not None else None
+    timings = PhaseTimings() if args.timings else None
     (_, output, exitcode) = run_program(
         program,
         trace_tokens=trace_tokens,
@@ -120,7 +407,21 @@ def main(argv=None):
         debug=args.debug,
         source_name=args.file,
         report_errors=True,
+        engine=args.engine,
+        optimize=not args.no_optimize,
+        short_circuit=args.short_circuit,
+        output=sys.stdout,
+        output_buffer_size=args.output_buffer_size,
+        cache_dir=args.cache_dir,
+        cache_max_bytes=args.cache_max_size,
+        profiler=profiler,
+        timings=timings,
+        **limits(args),
     )
+    if timings is not None:
+        write_timings(timings, args.timings_format)
+    if profiler is not None and profiler.routines:
+        write_profile(profiler, args.profile, SourceMap(args.file, program))
     if exitcode == 0:
         print(output, end="")
     return exitcode
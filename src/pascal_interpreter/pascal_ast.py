@@ -2,16 +2,41 @@
 #####################
 ## AST
 #####################
+from functools import cache
+
 from .data_type import DataType
 from .token_type import Token
 
 class AST(object):
+    # nodes keep their attributes in __slots__, declared by each class for the attributes it sets,
+    # including those the parser and the semantic analyzer annotate it with
+    __slots__ = ()
+
     def __init__(self):
         pass
 
     def accept(self, visitor: "NodeVisitor"):
         visitor.visit(self)
 
+@cache
+def slot_names(node_class) -> tuple:
+    """The attribute names declared in __slots__ by node_class and the classes it derives from."""
+    return tuple(name for cls in reversed(node_class.__mro__) for name in cls.__dict__.get('__slots__', ()))
+
+
+def count_nodes(tree) -> int:
+    """The number of distinct AST nodes reachable from tree."""
+    seen = set()
+    pending = [tree]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, AST) and id(value) not in seen:
+            seen.add(id(value))
+            pending.extend(getattr(value, name, None) for name in slot_names(type(value)))
+    return len(seen)
+
 #####################
 ## AST visitor
 #####################
@@ -29,11 +54,13 @@ class NodeVisitor(object):
 
 
 class Expression(AST):
-    pass
+    __slots__ = ()
 #    def accept(self, visitor: NodeVisitor):
 #        visitor.visit(self)
 
 class Ident(Expression):
+    __slots__ = ('token', 'value', 'scope_level', 'slot', 'pointer_type')
+
     def __init__(self, token: Token, value: str) -> None:
         super().__init__()
         self.token: Token = token
@@ -46,12 +73,14 @@ class Ident(Expression):
         return f'Identifier name={self.value}'
 
 class ScalarVariable(AST):
-    pass
+    __slots__ = ()
 
 class IndexedVariable(AST):
     pass
 
 class Type(AST):
+    __slots__ = ('data_type', 'token')
+
     def __init__(self, token: Token, data_type: DataType) -> None:
         super().__init__()
         self.data_type = data_type
@@ -62,6 +91,8 @@ class Type(AST):
 #        visitor.visit(self)
 
 class ArrayType(Type):
+    __slots__ = ('indexType', 'indexTypes', 'componentType')
+
     def __init__(self, token: Token, indexType: Type, componentType: Type, indexTypes=None) -> None:
         super().__init__(token, DataType.ARRAY)
         self.indexType = indexType
@@ -69,38 +100,52 @@ class ArrayType(Type):
         self.componentType = componentType
 
 class SetType(Type):
+    __slots__ = ('componentType',)
+
     def __init__(self, token: Token, componentType: Type) -> None:
         super().__init__(token, DataType.SET)
         self.componentType = componentType
 
 class FileType(Type):
+    __slots__ = ('componentType',)
+
     def __init__(self, token: Token, componentType: Type) -> None:
         super().__init__(token, DataType.FILE)
         self.componentType = componentType
 
 class PointerType(Type):
+    __slots__ = ('referenced_name', 'referenced_type')
+
     def __init__(self, token: Token, referenced_name=None, referenced_type=None) -> None:
         super().__init__(token, DataType.POINTER)
         self.referenced_name = referenced_name
         self.referenced_type = referenced_type
 
 class RecordType(Type):
+    __slots__ = ('fields',)
+
     def __init__(self, token: Token, fields) -> None:
         super().__init__(token, DataType.RECORD)
         self.fields = fields
 
 class EnumType(Type):
+    __slots__ = ('values',)
+
     def __init__(self, token: Token) -> None:
         super().__init__(token, DataType.ENUM)
         self.values = []
 
 class SubrangeType(Type):
+    __slots__ = ('lower', 'upper')
+
     def __init__(self, token: Token, lower: "Constant", upper: "Constant", data_type: DataType):
         super().__init__(token, data_type)
         self.lower = lower
         self.upper = upper
 
 class Param(AST):
+    __slots__ = ('name', 'type', 'by_reference')
+
     def __init__(self, name: str, type: Type, by_reference=False) -> None:
         self.name = name
         self.type = type
@@ -110,6 +155,8 @@ class Param(AST):
 #        visitor.visit(self)
 
 class Block(AST):
+    __slots__ = ('declarations', 'compound_statement')
+
     def __init__(self, declarations, compound_statement) -> None:
         super().__init__()
         self.declarations = declarations
@@ -124,6 +171,8 @@ class Block(AST):
         super().accept(visitor)
 
 class Program(AST):
+    __slots__ = ('name', 'block', 'frame_layout', 'line', 'column', 'routine')
+
     def __init__(self, name: str, block: Block) -> None:
         super().__init__()
         self.name: str = name
@@ -135,12 +184,14 @@ class Program(AST):
         self.block.accept(visitor)
 
 class Declaration(AST):
-    pass
+    __slots__ = ()
 
     # def accept(self, visitor: NodeVisitor):
     #     visitor.visit(self)
 
 class ProcedureDeclaration(Declaration):
+    __slots__ = ('proc_name', 'params', 'block_node', 'forward')
+
     def __init__(self, proc_name: str, params, block: Block, forward=False) -> None:
         super().__init__()
         self.proc_name: str = proc_name
@@ -156,6 +207,8 @@ class ProcedureDeclaration(Declaration):
         visitor.visit(self)
 
 class FunctionDeclaration(Declaration):
+    __slots__ = ('func_name', 'params', 'return_type', 'block_node', 'forward')
+
     def __init__(self, func_name: str, params, return_type: Type, block: Block, forward=False) -> None:
         super().__init__()
         self.func_name: str = func_name
@@ -172,6 +225,8 @@ class FunctionDeclaration(Declaration):
         visitor.visit(self)
 
 class VariableDeclaration(Declaration):
+    __slots__ = ('name', 'type')
+
     def __init__(self, name: str, type: Type) -> None:
         super().__init__()
         self.name: str = name
@@ -186,6 +241,8 @@ class VariableDeclaration(Declaration):
 #        visitor.visit(self)
 
 class ArrayDeclaration(Declaration):
+    __slots__ = ('name', 'startIndex', 'endIndex', 'type')
+
     def __init__(self, name, startIndex, endIndex, type: Type) -> None:
         super().__init__()
         self.name: str = name
@@ -194,6 +251,8 @@ class ArrayDeclaration(Declaration):
         self.type = type
 
 class IndexedVariable(AST):
+    __slots__ = ('name', 'token', 'index_expression', 'index_expressions', 'component_type', 'pointer_type')
+
     def __init__(self, name, index_expression, index_expressions=None):
         super().__init__()
         self.name = name
@@ -202,6 +261,8 @@ class IndexedVariable(AST):
         self.index_expressions = index_expressions if index_expressions is not None else [index_expression]
 
 class FieldVariable(AST):
+    __slots__ = ('record', 'field_name', 'token', 'field_declaration', 'pointer_type')
+
     def __init__(self, record, field_name: Ident):
         super().__init__()
         self.record = record
@@ -209,23 +270,31 @@ class FieldVariable(AST):
         self.token = record.token
 
 class DereferenceVariable(AST):
+    __slots__ = ('pointer', 'token', 'pointer_type')
+
     def __init__(self, pointer):
         super().__init__()
         self.pointer = pointer
         self.token = pointer.token
 
 class Constant(Expression):
+    __slots__ = ('token', 'value', 'type')
+
     def __init__(self, token: Token, value, type: Type):
         self.token = token
         self.value = value
         self.type = type
 
 class ConstantDeclaration(Declaration):
+    __slots__ = ('name', 'const')
+
     def __init__(self, name: str, const: Constant):
         self.name = name
         self.const = const
 
 class IntegerConstant(Constant):
+    __slots__ = ()
+
     def __init__(self, token: Token) -> None:
         super().__init__(token, token.value, Type(token, DataType.INTEGER))
 
@@ -236,6 +305,8 @@ class IntegerConstant(Constant):
         return f'Integer={self.value}'
 
 class RealConstant(Constant):
+    __slots__ = ()
+
     def __init__(self, token: Token) -> None:
         super().__init__(token, token.value, Type(token, DataType.REAL))
 
@@ -247,6 +318,8 @@ class RealConstant(Constant):
 
 
 class StringConstant(Constant):
+    __slots__ = ()
+
     def __init__(self, token: Token) -> None:
         super().__init__(token, token.value, Type(token, DataType.STRING))
 
@@ -257,6 +330,8 @@ class StringConstant(Constant):
         return f'String=${self.value}'
 
 class CharConstant(Constant):
+    __slots__ = ()
+
     def __init__(self, token: Token) -> None:
         super().__init__(token, token.value, Type(token, DataType.CHAR))
 
@@ -264,6 +339,8 @@ class CharConstant(Constant):
         return f'Char=${self.value}'
 
 class BooleanConstant(Constant):
+    __slots__ = ()
+
     def __init__(self, token: Token):
         super().__init__(token, token.value, Type(token, DataType.BOOLEAN))
 
@@ -271,6 +348,8 @@ class BooleanConstant(Constant):
         return f'Boolean=${self.value}'
 
 class EnumConstant(Constant):
+    __slots__ = ('name',)
+
     def __init__(self, token: Token, name: str, ordinal: int, enum_type: EnumType):
         super().__init__(token, ordinal, enum_type)
         self.name = name
@@ -279,21 +358,46 @@ class EnumConstant(Constant):
         return f'Enum=${self.name}'
 
 class NilConstant(Constant):
+    __slots__ = ()
+
     def __init__(self, token: Token):
         super().__init__(token, None, Type(token, DataType.POINTER))
 
 class SetLiteral(Expression):
+    __slots__ = ('token', 'elements', 'element_type')
+
     def __init__(self, token: Token, elements) -> None:
         super().__init__()
         self.token = token
         self.elements = elements
 
+class SetConstant(Constant):
+    """A set literal with only constant members, built once by the Optimizer; value is a PascalSet."""
+    __slots__ = ()
+
+    def __init__(self, token: Token, value) -> None:
+        super().__init__(token, value, Type(token, DataType.SET))
+
+def constant_value(node: Constant):
+    """The run-time value of a constant node."""
+    if isinstance(node, BooleanConstant):
+        return node.value == "TRUE"
+    return node.value
+
 class BinaryOp(Expression):
+    __slots__ = ('op', 'token', 'lhs', 'rhs', 'short_circuit', 'operand_type', 'result_type')
+
     def __init__(self, lhs: AST, op: Token, rhs: AST) -> None:
         self.op: Token = op
         self.token: Token = op
         self.lhs: AST = lhs
         self.rhs: AST = rhs
+        # set by the parser on an AND or OR compiled under {$B-}: rhs is evaluated only when lhs
+        # does not decide the result
+        self.short_circuit: bool = False
+        # resolved by the semantic analyzer
+        self.operand_type: DataType = None
+        self.result_type: DataType = None
 
     def accept(self, visitor: NodeVisitor):
         self.lhs.accept(visitor)
@@ -305,17 +409,108 @@ class BinaryOp(Expression):
         return f'${self.lhs} ${self.op} ${self.rhs}'
 
 class UnaryOp(Expression):
+    __slots__ = ('op', 'operand', 'operand_type', 'result_type')
+
     def __init__(self, op: Token, operand: AST) -> None:
         self.op: Token = op
         self.operand: AST = operand
+        # resolved by the semantic analyzer
+        self.operand_type: DataType = None
+        self.result_type: DataType = None
 
     def accept(self, visitor: NodeVisitor):
         self.operand.accept(visitor)
         super().accept(visitor)
 #        visitor.visit(self)
 
+# The optimizer lowers an analyzed BinaryOp or UnaryOp to one of the specialized operators below,
+# chosen by its operator and the operand type the semantic analyzer resolved. The engines evaluate
+# each of them as a single operation instead of dispatching on the operator token every time.
+
+class Add(BinaryOp):
+    """lhs + rhs on integers or reals."""
+    __slots__ = ()
+
+class Subtract(BinaryOp):
+    """lhs - rhs on integers or reals."""
+    __slots__ = ()
+
+class Multiply(BinaryOp):
+    """lhs * rhs on integers or reals."""
+    __slots__ = ()
+
+class RealDivide(BinaryOp):
+    """lhs / rhs on integers or reals, always a real."""
+    __slots__ = ()
+
+class IntegerDivide(BinaryOp):
+    """lhs DIV rhs on integers."""
+    __slots__ = ()
+
+class Modulo(BinaryOp):
+    """lhs MOD rhs on integers."""
+    __slots__ = ()
+
+class Equal(BinaryOp):
+    __slots__ = ()
+
+class NotEqual(BinaryOp):
+    __slots__ = ()
+
+class Less(BinaryOp):
+    __slots__ = ()
+
+class LessEqual(BinaryOp):
+    __slots__ = ()
+
+class Greater(BinaryOp):
+    __slots__ = ()
+
+class GreaterEqual(BinaryOp):
+    __slots__ = ()
+
+class SetUnion(BinaryOp):
+    """lhs + rhs on sets."""
+    __slots__ = ()
+
+class SetDifference(BinaryOp):
+    """lhs - rhs on sets."""
+    __slots__ = ()
+
+class SetIntersection(BinaryOp):
+    """lhs * rhs on sets."""
+    __slots__ = ()
+
+class SetMembership(BinaryOp):
+    """lhs IN rhs."""
+    __slots__ = ()
+
+class And(BinaryOp):
+    """lhs AND rhs on booleans, evaluating both."""
+    __slots__ = ()
+
+class Or(BinaryOp):
+    """lhs OR rhs on booleans, evaluating both."""
+    __slots__ = ()
+
+class AndThen(BinaryOp):
+    """lhs AND rhs on booleans under {$B-}: rhs only when lhs is true."""
+    __slots__ = ()
+
+class OrElse(BinaryOp):
+    """lhs OR rhs on booleans under {$B-}: rhs only when lhs is false."""
+    __slots__ = ()
+
+class Negate(UnaryOp):
+    """-operand on an integer or real."""
+    __slots__ = ()
+
+class Not(UnaryOp):
+    """NOT operand on a boolean."""
+    __slots__ = ()
+
 class Statement(AST):
-    pass
+    __slots__ = ('line', 'column', 'routine')
 
     # def accept(self, visitor: NodeVisitor):
     #     visitor.visit(self)
@@ -323,9 +518,13 @@ class Statement(AST):
 class Compound(Statement):
     """Represents a 'BEGIN ... END' block"""
 
+    __slots__ = ('children', 'table')
+
     def __init__(self) -> None:
         super().__init__()
         self.children = []
+        # the LabelTable of a compound with labels, built by the semantic analyzer
+        self.table = None
 
     def accept(self, visitor: NodeVisitor):
         for child in self.children:
@@ -334,6 +533,8 @@ class Compound(Statement):
         super().accept(visitor)
 
 class Output(Statement):
+    __slots__ = ('op', 'arguments')
+
     def __init__(self, op: Token, arguments) -> None:
         super().__init__()
         self.op: Token = op
@@ -347,6 +548,8 @@ class Output(Statement):
         super().accept(visitor)
 
 class OutputField(AST):
+    __slots__ = ('value', 'width', 'precision')
+
     def __init__(self, value, width=None, precision=None):
         super().__init__()
         self.value = value
@@ -354,6 +557,8 @@ class OutputField(AST):
         self.precision = precision
 
 class Input(Statement):
+    __slots__ = ('op', 'arguments')
+
     def __init__(self, op: Token, arguments) -> None:
         super().__init__()
         self.op: Token = op
@@ -366,6 +571,8 @@ class Input(Statement):
         super().accept(visitor)
 
 class Assign(Statement):
+    __slots__ = ('lhs', 'op', 'token', 'rhs')
+
     def __init__(self, lhs: Ident, op: Token, rhs: Expression) -> None:
         super().__init__()
         self.lhs: Ident = lhs
@@ -380,6 +587,8 @@ class Assign(Statement):
         super().accept(visitor)
 
 class LabelStatement(Statement):
+    __slots__ = ('label', 'statement')
+
     def __init__(self, label, statement) -> None:
         super().__init__()
         self.label = label
@@ -389,6 +598,8 @@ class LabelStatement(Statement):
         super().accept(visitor)
 
 class GotoStatement(Statement):
+    __slots__ = ('label',)
+
     def __init__(self, label) -> None:
         super().__init__()
         self.label = label
@@ -397,6 +608,8 @@ class GotoStatement(Statement):
         super().accept(visitor)
 
 class IFStatement(Statement):
+    __slots__ = ('expr', 'statement', 'else_statement')
+
     def __init__(self, expr, statement, else_statement) -> None:
         super().__init__()
         self.expr = expr
@@ -407,16 +620,22 @@ class IFStatement(Statement):
         super().accept(visitor)
 
 class CaseStatement(Statement):
+    __slots__ = ('expr', 'branches', 'else_statement', 'table')
+
     def __init__(self, expr, branches, else_statement) -> None:
         super().__init__()
         self.expr = expr
         self.branches = branches
         self.else_statement = else_statement
+        # the CaseTable selecting a branch index, built by the semantic analyzer
+        self.table = None
 
     def accept(self, visitor: NodeVisitor):
         super().accept(visitor)
 
 class WhileStatement(Statement):
+    __slots__ = ('expr', 'statement')
+
     def __init__(self, expr, statement) -> None:
         super().__init__()
         self.expr = expr
@@ -426,6 +645,8 @@ class WhileStatement(Statement):
         super().accept(visitor)
 
 class RepeatUntilStatement(Statement):
+    __slots__ = ('statements', 'expr')
+
     def __init__(self, statements, expr) -> None:
         super().__init__()
         self.statements = statements
@@ -435,6 +656,8 @@ class RepeatUntilStatement(Statement):
         super().accept(visitor)
 
 class ForStatement(Statement):
+    __slots__ = ('id', 'expr1', 'dir', 'expr2', 'statement')
+
     def __init__(self, id, expr1, dir, expr2, statement):
         super().__init__()
         self.id = id
@@ -444,12 +667,16 @@ class ForStatement(Statement):
         self.statement = statement
 
 class WithStatement(Statement):
+    __slots__ = ('record', 'statement')
+
     def __init__(self, record, statement):
         super().__init__()
         self.record = record
         self.statement = statement
 
 class ProcedureCall(AST):
+    __slots__ = ('proc_name', 'actual_params', 'token', 'proc_symbol', 'line', 'column', 'routine')
+
     def __init__(self, proc_name, actual_params, token):
         self.proc_name = proc_name
         self.actual_params = actual_params
@@ -459,6 +686,8 @@ class ProcedureCall(AST):
         self.proc_symbol = None
 
 class FunctionCall(Expression):
+    __slots__ = ('func_name', 'actual_params', 'token', 'return_type', 'func_symbol', 'ordinal_bounds')
+
     def __init__(self, func_name, actual_params, token):
         self.func_name = func_name
         self.actual_params = actual_params
@@ -471,6 +700,8 @@ class FunctionCall(Expression):
 
 
 class NoOp(AST):
+    __slots__ = ()
+
     def __init(self) -> None:
         pass
 
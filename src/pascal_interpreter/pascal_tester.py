@@ -2,13 +2,14 @@ from pathlib import Path
 import sys
 import os
 
-from .interpreter import Interpreter
+from .engines import ENGINES, DEFAULT_ENGINE
 from .error_code import ErrorCode, LexerError, ParserError, SemanticError, PascalRuntimeError
 from .simple_interpreter import SimpleInterpreter
-from .tokenizer import Tokenizer
+from .tokenizer import Tokenizer, echo_tokens
 from .parser import Parser
 #from pascal_symbol import SymbolTableBuilder
 from .semantic_analyzer import SemanticAnalyzer
+from .optimizer import Optimizer
 
 import json
 
@@ -100,26 +101,24 @@ def run_statement(statement, *, trace_tokens=False, verbose=False):
 
 
 
-def run_program(program, *, trace_tokens=False, verbose=False, source_name=None):
+def run_program(program, *, trace_tokens=False, verbose=False, source_name=None, engine=DEFAULT_ENGINE, optimize=True,
+                max_steps=None, time_limit=None, max_call_depth=None):
 
     # print("----------Program:\n", program)
-    tokenizer = Tokenizer(program)
-    try:
-        tokens = tokenizer.get_tokens()
-    except(LexerError) as e:
-        trace(verbose, e.message)
-        #sys.exit(1)
-        error_code = e.error_code or ErrorCode.UNKNOWN_ERROR
-        return ({}, str(error_code.values[1]), 1)
-
+    tokens = Tokenizer(program).generate_tokens()
     trace(trace_tokens, "tokens")
     if trace_tokens:
-        print(*tokens, sep='\n', file=sys.stderr)
+        tokens = echo_tokens(tokens, sys.stderr)
 
     trace(verbose, "\nParsing")
     try:
         parser = Parser(tokens)
         tree = parser.parse()
+    except LexerError as e:
+        trace(verbose, e.message)
+        #sys.exit(1)
+        error_code = e.error_code or ErrorCode.UNKNOWN_ERROR
+        return ({}, str(error_code.values[1]), 1)
     except ParserError as e:
         trace(verbose, e.message)
         #sys.exit(1)
@@ -145,14 +144,22 @@ def run_program(program, *, trace_tokens=False, verbose=False, source_name=None)
 
 #    print(analyzer.current_scope)
 
+    if optimize:
+        trace(verbose, "\nOptimizing")
+        Optimizer(tree).optimize()
+
     file_base_dir = Path(source_name).resolve().parent if source_name is not None else None
-    interpreter = Interpreter(tree, file_base_dir=file_base_dir)
+    interpreter = ENGINES[engine](tree, file_base_dir=file_base_dir, max_steps=max_steps, time_limit=time_limit,
+                                  max_call_depth=max_call_depth)
     trace(verbose, "\n\n------Interpreting Program")
     try:
         (result, output) = interpreter.interpret()
     except PascalRuntimeError as e:
         trace(verbose, e.message)
         return ({}, str(e.error_code.values[1]), 1)
+    except RecursionError:
+        trace(verbose, "Call depth exceeded the Python recursion limit")
+        return ({}, str(ErrorCode.CALL_DEPTH_EXCEEDED.values[1]), 1)
     trace(verbose, "------Finished Interpreting Program")
 #    print(str(result))
     trace(verbose, "------Program Output")
@@ -0,0 +1,119 @@
+import time
+
+from .CallStack import CallStack
+
+
+class Profiler:
+    """Profiler - records where a run of a Pascal program spends its time, by source line and by routine.
+
+        The engines report every statement they start and every activation record they push or pop.
+        The time between two of those events is charged to the statement that was running and to the
+        routine it runs in, so a line's time is its own and excludes the routines it calls, and a loop
+        condition is charged to the last statement of the loop body. A routine's inclusive time runs
+        from its call to its return, counted once for recursive calls."""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.line_hits = {}
+        self.line_seconds = {}
+        # routine name -> [calls, inclusive seconds, exclusive seconds]
+        self.routines = {}
+        # (program, routine, ..., routine) -> exclusive seconds spent with exactly that call stack
+        self.stacks = {}
+        # names, start times and the stack key of the routines active now, innermost last
+        self.frames = []
+        self.active = {}
+        self.line = None
+        self.last = None
+
+    def charge(self):
+        """Charge the time since the last event to the running line and routine."""
+        now = self.clock()
+        if self.frames:
+            elapsed = now - self.last
+            if self.line is not None:
+                self.line_seconds[self.line] = self.line_seconds.get(self.line, 0.0) + elapsed
+            name, _, stack = self.frames[-1]
+            self.routines[name][2] += elapsed
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + elapsed
+        self.last = now
+        return now
+
+    def statement(self, node):
+        line = getattr(node, "line", None)
+        if line is None:
+            return
+        self.charge()
+        self.line = line
+        self.line_hits[line] = self.line_hits.get(line, 0) + 1
+
+    def enter(self, name):
+        now = self.charge()
+        stats = self.routines.get(name)
+        if stats is None:
+            stats = self.routines[name] = [0, 0.0, 0.0]
+        stats[0] += 1
+        self.active[name] = self.active.get(name, 0) + 1
+        stack = self.frames[-1][2] + (name,) if self.frames else (name,)
+        self.frames.append((name, now, stack))
+
+    def leave(self):
+        now = self.charge()
+        name, start, _ = self.frames.pop()
+        self.active[name] -= 1
+        if not self.active[name]:
+            self.routines[name][1] += now - start
+
+    def stop(self):
+        """Close the routines still active when a run ends early, so their time is counted."""
+        while self.frames:
+            self.leave()
+        self.line = None
+
+    def total_seconds(self):
+        return sum(self.stacks.values())
+
+    def write_report(self, stream, source_map):
+        """Write the routine table and the source annotated with each line's hits and time."""
+        total = self.total_seconds() or 1.0
+        stream.write(f"Profile of {source_map.filename}: {self.total_seconds():.6f} seconds\n\n")
+
+        stream.write(f"{'calls':>10} {'inclusive s':>12} {'exclusive s':>12} {'excl %':>7}  routine\n")
+        by_exclusive = sorted(self.routines.items(), key=lambda item: (-item[1][2], item[0]))
+        for name, (calls, inclusive, exclusive) in by_exclusive:
+            stream.write(f"{calls:>10} {inclusive:>12.6f} {exclusive:>12.6f} {100 * exclusive / total:>7.2f}  {name}\n")
+
+        stream.write(f"\n{'line':>6} {'hits':>10} {'seconds':>12} {'%':>7}  source\n")
+        for line_number, text in enumerate(source_map.lines, start=1):
+            hits = self.line_hits.get(line_number)
+            if hits is None:
+                row = f"{line_number:>6} {'':>10} {'':>12} {'':>7}  {text}"
+            else:
+                seconds = self.line_seconds.get(line_number, 0.0)
+                row = f"{line_number:>6} {hits:>10} {seconds:>12.6f} {100 * seconds / total:>7.2f}  {text}"
+            stream.write(row.rstrip() + "\n")
+
+    def write_collapsed_stacks(self, stream):
+        """Write one 'PROGRAM;ROUTINE;... microseconds' line per call stack seen, the folded format
+        flamegraph.pl and speedscope read."""
+        for stack, seconds in sorted(self.stacks.items()):
+            microseconds = round(seconds * 1_000_000)
+            if microseconds:
+                stream.write(f"{';'.join(stack)} {microseconds}\n")
+
+
+class ProfiledCallStack(CallStack):
+    """Call stack that tells a profiler about every activation record pushed and popped."""
+
+    def __init__(self, profiler):
+        super().__init__()
+        self.profiler = profiler
+
+    def push(self, ar):
+        self.profiler.enter(ar.name)
+        super().push(ar)
+
+    def pop(self):
+        ar = super().pop()
+        self.profiler.leave()
+        return ar
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from functools import cache
+from pathlib import Path
+
+from . import __version__
+
+
+DEFAULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = ".pcache"
+
+
+@cache
+def interpreter_fingerprint() -> str:
+    """A digest of the interpreter version, the Python implementation and the interpreter's own
+    modules: any change to how programs are analyzed or represented changes it."""
+    digest = hashlib.sha256(f"{__version__} {sys.implementation.cache_tag}".encode())
+    for module_path in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(module_path.name.encode())
+        digest.update(module_path.read_bytes())
+    return digest.hexdigest()
+
+
+class ProgramCache:
+    """ProgramCache - analyzed program trees kept on disk so a program run again skips the Tokenizer,
+    Parser, SemanticAnalyzer and Optimizer.
+
+        An entry is named by the SHA-256 of the interpreter fingerprint, whether the tree was optimized,
+        whether AND and OR default to short-circuit evaluation and the source text, so a changed source
+        or interpreter selects a different entry. Its first line repeats that key with a checksum of
+        the pickled tree that follows; an entry that fails either check, or that cannot be unpickled,
+        is deleted and treated as a miss. Entries are written to a temporary file and renamed into
+        place, so a concurrent run never reads a partial one. Once the entries take more than
+        max_bytes the least recently used are removed; loading an entry marks it used by touching its
+        modification time.
+
+        The entries are pickles: the directory must be one only trusted users can write to."""
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def key(self, source: str, optimize: bool, short_circuit: bool = False) -> str:
+        digest = hashlib.sha256()
+        parts = (interpreter_fingerprint(), "optimized" if optimize else "analyzed",
+                 "short-circuit" if short_circuit else "complete", source)
+        for part in parts:
+            digest.update(part.encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> Path:
+        return self.directory / (key + ENTRY_SUFFIX)
+
+    def load(self, source: str, optimize: bool, short_circuit: bool = False):
+        """The cached tree for source, or None."""
+        key = self.key(source, optimize, short_circuit)
+        path = self.entry_path(key)
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return None
+        tree = self.decode(key, data)
+        if tree is None:
+            self.discard(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return tree
+
+    def decode(self, key: str, data: bytes):
+        header, _, payload = data.partition(b"\n")
+        try:
+            entry_key, checksum = header.decode("ascii").split()
+        except (UnicodeDecodeError, ValueError):
+            return None
+        if entry_key != key or hashlib.sha256(payload).hexdigest() != checksum:
+            return None
+        try:
+            return pickle.loads(payload)
+        except Exception:
+            # a checksummed entry from this interpreter should always load; anything else is a miss
+            return None
+
+    def store(self, source: str, optimize: bool, tree, short_circuit: bool = False) -> bool:
+        """Add the tree analyzed from source; returns whether it was stored."""
+        key = self.key(source, optimize, short_circuit)
+        try:
+            payload = pickle.dumps(tree, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, RecursionError, TypeError, AttributeError):
+            return False
+        header = f"{key} {hashlib.sha256(payload).hexdigest()}\n".encode("ascii")
+
+        temp_path = None
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as entry:
+                entry.write(header)
+                entry.write(payload)
+            os.replace(temp_path, self.entry_path(key))
+        except OSError:
+            if temp_path is not None:
+                self.discard(Path(temp_path))
+            return False
+        self.evict()
+        return True
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the rest fit in max_bytes."""
+        entries = []
+        for path in self.directory.glob("*" + ENTRY_SUFFIX):
+            try:
+                status = path.stat()
+            except OSError:
+                # removed by another run
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.discard(path)
+            total -= size
+
+    def discard(self, path: Path) -> None:
+        try:
+            path.unlink()
+        except OSError:
+            pass
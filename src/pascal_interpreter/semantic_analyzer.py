@@ -1,11 +1,14 @@
+from .activation_record import FrameLayout
+from .case_table import CaseTable
 from .error_code import SemanticError, ErrorCode
+from .label_table import LabelTable
 from .data_type import DataType
 from .token_type import TokenType
 from .symbol import ScopedSymbolTable, VarSymbol, ProcedureSymbol, FunctionSymbol, BuiltinFunctionSymbol, BuiltinProcedureSymbol, TypeSymbol
 from .pascal_ast import NodeVisitor, AST, LabelStatement, GotoStatement, IFStatement, CaseStatement, WhileStatement, BinaryOp, Assign, Ident, \
     VariableDeclaration, \
     ProcedureDeclaration, ProcedureCall, FunctionDeclaration, FunctionCall, Type, Output, Input, \
-    UnaryOp, ForStatement, RepeatUntilStatement, IndexedVariable, FieldVariable, DereferenceVariable, OutputField, ArrayType, SetType, FileType, PointerType, RecordType, EnumType, SetLiteral, StringConstant, NilConstant, WithStatement
+    UnaryOp, ForStatement, RepeatUntilStatement, IndexedVariable, FieldVariable, DereferenceVariable, OutputField, ArrayType, SetType, FileType, PointerType, RecordType, EnumType, SetLiteral, StringConstant, NilConstant, WithStatement, constant_value
 
 
 class SemanticAnalyzer(NodeVisitor):
@@ -51,7 +54,10 @@ class SemanticAnalyzer(NodeVisitor):
             enclosing_scope=self.current_scope
         )
         global_scope.init_builtins()
+        global_scope.frame_layout = FrameLayout()
         self.current_scope = global_scope
+        # accessed by the interpreter to build the program's activation record
+        node.frame_layout = global_scope.frame_layout
 
         self.visit(node.block)
         #print(global_scope)
@@ -63,6 +69,8 @@ class SemanticAnalyzer(NodeVisitor):
     def visit_Compound(self, node):
         for child in node.children:
             self.visit(child)
+        if any(isinstance(child, LabelStatement) for child in node.children):
+            node.table = LabelTable(node)
 
     def visit_NoOp(self, node):
         pass
@@ -114,6 +122,7 @@ class SemanticAnalyzer(NodeVisitor):
             scope_level=self.current_scope.scope_level + 1,
             enclosing_scope=self.current_scope
         )
+        procedure_scope.frame_layout = FrameLayout()
         self.current_scope = procedure_scope
         proc_symbol.formal_params = []
 
@@ -123,6 +132,7 @@ class SemanticAnalyzer(NodeVisitor):
             param_type = param.type
             var_symbol = VarSymbol(param_name, param_type.data_type, param.by_reference, param_type)
             self.current_scope.insert(var_symbol)
+            self.declare_slot(var_symbol, var_symbol.type)
             proc_symbol.formal_params.append(var_symbol)
 
         if node.forward:
@@ -132,6 +142,7 @@ class SemanticAnalyzer(NodeVisitor):
 
         proc_symbol.forward_declared = False
         proc_symbol.block_ast = node.block_node
+        proc_symbol.frame_layout = procedure_scope.frame_layout
         self.visit(node.block_node)
 
         #print(procedure_scope)
@@ -177,6 +188,7 @@ class SemanticAnalyzer(NodeVisitor):
             scope_level=self.current_scope.scope_level + 1,
             enclosing_scope=self.current_scope
         )
+        function_scope.frame_layout = FrameLayout()
         self.current_scope = function_scope
         func_symbol.formal_params = []
 
@@ -185,6 +197,7 @@ class SemanticAnalyzer(NodeVisitor):
             param_name = param.name
             var_symbol = VarSymbol(param_name, param_type, param.by_reference, param.type)
             self.current_scope.insert(var_symbol)
+            self.declare_slot(var_symbol, var_symbol.type)
             func_symbol.formal_params.append(var_symbol)
 
         func_symbol.return_type = node.return_type.data_type
@@ -195,6 +208,9 @@ class SemanticAnalyzer(NodeVisitor):
 
         func_symbol.forward_declared = False
         func_symbol.block_ast = node.block_node
+        func_symbol.frame_layout = function_scope.frame_layout
+        # the result is assigned through the function name, in the slot after the parameters
+        func_symbol.result_slot = function_scope.frame_layout.add(func_name, func_symbol.return_type)
         self.visit(node.block_node)
 
         #print(function_scope)
@@ -230,6 +246,14 @@ class SemanticAnalyzer(NodeVisitor):
                 token=node.type.token,
             )
         self.current_scope.insert(var_symbol)
+        bounds = None
+        if hasattr(node.type, "lower"):
+            bounds = (node.type.lower.value, node.type.upper.value)
+        self.declare_slot(var_symbol, node.type.data_type, bounds, node.type)
+
+    def declare_slot(self, var_symbol, data_type, bounds=None, type_node=None):
+        # accessed by the interpreter to index the variable in its activation record
+        var_symbol.slot = self.current_scope.frame_layout.add(var_symbol.name, data_type, bounds, type_node)
 
     def visit_ProcedureCall(self, node: ProcedureCall):
         proc_symbol = self.current_scope.lookup(node.proc_name)
@@ -400,8 +424,27 @@ class SemanticAnalyzer(NodeVisitor):
         var_symbol = self.current_scope.lookup(var_name)
         if var_symbol is None:
             self.error(error_code=ErrorCode.ID_NOT_FOUND, token=node.token)
+        self.resolve_frame(node, var_symbol)
         return var_symbol.type
 
+    def resolve_frame(self, node: Ident, symbol):
+        # accessed by the engines to find a variable without walking the call
+        # chain: the nesting level of the activation record declaring it, which
+        # the call stack's display maps to the live record, and its slot there
+        if isinstance(symbol, VarSymbol):
+            node.scope_level = symbol.scope_level
+            node.slot = symbol.slot
+            return
+        if isinstance(symbol, FunctionSymbol):
+            # the function name inside its own body names the result slot
+            scope = self.current_scope
+            while scope is not None and scope.scope_level > symbol.scope_level:
+                if scope.scope_level == symbol.scope_level + 1 and scope.scope_name == symbol.name:
+                    node.scope_level = scope.scope_level
+                    node.slot = symbol.result_slot
+                    return
+                scope = scope.enclosing_scope
+
     def visit_IntegerConstant(self, node):
         return node.type.data_type
 
@@ -516,6 +559,7 @@ class SemanticAnalyzer(NodeVisitor):
         array_symbol = self.current_scope.lookup(node.name.value)
         if array_symbol is None:
             self.error(error_code=ErrorCode.ID_NOT_FOUND, token=node.name.token)
+        self.resolve_frame(node.name, array_symbol)
         if not isinstance(array_symbol.type_node, ArrayType):
             self.error(ErrorCode.TYPE_ERROR, node.name.token)
         if len(node.index_expressions) != len(array_symbol.type_node.indexTypes):
@@ -536,6 +580,7 @@ class SemanticAnalyzer(NodeVisitor):
             symbol = self.current_scope.lookup(node.value)
             if symbol is None:
                 self.error(error_code=ErrorCode.ID_NOT_FOUND, token=node.token)
+            self.resolve_frame(node, symbol)
             return symbol.type_node
         if isinstance(node, IndexedVariable):
             symbol = self.current_scope.lookup(node.name.value)
@@ -580,6 +625,7 @@ class SemanticAnalyzer(NodeVisitor):
         operand_type = self.visit(node.operand)
         if node.op.type == TokenType.NOT and operand_type != DataType.BOOLEAN:
             self.error(ErrorCode.TYPE_ERROR, node.op)
+        node.operand_type = node.result_type = operand_type
         return operand_type
 
     def is_valid_bin_op(self, data_type, op):
@@ -602,6 +648,12 @@ class SemanticAnalyzer(NodeVisitor):
     def visit_BinaryOp(self, node: BinaryOp):
         lhstype: DataType = self.visit(node.lhs)
         rhstype: DataType = self.visit(node.rhs)
+        node.operand_type = lhstype
+        node.result_type = self.binary_op_type(node, lhstype, rhstype)
+        return node.result_type
+
+    def binary_op_type(self, node: BinaryOp, lhstype: DataType, rhstype: DataType):
+        """Check the operand types of node and return the type of its result."""
         if node.op.type == TokenType.IN:
             if rhstype != DataType.SET:
                 self.error(ErrorCode.TYPE_ERROR, node.token)
@@ -649,6 +701,11 @@ class SemanticAnalyzer(NodeVisitor):
                 seen_ranges.append(current_range)
             self.visit(statement)
         self.visit(node.else_statement)
+        node.table = CaseTable([
+            [(constant_value(label[0]), constant_value(label[1])) if isinstance(label, tuple) else constant_value(label)
+             for label in labels]
+            for labels, _ in node.branches
+        ])
 
     def check_case_label_overlap(self, current_range, seen_ranges, token):
         current_lower, current_upper = current_range
@@ -124,6 +124,8 @@ class ScopedSymbolTable(object):
         self.scope_name = scope_name
         self.scope_level = scope_level
         self.enclosing_scope = enclosing_scope
+        # slots of the activation records for this scope, set by the semantic analyzer
+        self.frame_layout = None
 
     def init_builtins(self):
         self.insert(BuiltinTypeSymbol('INTEGER', DataType.INTEGER))
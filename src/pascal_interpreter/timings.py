@@ -0,0 +1,79 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class PhaseTimings:
+    """PhaseTimings - wall time and peak memory of each stage a program goes through, with its counts.
+
+        A stage's peak is the most memory tracemalloc saw allocated during the stage and still held at
+        that moment, counting only what the stage itself allocated. Tracing allocations slows every
+        stage, allocation-heavy ones most, so the times are best compared with each other rather than
+        with untraced runs."""
+
+    def __init__(self):
+        # (stage name, seconds, peak bytes or None), in the order the stages ran
+        self.stages = []
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        else:
+            tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] - base
+            if started:
+                tracemalloc.stop()
+            self.stages.append((name, seconds, max(peak, 0)))
+
+    def split_last_stage(self, name, seconds):
+        """Move seconds of the last stage into a stage of their own, for work timed while it ran."""
+        last_name, last_seconds, peak = self.stages.pop()
+        self.stages.append((last_name, last_seconds - seconds, peak))
+        self.stages.append((name, seconds, None))
+
+    def as_dict(self):
+        return {
+            "stages": [{"stage": name, "seconds": round(seconds, 6), "peak_bytes": peak}
+                       for name, seconds, peak in self.stages],
+            "total_seconds": round(sum(seconds for _, seconds, _ in self.stages), 6),
+            **self.counts,
+        }
+
+    def write_text(self, stream):
+        stream.write(f"{'stage':<12} {'seconds':>12} {'peak bytes':>14}\n")
+        for name, seconds, peak in self.stages:
+            peak_text = f"{peak:>14}" if peak is not None else f"{'-':>14}"
+            stream.write(f"{name:<12} {seconds:>12.6f} {peak_text}\n")
+        stream.write(f"{'total':<12} {sum(seconds for _, seconds, _ in self.stages):>12.6f}\n")
+        for name, count in self.counts.items():
+            stream.write(f"{name:<12} {count:>12}\n")
+
+
+class TimedOutput:
+    """Output sink that passes writes on to another stream and adds up the time they take."""
+
+    __slots__ = ('sink', 'seconds')
+
+    def __init__(self, sink):
+        self.sink = sink
+        self.seconds = 0.0
+
+    def write(self, text):
+        start = time.perf_counter()
+        self.sink.write(text)
+        self.seconds += time.perf_counter() - start
+
+    def flush(self):
+        if hasattr(self.sink, "flush"):
+            start = time.perf_counter()
+            self.sink.flush()
+            self.seconds += time.perf_counter() - start
@@ -81,13 +81,19 @@ class TokenType(Enum):
     STRING_CONST = "STRING_CONST"
     CHAR_CONST = "CHAR_CONST"
     BOOLEAN_CONST = "BOOLEAN_CONST"
+    DIRECTIVE = "DIRECTIVE"
     EOF = "EOF"
 
     def __eq__(self, other):
         return self.name == other.name
 
+    def __hash__(self):
+        return hash(self.name)
+
 
 class Token(object):
+    __slots__ = ('type', 'value', 'lineno', 'column')
+
     def __init__(self, type: TokenType, value: str, lineno=None, column=None):
         self.type: TokenType = type
         self.value: str = value
@@ -1,35 +1,63 @@
+import re
+import sys
+from bisect import bisect_right
+from typing import Iterable, Iterator, TextIO
+
 from .error_code import ErrorCode, LexerError
 from .token_type import TokenType, Token
 
+# whitespace and comments, skipped in front of every token; a comment starting with '$' is a
+# compiler directive such as {$B-} and becomes a DIRECTIVE token instead
+SKIP_PATTERN = r'(?:\s+|\{(?!\$)[^}]*\}|\(\*(?!\$).*?\*\))*'
+
+# one alternative per kind of lexeme, tried in this order; '(' is not taken as an operator in front of
+# '*' so an unterminated '(*' comment is reported rather than read as '(' followed by '*'
+TOKEN_PATTERNS = [
+    ('DIRECTIVE', r'\{\$[^}]*\}|\(\*\$.*?\*\)'),
+    ('ID', r'[^\W\d]\w*'),
+    ('STRING', r"'(?:[^']|'')*'|" r'"(?:[^"]|"")*"'),
+    ('NUMBER', r'[0-9]\d*(?:\.(?!\.)\d*)?'),
+    ('DOUBLE_OPERATOR', r':=|>=|<=|<>|\.\.'),
+    ('OPERATOR', r'\((?!\*)|[-+*/);:,=><.\[\]^]'),
+    ('END', r'\Z'),
+]
+
+SKIP_REGEX = re.compile(SKIP_PATTERN, re.DOTALL)
+TOKEN_REGEX = re.compile(SKIP_PATTERN + '(?:' + '|'.join(f'(?P<{name}>{pattern})' for name, pattern in TOKEN_PATTERNS) + ')',
+                         re.DOTALL)
+
+OPERATORS = {
+    token_type.value: token_type for token_type in (
+        TokenType.PLUS, TokenType.MINUS, TokenType.MUL, TokenType.REAL_DIV, TokenType.LPAREN,
+        TokenType.RPAREN, TokenType.DOT, TokenType.SEMI, TokenType.COLON, TokenType.COMMA,
+        TokenType.EQUAL, TokenType.GREATER, TokenType.LESS, TokenType.LEFT_BRACKET,
+        TokenType.RIGHT_BRACKET, TokenType.CARET, TokenType.ASSIGN, TokenType.GREATER_EQUAL,
+        TokenType.LESS_EQUAL, TokenType.NOT_EQUAL, TokenType.DOTDOT,
+    )
+}
+
+
 class Tokenizer(object):
-    """Tokenizer accepts a text expression and returns a list of tokens"""
+    """Tokenizer accepts a text expression and returns a list of tokens
+
+        The text is scanned with one compiled regular expression, TOKEN_REGEX, and each lexeme is
+        sliced out of the text in one piece. Line and column numbers are looked up in an index of
+        the offsets at which lines start rather than counted character by character."""
 
     def __init__(self, text: str) -> None:
         self.text: str = text
         self.pos: int = 0
-        self.current_char: str = self.text[self.pos]
-        self.lineno = 1
-        self.column = 1
-        self.digits = range(10)
-        self.single_char_operators: list[Token] = [TokenType.PLUS.value, TokenType.SEMI.value,
-                                                   TokenType.MINUS.value, TokenType.MUL.value, TokenType.REAL_DIV.value,
-                                                   TokenType.COLON.value, TokenType.COMMA.value, TokenType.LPAREN.value,
-                                                   TokenType.RPAREN.value, TokenType.EQUAL.value, TokenType.GREATER.value,
-                                                   TokenType.LESS.value, TokenType.DOT.value, TokenType.LEFT_BRACKET.value,
-                                                   TokenType.RIGHT_BRACKET.value, TokenType.CARET.value]
-
-        self.multi_char_operators_dict: dict = {TokenType.ASSIGN.value: TokenType.ASSIGN,
-                                                TokenType.GREATER_EQUAL.value: TokenType.GREATER_EQUAL,
-                                                TokenType.LESS_EQUAL.value: TokenType.LESS_EQUAL,
-                                                TokenType.NOT_EQUAL.value: TokenType.NOT_EQUAL,
-                                                TokenType.DOTDOT.value: TokenType.DOTDOT}
+        # offset of the first character of each line; line n starts at line_starts[n - 1]
+        self.line_starts: list[int] = [0] + [match.end() for match in re.finditer('\n', text)]
         self.reserved_keywords = self._build_reserved_keywords()
 
-    def error(self):
-        s = "Lexer error on '{lexeme}' line: {lineno} column: {column}".format(
-            lexeme = self.current_char,
-            lineno = self.lineno,
-            column = self.column
+    def error(self, message="Lexer error"):
+        lineno, column = self.position(self.pos)
+        s = "{message} on '{lexeme}' line: {lineno} column: {column}".format(
+            message=message,
+            lexeme=self.text[self.pos:self.pos + 1],
+            lineno=lineno,
+            column=column
         )
         raise LexerError(error_code=ErrorCode.UNEXPECTED_TOKEN, message=s)
 
@@ -53,183 +81,93 @@ class Tokenizer(object):
         reserved_keywords["READLN"] = TokenType.INPUT
         return reserved_keywords
 
+    def position(self, offset: int) -> tuple[int, int]:
+        """Line and column of the character at offset; past the end of the text, those of its last character."""
+        offset = min(offset, len(self.text) - 1)
+        lineno = bisect_right(self.line_starts, offset)
+        return lineno, offset - self.line_starts[lineno - 1] + 1
+
     """Return a list of tokens"""
 
     def get_tokens(self) -> list[Token]:
-        tokens: list = []
-        while self.current_char is not None:
-            token = self.__get_next_token()
-            tokens.append(token)
-
-        tokens.append(Token(TokenType.EOF, ""))
-        return tokens
-
-    def __get_next_token(self) -> Token:
-
-        while self.current_char is not None:
-
-            if self.current_char.isspace():
-                self.__skip_whitespace()
-                continue
-
-            if self.current_char == '{':
-                comment_start = self.current_char
-                self.__advance()
-                self.__skip_comment(comment_start)
-                continue
-
-            if self.current_char == '(' and self.peek() == '*':
-                comment_start = '(*'
-                self.__advance_multi(comment_start)
-                self.__skip_comment(comment_start)
-                continue
-
-            if self.current_char.isalpha() or self.current_char == '_':
-                return self._id()
-
-            if self.current_char.isspace():
-                self.__skip_whitespace()
-
-            if self.current_char in [TokenType.SINGLE_QUOTE.value, TokenType.DOUBLE_QUOTE.value]:
-                return self.__get_string_token(self.current_char)
-
-            if self.current_char in "0123456789":
-                return self.__get_number_const()
-
-            op_token = self.__match_dbl_op()
-            if op_token is not None:
-                return op_token
-
-            if self.current_char in self.single_char_operators:
-                token_type = TokenType(self.current_char)
-                token = Token(token_type, self.current_char, self.lineno, self.column)
-                self.__advance()
-                return token
-
-
-            self.error()
-        return Token(TokenType.EOF, None)
-
-    def __set_pos(self, token: Token):
-        token.lineno = self.lineno
-        token.column = self.column
-        return token
-
-    def __skip_whitespace(self) -> None:
-        while self.current_char is not None and self.current_char.isspace():
-            self.__advance()
-
-    def __skip_comment(self, comment_start: str) -> None:
-        if comment_start == "{":
-            comment_end = "}"
-        elif comment_start == "(*":
-            comment_end = ")"
-        else:
-            self.error()
-        while self.current_char != comment_end:
-            self.__advance()
-        self.__advance_multi(comment_end)
-
-    def __match_dbl_op(self) -> Token:
-
-        peek_char = self.peek()
-        if peek_char is not None:
-            next_two = self.current_char + peek_char
-            token_type = self.multi_char_operators_dict.get(next_two)
-            if token_type:
-                self.__advance()
-                self.__advance()
-                return Token(token_type, next_two, self.lineno, self.column)
-        return None
-
-    def __get_string_token(self, matching_symbol: str) -> Token:
-        """return a string. Support both single and double quotes"""
-        result = ''
-        self.__advance()
-        while self.current_char is not None:
-            if self.current_char == matching_symbol:
-                if self.peek() == matching_symbol:
-                    result += matching_symbol
-                    self.__advance()
-                    self.__advance()
-                    continue
+        return list(self.generate_tokens())
+
+    def generate_tokens(self) -> Iterator[Token]:
+        """Yield the tokens one at a time as the text is scanned, ending with EOF; a lexer error is raised
+        when the scan reaches it."""
+        text = self.text
+        end = len(text)
+        match_token = TOKEN_REGEX.match
+        word_types = {word: (TokenType.BOOLEAN_CONST if token_type in [TokenType.TRUE, TokenType.FALSE] else token_type)
+                      for word, token_type in self.reserved_keywords.items()}
+        identifier, integer_const, real_const = TokenType.ID, TokenType.INTEGER_CONST, TokenType.REAL_CONST
+        intern = sys.intern
+        # tokens come in text order, so the line index is walked forward instead of searched:
+        # line_start is the offset of line lineno and next_line_start that of the line after it
+        line_starts = self.line_starts + [end + 1]
+        lineno, line_start, next_line_start = 1, 0, line_starts[1]
+        # whether the text after the last token is whitespace or comments only
+        trailing_skip = False
+
+        pos = 0
+        while pos < end:
+            match = match_token(text, pos)
+            if match is None:
+                self.pos = SKIP_REGEX.match(text, pos).end()
+                if text.startswith('{', self.pos) or text.startswith('(*', self.pos):
+                    self.error("Unterminated comment")
+                self.error()
+            kind = match.lastgroup
+            start, pos = match.span(kind)
+            lexeme = text[start:pos]
+            # identifiers and single-character operators are placed at their first character, other
+            # tokens just after their last
+            if kind == 'ID' or kind == 'OPERATOR' or kind == 'DIRECTIVE':
+                offset = start
+            elif kind == 'END':
+                trailing_skip = True
                 break
-            result += self.current_char
-            self.__advance()
-        if self.current_char is None:
-            self.error()
-        self.__advance()
-        if matching_symbol == TokenType.SINGLE_QUOTE.value and len(result) == 1:
-            return Token(TokenType.CHAR_CONST, result, self.lineno, self.column)
-        return Token(TokenType.STRING_CONST, result, self.lineno, self.column)
-
-    def __get_number_const(self) -> Token:
-        """Return a (multidigit) integer or float consumed from input"""
-        result = ''
-        while self.current_char is not None and self.current_char.isdigit():
-            result += self.current_char
-            self.__advance()
-
-        if self.current_char == TokenType.DOT.value and self.peek() != TokenType.DOT.value:
-            result += self.current_char
-            self.__advance()
-
-            while (
-                self.current_char is not None and
-                self.current_char.isdigit()
-            ):
-                result += self.current_char
-                self.__advance()
-
-            token = Token(TokenType.REAL_CONST, float(result))
-        else:
-            token = Token(TokenType.INTEGER_CONST, int(result))
-
-        return self.__set_pos(token)
-
-    # peek at next token without consuming it
-    def peek(self) -> str:
-        peek_pos = self.pos + 1
-        if peek_pos > len(self.text) - 1:
-            return None
-        else:
-            return self.text[peek_pos]
-
-    def __advance_multi(self, multi_token) -> None:
-        for i in range(len(multi_token)):
-            self.__advance()
-
-    def __advance(self) -> None:
-        if self.current_char == '\n':
-            self.lineno += 1
-            self.column = 0
-
-        self.pos += 1
-        if self.pos > len(self.text) - 1:
-            self.current_char = None
-        else:
-            self.current_char = self.text[self.pos]
-            self.column += 1
-
-    def _id(self) -> Token:
-        """Handle identifiers and reversed keywords"""
-        #create new token
-        token = Token(type=None, value=None, lineno=self.lineno, column=self.column)
-        result = ''
-        while self.current_char is not None and (self.current_char.isalnum() or self.current_char == '_'):
-            result += self.current_char
-            self.__advance()
-
-        result = result.upper()
-        token_type = self.reserved_keywords.get(result)
-        if token_type is None:
-            token.type = TokenType.ID
-            token.value = result
-        elif token_type in [TokenType.TRUE, TokenType.FALSE]:
-            token.type = TokenType.BOOLEAN_CONST
-            token.value = result
-        else:
-            token.type = token_type
-            token.value = result
-
-        return token
+            else:
+                offset = pos if pos < end else end - 1
+            while offset >= next_line_start:
+                lineno += 1
+                line_start, next_line_start = next_line_start, line_starts[lineno]
+            column = offset - line_start + 1
+
+            if kind == 'ID':
+                # every occurrence of a name shares one string
+                value = intern(lexeme.upper())
+                yield Token(word_types.get(value, identifier), value, lineno, column)
+            elif kind == 'OPERATOR' or kind == 'DOUBLE_OPERATOR':
+                yield Token(OPERATORS[lexeme], lexeme, lineno, column)
+            elif kind == 'DIRECTIVE':
+                # the switches between '{$' or '(*$' and the closing delimiter, such as 'B-'
+                body = lexeme[2:-1] if lexeme[0] == '{' else lexeme[3:-2]
+                yield Token(TokenType.DIRECTIVE, body.strip().upper(), lineno, column)
+            elif kind == 'NUMBER':
+                if '.' in lexeme:
+                    yield Token(real_const, float(lexeme), lineno, column)
+                else:
+                    yield Token(integer_const, int(lexeme), lineno, column)
+            else:
+                yield self.string_token(lexeme, lineno, column)
+
+        self.pos = pos
+        if trailing_skip:
+            yield Token(TokenType.EOF, None)
+        yield Token(TokenType.EOF, "")
+
+    def string_token(self, lexeme: str, lineno: int, column: int) -> Token:
+        """return a string. Support both single and double quotes"""
+        quote = lexeme[0]
+        value = lexeme[1:-1].replace(quote + quote, quote)
+        if quote == TokenType.SINGLE_QUOTE.value and len(value) == 1:
+            return Token(TokenType.CHAR_CONST, value, lineno, column)
+        return Token(TokenType.STRING_CONST, value, lineno, column)
+
+
+def echo_tokens(tokens: Iterable[Token], stream: TextIO) -> Iterator[Token]:
+    """Pass tokens through unchanged, printing each one to stream as it is taken."""
+    for token in tokens:
+        print(token, file=stream)
+        yield token
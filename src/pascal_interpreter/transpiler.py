@@ -0,0 +1,786 @@
+import sys
+
+from .activation_record import ActivationRecord, ARType
+from .data_type import DataType
+from .error_code import ErrorCode, PascalRuntimeError
+from .interpreter import Interpreter, GotoSignal, PascalFile, PointerValue
+from .label_table import STATEMENT, TICK, JUMP, JUMP_IF_FALSE
+from .pascal_ast import NodeVisitor, VariableDeclaration, ProcedureDeclaration, FunctionDeclaration, \
+    Ident, IndexedVariable, FieldVariable, Constant
+from .symbol import BuiltinFunctionSymbol, BuiltinProcedureSymbol
+from .token_type import TokenType
+from .bytecode import build_set, constant_value
+from .vm import BUILTIN_FUNCTIONS
+
+
+LOCAL = 'local'
+VALUE_PARAM = 'value parameter'
+REF_PARAM = 'var parameter'
+RESULT = 'result'
+
+BINARY_OPERATORS = {
+    TokenType.PLUS: '+',
+    TokenType.MINUS: '-',
+    TokenType.MUL: '*',
+    TokenType.EQUAL: '==',
+    TokenType.NOT_EQUAL: '!=',
+    TokenType.GREATER: '>',
+    TokenType.GREATER_EQUAL: '>=',
+    TokenType.LESS: '<',
+    TokenType.LESS_EQUAL: '<=',
+    TokenType.INTEGER_DIV: '//',
+    TokenType.MOD: '%',
+    TokenType.IN: 'in',
+    # the analyzer only accepts boolean operands, so & and | give complete evaluation
+    TokenType.AND: '&',
+    TokenType.OR: '|',
+}
+
+def bounds_error(value, lower, upper):
+    raise PascalRuntimeError(
+        error_code=ErrorCode.RUNTIME_ERROR,
+        message=f"Value {value} outside bounds {lower}..{upper}",
+    )
+
+
+def store_reference(cell, value):
+    """Store through a VAR parameter cell; bounded cells are [value, lower, upper]."""
+    if len(cell) == 3 and (value < cell[1] or value > cell[2]):
+        bounds_error(value, cell[1], cell[2])
+    cell[0] = value
+
+
+def checked_pointer(pointer_value):
+    Interpreter.check_pointer(None, pointer_value)
+    return pointer_value
+
+
+def dereference(pointer_value):
+    Interpreter.check_pointer(None, pointer_value)
+    return pointer_value.value
+
+
+def dispose(pointer_value):
+    if pointer_value is not None:
+        pointer_value.disposed = True
+
+
+def fixed(value, precision):
+    return f"{float(value):.{precision}f}"
+
+
+def right_aligned(text, width):
+    return f"{text:>{width}}"
+
+
+def delete_string(value, start, count):
+    index = max(start - 1, 0)
+    return value[:index] + value[index + count:]
+
+
+def insert_string(source, value, start):
+    index = min(max(start - 1, 0), len(value))
+    return value[:index] + source + value[index:]
+
+
+def eof(file_value):
+    if isinstance(file_value, PascalFile):
+        return file_value.eof()
+    return file_value.input.eof()
+
+
+# names available to generated code besides _rt and the _k<n> constants
+RUNTIME_NAMES = {
+    'DataType': DataType,
+    'GotoSignal': GotoSignal,
+    'PointerValue': PointerValue,
+    '_bounds_error': bounds_error,
+    '_store_reference': store_reference,
+    '_pointer': checked_pointer,
+    '_deref': dereference,
+    '_dispose': dispose,
+    '_build_set': build_set,
+    '_fixed': fixed,
+    '_right': right_aligned,
+    '_delete': delete_string,
+    '_insert': insert_string,
+    '_eof': eof,
+}
+RUNTIME_NAMES.update({f'B_{name}': function for name, function in BUILTIN_FUNCTIONS.items()})
+
+
+class Variable:
+    def __init__(self, name, kind, data_type=None, bounds=None, type_node=None):
+        self.name = name
+        self.kind = kind
+        self.data_type = data_type
+        self.bounds = bounds
+        self.type_node = type_node
+
+
+class Scope:
+    def __init__(self, key, enclosing_scope=None):
+        self.key = key
+        self.enclosing_scope = enclosing_scope
+        self.variables = {}
+        self.nonlocals = set()
+
+    def lookup(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.variables:
+                return scope, scope.variables[name]
+            scope = scope.enclosing_scope
+        return None, None
+
+
+def python_name(name):
+    return 'V_' + name
+
+
+def routine_name(name):
+    return 'R_' + name
+
+
+class PythonTranspiler(NodeVisitor):
+    """PythonTranspiler - turns an analyzed Program into the source of a Python function.
+
+        Pascal variables become Python locals and nested routines become nested functions, so
+        non-local access follows the lexical structure through closures. A variable passed as a VAR
+        argument is kept in a one-element list (three elements when it carries subrange bounds) and
+        the callee receives that list. Statements become native Python control flow; a compound
+        with labels becomes a small dispatch loop over the blocks of its LabelTable, where a lowered
+        GOTO continues the loop and any other one raises GotoSignal."""
+
+    def __init__(self, tree, *, count_steps=False):
+        self.tree = tree
+        self.boxed = set()
+        # count down _countdown at loop iterations and GOTOs and track routine calls for the execution limits
+        self.count_steps = count_steps
+
+    def transpile(self):
+        """Return (source, constants); repeated until every VAR argument is known to be boxed."""
+        while True:
+            boxed = set(self.boxed)
+            source = self.generate()
+            if self.boxed == boxed:
+                return source, self.constants
+
+    def generate(self):
+        self.lines = []
+        self.level = 0
+        self.constants = {}
+        self.constant_names = {}
+        self.counter = 0
+        self.scope = None
+        self.visit(self.tree)
+        return '\n'.join(self.lines) + '\n'
+
+    def emit(self, line):
+        self.lines.append('    ' * self.level + line)
+
+    def emit_block(self, statements):
+        start = len(self.lines)
+        self.level += 1
+        for statement in statements:
+            self.visit(statement)
+        if len(self.lines) == start:
+            self.emit('pass')
+        self.level -= 1
+
+    def emit_tick(self):
+        self.emit('countdown[0] -= 1')
+        self.emit('if not countdown[0]:')
+        self.emit('    _check_limits()')
+
+    def emit_loop_body(self, statements):
+        if self.count_steps:
+            self.level += 1
+            self.emit_tick()
+            self.level -= 1
+        self.emit_block(statements)
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f'{prefix}{self.counter}'
+
+    def constant(self, value):
+        """Return source for value: a literal when possible, otherwise a _k<n> namespace name."""
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return repr(value)
+        key = self.constant_names.get(id(value))
+        if key is None:
+            key = f'_k{len(self.constants)}'
+            self.constant_names[id(value)] = key
+            self.constants[key] = value
+        return key
+
+    def visit_Program(self, node):
+        self.emit('def _program():')
+        self.level += 1
+        if self.count_steps:
+            # a local of _program, and a closure cell in the routines nested in it, is quicker to reach
+            # on every iteration than a global
+            self.emit('countdown = _countdown')
+            self.emit('depth = _call_depth')
+        self.scope = Scope(id(node))
+        self.declare_block(node.block)
+        members = ', '.join(
+            f'{name!r}: {self.load_variable(self.scope, variable)}'
+            for name, variable in self.scope.variables.items()
+        )
+        self.emit(f'return _rt.program_record({node.name!r}, {{{members}}})')
+        self.level -= 1
+
+    def declare_block(self, block):
+        for declaration in block.declarations:
+            if isinstance(declaration, VariableDeclaration):
+                self.declare_variable(declaration)
+        for declaration in block.declarations:
+            if isinstance(declaration, (ProcedureDeclaration, FunctionDeclaration)) and declaration.block_node is not None:
+                self.routine(declaration)
+        start = len(self.lines)
+        self.visit(block.compound_statement)
+        if len(self.lines) == start:
+            self.emit('pass')
+
+    def declare_variable(self, declaration):
+        type_node = declaration.type
+        bounds = None
+        if hasattr(type_node, 'lower'):
+            bounds = (type_node.lower.value, type_node.upper.value)
+        variable = Variable(declaration.name, LOCAL, type_node.data_type, bounds, type_node)
+        self.scope.variables[declaration.name] = variable
+
+        initial = f'_rt.initial_value({self.constant(type_node)})'
+        if self.is_boxed(self.scope, variable):
+            if bounds is not None:
+                initial = f'[{initial}, {self.constant(bounds[0])}, {self.constant(bounds[1])}]'
+            else:
+                initial = f'[{initial}]'
+        self.emit(f'{python_name(declaration.name)} = {initial}')
+
+    def routine(self, declaration):
+        is_function = isinstance(declaration, FunctionDeclaration)
+        name = declaration.func_name if is_function else declaration.proc_name
+        params = declaration.params or []
+        self.emit(f'def {routine_name(name)}({", ".join(python_name(param.name) for param in params)}):')
+        nonlocal_index = len(self.lines)
+        self.level += 1
+        if self.count_steps:
+            # a call counts as a step once the call depth, kept in the one-element list depth, is checked
+            self.emit('depth[0] += 1')
+            self.emit('if depth[0] > _max_call_depth:')
+            self.emit('    _call_depth_error()')
+            self.emit_tick()
+            self.emit('try:')
+            self.level += 1
+
+        scope = Scope(id(declaration), self.scope)
+        self.scope = scope
+        for param in params:
+            kind = REF_PARAM if param.by_reference else VALUE_PARAM
+            variable = Variable(param.name, kind, param.type.data_type, type_node=param.type)
+            scope.variables[param.name] = variable
+            if kind == VALUE_PARAM and self.is_boxed(scope, variable):
+                self.emit(f'{python_name(param.name)} = [{python_name(param.name)}]')
+        if is_function:
+            result = Variable(name, RESULT, declaration.return_type.data_type, type_node=declaration.return_type)
+            scope.variables[name] = result
+            self.emit(f'{python_name(name)} = {"[None]" if self.is_boxed(scope, result) else "None"}')
+
+        self.declare_block(declaration.block_node)
+        if is_function:
+            self.emit(f'return {self.load_variable(scope, scope.variables[name])}')
+        if self.count_steps:
+            self.level -= 1
+            self.emit('finally:')
+            self.emit('    depth[0] -= 1')
+        self.level -= 1
+
+        if scope.nonlocals:
+            self.lines.insert(nonlocal_index, '    ' * (self.level + 1) + 'nonlocal ' + ', '.join(sorted(scope.nonlocals)))
+        self.scope = scope.enclosing_scope
+
+    def is_boxed(self, scope, variable):
+        return (scope.key, variable.name) in self.boxed
+
+    def load_variable(self, scope, variable):
+        if variable.kind == REF_PARAM or self.is_boxed(scope, variable):
+            return python_name(variable.name) + '[0]'
+        return python_name(variable.name)
+
+    def store(self, target, value):
+        """Emit statements storing the Python expression value into the Pascal variable target."""
+        if isinstance(target, FieldVariable):
+            self.emit(f'_t = {value}')
+            self.emit(f'{self.expression(target.record)}[{target.field_name.value!r}] = _t')
+        elif hasattr(target, 'pointer'):
+            self.emit(f'_t = {value}')
+            self.emit(f'_pointer({self.expression(target.pointer)}).value = _t')
+        elif isinstance(target, IndexedVariable):
+            self.emit(f'_t = {value}')
+            array_value = self.expression(target.name)
+            indexes = [self.expression(index) for index in target.index_expressions]
+            if len(indexes) == 1:
+                self.emit(f'{array_value}.set({indexes[0]}, _t)')
+            elif len(indexes) == 2:
+                self.emit(f'{array_value}.set_pair({indexes[0]}, {indexes[1]}, _t)')
+            else:
+                self.emit(f'{array_value}.set_indexes(({", ".join(indexes)}), _t)')
+        else:
+            self.store_name(target.value, value)
+
+    def store_name(self, name, value):
+        scope, variable = self.scope.lookup(name)
+        if variable is None:
+            self.emit(value)
+            return
+        target = python_name(name)
+        if variable.kind == REF_PARAM:
+            self.emit(f'_store_reference({target}, {value})')
+            return
+        if self.is_boxed(scope, variable):
+            target += '[0]'
+        elif scope is not self.scope:
+            self.scope.nonlocals.add(target)
+        if variable.bounds is None:
+            self.emit(f'{target} = {value}')
+            return
+        lower = self.constant(variable.bounds[0])
+        upper = self.constant(variable.bounds[1])
+        self.emit(f'_t = {value}')
+        self.emit(f'if _t < {lower} or _t > {upper}:')
+        self.emit(f'    _bounds_error(_t, {lower}, {upper})')
+        self.emit(f'{target} = _t')
+
+    def reference(self, argument):
+        """Return the cell passed for a VAR argument, marking the variable as boxed."""
+        if isinstance(argument, Ident):
+            scope, variable = self.scope.lookup(argument.value)
+            if variable is not None:
+                if variable.kind != REF_PARAM:
+                    self.boxed.add((scope.key, variable.name))
+                return python_name(variable.name)
+        return f'[{self.expression(argument)}]'
+
+    def variable_type(self, variable):
+        if isinstance(variable, FieldVariable):
+            return variable.field_declaration.type.data_type
+        if hasattr(variable, 'index_expressions'):
+            return variable.component_type
+        _, declared = self.scope.lookup(variable.value)
+        return declared.data_type if declared is not None else None
+
+    def is_file_variable(self, node):
+        if not isinstance(node, (Ident, IndexedVariable, FieldVariable)):
+            return False
+        return self.variable_type(node) in [DataType.TEXT, DataType.FILE]
+
+    def data_type_source(self, data_type):
+        if isinstance(data_type, DataType):
+            return f'DataType.{data_type.name}'
+        return 'None'
+
+    # statements
+
+    def visit_Compound(self, node):
+        if node.table is None:
+            for child in node.children:
+                self.visit(child)
+            return
+
+        # the flattened steps run as blocks that each start at a jump target; a jump sets the position
+        # and continues the loop, which skips the blocks before it
+        position = self.unique('_goto')
+        steps = node.table.steps
+        starts = node.table.jump_targets()
+        labels = ', '.join(f'{label!r}: {index}' for label, index in node.table.labels.items())
+        self.emit(f'{position} = 0')
+        self.emit('while True:')
+        self.level += 1
+        self.emit('try:')
+        self.level += 1
+        for start, end in zip(starts, starts[1:] + [len(steps)]):
+            self.emit(f'if {position} <= {start}:')
+            self.level += 1
+            block = len(self.lines)
+            for operation, statement, target in steps[start:end]:
+                self.emit_step(position, operation, statement, target)
+            if len(self.lines) == block:
+                self.emit('pass')
+            self.level -= 1
+        self.emit('break')
+        self.level -= 1
+        self.emit('except GotoSignal as _signal:')
+        self.level += 1
+        self.emit(f'{position} = {{{labels}}}.get(_signal.label)')
+        self.emit(f'if {position} is None:')
+        self.emit('    raise')
+        self.level -= 2
+
+    def emit_step(self, position, operation, node, target):
+        if operation == STATEMENT:
+            self.visit(node)
+        elif operation == JUMP_IF_FALSE:
+            self.emit(f'if not ({self.expression(node.expr)}):')
+            self.emit(f'    {position} = {target}')
+            self.emit('    continue')
+        elif operation == JUMP:
+            self.emit(f'{position} = {target}')
+            self.emit('continue')
+        elif operation == TICK and self.count_steps:
+            self.emit_tick()
+
+    def visit_NoOp(self, node):
+        pass
+
+    def visit_LabelStatement(self, node):
+        self.visit(node.statement)
+
+    def visit_GotoStatement(self, node):
+        if self.count_steps:
+            self.emit_tick()
+        self.emit(f'raise GotoSignal({node.label!r})')
+
+    def visit_Assign(self, node):
+        self.store(node.lhs, self.expression(node.rhs))
+
+    def visit_IFStatement(self, node):
+        self.emit(f'if {self.expression(node.expr)}:')
+        self.emit_block([node.statement])
+        if node.else_statement is not None:
+            self.emit('else:')
+            self.emit_block([node.else_statement])
+
+    def visit_CaseStatement(self, node):
+        # the CaseTable selects the branch index, and a binary search on it reaches the branch
+        lookup = self.constant(node.table.lookup_function())
+        self.emit(f'_branch = {lookup}({self.expression(node.expr)})')
+        statements = [statement for _, statement in node.branches]
+        if not statements:
+            self.visit(node.else_statement)
+            return
+        if node.else_statement is not None:
+            self.emit('if _branch is None:')
+            self.emit_block([node.else_statement])
+            self.emit('else:')
+        else:
+            self.emit('if _branch is not None:')
+        self.emit_case_branches(statements, 0, len(statements))
+
+    def emit_case_branches(self, statements, first, last):
+        """Emit, one level in, the code running statements[_branch] for first <= _branch < last."""
+        if last - first == 1:
+            self.emit_block([statements[first]])
+            return
+        middle = (first + last) // 2
+        self.level += 1
+        self.emit(f'if _branch < {middle}:')
+        self.emit_case_branches(statements, first, middle)
+        self.emit('else:')
+        self.emit_case_branches(statements, middle, last)
+        self.level -= 1
+
+    def visit_WhileStatement(self, node):
+        self.emit(f'while {self.expression(node.expr)}:')
+        self.emit_loop_body([node.statement])
+
+    def visit_RepeatUntilStatement(self, node):
+        self.emit('while True:')
+        self.emit_loop_body(node.statements)
+        self.emit(f'    if {self.expression(node.expr)}:')
+        self.emit('        break')
+
+    def visit_ForStatement(self, node):
+        variable = node.id
+        self.store(variable, self.expression(node.expr1))
+        final = self.unique('_final')
+        self.emit(f'{final} = {self.expression(node.expr2)}')
+        current = self.expression(variable)
+        if node.dir.type == TokenType.TO:
+            self.emit(f'while {current} <= {final}:')
+            step = f'{current} + 1'
+        else:
+            self.emit(f'while {current} >= {final}:')
+            step = f'{current} - 1'
+        self.emit_loop_body([node.statement])
+        self.level += 1
+        self.store(variable, step)
+        self.level -= 1
+
+    def visit_WithStatement(self, node):
+        self.visit(node.statement)
+
+    def visit_Output(self, node):
+        arguments = node.arguments if node.arguments is not None else []
+        newline = node.op.value == "WRITELN"
+        if arguments and self.is_file_output_field(arguments[0]):
+            self.emit(f'_f = {self.expression(arguments[0].value)}')
+            self.emit('if _f.component_type is not None:')
+            self.level += 1
+            for argument in arguments[1:]:
+                self.emit(f'_f.write_record({self.expression(argument.value)})')
+            if len(arguments) == 1:
+                self.emit('pass')
+            self.level -= 1
+            self.emit('else:')
+            self.emit(f'    _f.handle.write({self.output_text(arguments[1:], newline)})')
+            return
+        self.emit(f'_rt.output.write({self.output_text(arguments, newline)})')
+
+    def is_file_output_field(self, field):
+        return field.width is None and field.precision is None and self.is_file_variable(field.value)
+
+    def output_text(self, fields, newline):
+        parts = []
+        for field in fields:
+            text = self.expression(field.value)
+            if field.precision is not None:
+                text = f'_fixed({text}, {self.expression(field.precision)})'
+            else:
+                text = f'str({text})'
+            if field.width is not None:
+                text = f'_right({text}, {self.expression(field.width)})'
+            parts.append(text)
+        if newline:
+            parts.append(repr('\n'))
+        if not parts:
+            return "''"
+        if len(parts) == 1:
+            return parts[0]
+        return f"''.join(({', '.join(parts)},))"
+
+    def visit_Input(self, node):
+        arguments = node.arguments or []
+        readln = node.op.value == "READLN"
+        self.emit('_rt.begin_read()')
+        if arguments and self.is_file_variable(arguments[0]):
+            self.emit(f'_f = {self.expression(arguments[0])}')
+            self.emit('if _f.component_type is not None:')
+            self.level += 1
+            self.read_targets(arguments[1:], '_f.read_record()')
+            if len(arguments) == 1:
+                self.emit('pass')
+            self.level -= 1
+            self.emit('else:')
+            self.level += 1
+            self.emit('_source = _f.input')
+            self.read_targets(arguments[1:], '_source.read_token()')
+            if readln:
+                self.emit('_source.discard_line()')
+            self.level -= 1
+            return
+        self.emit('_source = _rt.input')
+        self.read_targets(arguments, '_source.read_token()')
+        if readln:
+            self.emit('_source.discard_line()')
+
+    def read_targets(self, targets, read):
+        for target in targets:
+            data_type = self.data_type_source(self.variable_type(target))
+            self.store(target, f'_rt.convert_input({read}, {data_type})')
+
+    def visit_ProcedureCall(self, node):
+        if isinstance(node.proc_symbol, BuiltinProcedureSymbol):
+            self.builtin_procedure(node)
+            return
+        self.emit(self.call(node.proc_name, node.proc_symbol, node.actual_params))
+
+    def call(self, name, symbol, actual_params):
+        arguments = []
+        for param_symbol, argument in zip(symbol.formal_params, actual_params):
+            if param_symbol.by_reference:
+                arguments.append(self.reference(argument))
+            else:
+                arguments.append(self.expression(argument))
+        return f'{routine_name(name)}({", ".join(arguments)})'
+
+    def builtin_procedure(self, node):
+        proc_name = node.proc_name
+        params = node.actual_params
+        args = [self.expression(param) for param in params]
+        if proc_name in ["ASSIGN", "RENAME"]:
+            self.emit(f'{args[0]}.{proc_name.lower()}({args[1]})')
+        elif proc_name in ["RESET", "REWRITE", "APPEND", "CLOSE", "ERASE", "FLUSH"]:
+            self.emit(f'{args[0]}.{proc_name.lower()}()')
+        elif proc_name == "NEW":
+            referenced_type = self.constant(params[0].pointer_type.referenced_type)
+            self.store(params[0], f'PointerValue(_rt.initial_value({referenced_type}))')
+        elif proc_name == "DISPOSE":
+            self.emit(f'_dispose({args[0]})')
+            self.store(params[0], 'None')
+        elif proc_name == "DELETE":
+            self.store(params[0], f'_delete({args[0]}, {args[1]}, {args[2]})')
+        elif proc_name == "INSERT":
+            self.store(params[1], f'_insert({args[0]}, {args[1]}, {args[2]})')
+        elif proc_name in ["INC", "DEC"]:
+            delta = args[1] if len(args) == 2 else '1'
+            operator = '+' if proc_name == "INC" else '-'
+            self.store(params[0], f'{args[0]} {operator} {delta}')
+        elif proc_name == "VAL":
+            conversion = 'int' if self.variable_type(params[1]) == DataType.INTEGER else 'float'
+            self.emit('try:')
+            self.emit(f'    _converted = {conversion}({args[0]}.strip())')
+            self.emit('except ValueError:')
+            self.level += 1
+            self.store(params[2], '1')
+            self.level -= 1
+            self.emit('else:')
+            self.level += 1
+            self.store(params[1], '_converted')
+            self.store(params[2], '0')
+            self.level -= 1
+        elif proc_name == "STR":
+            self.store(params[1], f'str({args[0]})')
+
+    # expressions
+
+    def expression(self, node):
+        return getattr(self, 'expression_' + type(node).__name__)(node)
+
+    def expression_Ident(self, node):
+        scope, variable = self.scope.lookup(node.value)
+        if variable is None:
+            return 'None'
+        return self.load_variable(scope, variable)
+
+    def expression_IndexedVariable(self, node):
+        array_value = self.expression(node.name)
+        indexes = [self.expression(index) for index in node.index_expressions]
+        if len(indexes) == 1:
+            return f'{array_value}.get_index({indexes[0]})'
+        if len(indexes) == 2:
+            return f'{array_value}.get_pair({indexes[0]}, {indexes[1]})'
+        return f'{array_value}.get_indexes(({", ".join(indexes)}))'
+
+    def expression_FieldVariable(self, node):
+        return f'{self.expression(node.record)}.get({node.field_name.value!r})'
+
+    def expression_DereferenceVariable(self, node):
+        return f'_deref({self.expression(node.pointer)})'
+
+    def expression_IntegerConstant(self, node):
+        return self.constant(node.value)
+
+    expression_RealConstant = expression_IntegerConstant
+    expression_StringConstant = expression_IntegerConstant
+    expression_CharConstant = expression_IntegerConstant
+    expression_EnumConstant = expression_IntegerConstant
+    expression_NilConstant = expression_IntegerConstant
+    expression_SetConstant = expression_IntegerConstant
+
+    def expression_BooleanConstant(self, node):
+        return repr(node.value == "TRUE")
+
+    def expression_SetLiteral(self, node):
+        ranges = tuple(isinstance(element, tuple) for element in node.elements)
+        parts = [part for element in node.elements for part in (element if isinstance(element, tuple) else (element,))]
+        if all(isinstance(part, Constant) for part in parts):
+            # sets are never changed once built, so a constant literal becomes a namespace constant
+            return self.constant(build_set(ranges, [constant_value(part) for part in parts]))
+        return f'_build_set({ranges!r}, ({", ".join(self.expression(part) for part in parts)},))'
+
+    def expression_BinaryOp(self, node):
+        op = node.token.type
+        lhs = self.expression(node.lhs)
+        rhs = self.expression(node.rhs)
+        if op == TokenType.REAL_DIV:
+            return f'float({lhs} / {rhs})'
+        if node.short_circuit:
+            return f'({lhs} {"or" if op == TokenType.OR else "and"} {rhs})'
+        return f'({lhs} {BINARY_OPERATORS[op]} {rhs})'
+
+    def expression_UnaryOp(self, node):
+        operand = self.expression(node.operand)
+        op = node.op.type
+        if op == TokenType.MINUS:
+            return f'(-{operand})'
+        if op == TokenType.NOT:
+            return f'(not {operand})'
+        return f'(+{operand})'
+
+    # the specialized operators the optimizer lowers to keep their operator token and translate to
+    # the same Python operator; only a real division no longer needs the float() around it
+    expression_Add = expression_Subtract = expression_Multiply = expression_IntegerDivide = \
+        expression_Modulo = expression_Equal = expression_NotEqual = expression_Less = expression_LessEqual = \
+        expression_Greater = expression_GreaterEqual = expression_SetUnion = expression_SetDifference = \
+        expression_SetIntersection = expression_SetMembership = expression_And = expression_Or = expression_AndThen = \
+        expression_OrElse = expression_BinaryOp
+    expression_Negate = expression_Not = expression_UnaryOp
+
+    def expression_RealDivide(self, node):
+        return f'({self.expression(node.lhs)} / {self.expression(node.rhs)})'
+
+    def expression_FunctionCall(self, node):
+        func_symbol = node.func_symbol
+        if not isinstance(func_symbol, BuiltinFunctionSymbol):
+            return self.call(node.func_name, func_symbol, node.actual_params)
+
+        func_name = node.func_name
+        args = [self.expression(param) for param in node.actual_params]
+        if func_name in BUILTIN_FUNCTIONS:
+            return f'B_{func_name}({", ".join(args)})'
+        if func_name in ["PRED", "SUCC"]:
+            delta = -1 if func_name == "PRED" else 1
+            bounds = self.constant(getattr(node, "ordinal_bounds", None))
+            return f'_rt.ordinal_step({args[0]}, {delta}, {bounds})'
+        if func_name == "EOF":
+            return f'_eof({args[0]})' if args else '_rt.input.eof()'
+        if func_name == "EOLN":
+            return f'{args[0]}.input.eoln()' if args else '_rt.input.eoln()'
+        return 'None'
+
+
+class TranspilingInterpreter(Interpreter):
+    """TranspilingInterpreter - runs the program as Python source produced by PythonTranspiler.
+
+        The generated source is compiled with compile() and executed so loops and arithmetic run as
+        native Python bytecode. Range, array index and pointer checks are still made by the generated
+        code. With a debugger or profiler attached the program runs on the tree-walking Interpreter,
+        because they follow statements and activation records that the generated code does not keep."""
+
+    def interpret(self):
+        if self.debugger is not None or self.profiler is not None:
+            return super().interpret()
+        self.output = self.open_output()
+        tree = self.tree
+        if tree is None:
+            return ''
+        code, constants = self.compiled_form(("python", self.limited), lambda: self.transpile(tree))
+        namespace = dict(RUNTIME_NAMES)
+        namespace.update(constants)
+        namespace['_rt'] = self
+        namespace['_countdown'] = self.countdown
+        namespace['_check_limits'] = self.check_limits
+        # the generated routines are Python functions and push no activation records, so they keep
+        # their own count of the routines active
+        namespace['_call_depth'] = [0]
+        namespace['_max_call_depth'] = self.max_call_depth if self.max_call_depth is not None else sys.maxsize
+        namespace['_call_depth_error'] = self.call_depth_error
+        exec(code, namespace)
+        self.start_limits()
+        try:
+            rv = namespace['_program']()
+        finally:
+            self.output.flush()
+        return (rv, self.output.getvalue())
+
+    def transpile(self, tree):
+        """The compiled code object of the generated source and the constants it refers to."""
+        source, constants = PythonTranspiler(tree, count_steps=self.limited).transpile()
+        return compile(source, f'<pascal {tree.name}>', 'exec'), constants
+
+    def program_record(self, name, members):
+        ar = ActivationRecord(
+            name=name,
+            ar_type=ARType.PROGRAM,
+            nesting_level=1,
+        )
+        for member_name, value in members.items():
+            ar.set_new(member_name, value)
+        return ar
+
+    def begin_read(self):
+        if self.interactive_input:
+            self.show_output()
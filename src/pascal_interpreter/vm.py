@@ -0,0 +1,536 @@
+import math
+
+from .activation_record import ActivationRecord, ARType
+from .bytecode import BytecodeCompiler, Op, build_set
+from .data_type import DataType
+from .debugger import DebuggerQuit
+from .error_code import ErrorCode, PascalRuntimeError
+from .interpreter import Interpreter, PascalFile, PointerValue
+
+
+def _round_half_away(value):
+    if value >= 0:
+        return math.floor(value + 0.5)
+    return math.ceil(value - 0.5)
+
+
+def _ordinal(value):
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, str):
+        return ord(value[0])
+    return value
+
+
+def _position(needle, haystack):
+    index = haystack.find(needle)
+    return 0 if index == -1 else index + 1
+
+
+def _copy(value, start, count):
+    return value[max(start - 1, 0):max(start - 1, 0) + count]
+
+
+# builtin functions that depend only on their evaluated arguments
+BUILTIN_FUNCTIONS = {
+    "ABS": abs,
+    "SQR": lambda value: value * value,
+    "ODD": lambda value: value % 2 != 0,
+    "ORD": _ordinal,
+    "CHR": chr,
+    "TRUNC": math.trunc,
+    "ROUND": _round_half_away,
+    "SQRT": math.sqrt,
+    "EXP": math.exp,
+    "LN": math.log,
+    "SIN": math.sin,
+    "COS": math.cos,
+    "ARCTAN": math.atan,
+    "LENGTH": len,
+    "COPY": _copy,
+    "POS": _position,
+    "CONCAT": lambda *values: "".join(values),
+    "UPCASE": lambda value: value.upper(),
+}
+
+
+class VirtualMachine(Interpreter):
+    """VirtualMachine - runs the analyzed program as flat bytecode on an operand stack.
+
+        The BytecodeCompiler lowers the AST once; the VM then executes it in a single dispatch loop.
+        Routine calls push a return address instead of recursing in Python, and GOTO is an ordinary
+        jump. Activation records, files and output are shared with Interpreter."""
+
+    def __init__(self, tree, **kwargs):
+        super().__init__(tree, **kwargs)
+        self.stack = []
+        self.read_source = None
+        self.read_file = None
+        self.handlers = {
+            Op.POP: self.op_pop,
+            Op.SWAP: self.op_swap,
+            Op.STATEMENT: self.before_statement,
+            Op.BUILD_SET: self.op_build_set,
+            Op.READ_BEGIN: self.op_read_begin,
+            Op.READ_IS_FILE: self.op_read_is_file,
+            Op.READ_FILE_SOURCE: self.op_read_file_source,
+            Op.READ_VALUE: self.op_read_value,
+            Op.READ_END: self.op_read_end,
+            Op.FILE_METHOD: self.op_file_method,
+            Op.NEW_POINTER: self.op_new_pointer,
+            Op.DISPOSE: self.op_dispose,
+            Op.DELETE_STRING: self.op_delete_string,
+            Op.INSERT_STRING: self.op_insert_string,
+            Op.VAL_CONVERT: self.op_val_convert,
+            Op.STR: self.op_str,
+            Op.ENTER_PROGRAM: self.op_enter_program,
+        }
+
+    def interpret(self):
+        self.output = self.open_output()
+        tree = self.tree
+        if tree is None:
+            return ''
+        statement_hooks = self.debugger is not None or self.profiler is not None
+        code = self.compiled_form(
+            ("bytecode", statement_hooks, self.limited),
+            lambda: BytecodeCompiler(tree, statement_hooks=statement_hooks, count_steps=self.limited).compile(),
+        )
+        self.start_limits()
+        quit_requested = False
+        try:
+            rv = self.run(code)
+        except DebuggerQuit:
+            quit_requested = True
+            rv = self.call_stack.peek() if self.call_stack._records else None
+        finally:
+            self.output.flush()
+
+        if self.debugger is not None and not quit_requested:
+            self.debugger.program_finished(rv)
+
+        return (rv, self.output.getvalue())
+
+    def run(self, code):
+        ops = code.ops
+        args = code.args
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        display = self.call_stack._display
+        push_frame = self.call_stack.push
+        pop_frame = self.call_stack.pop
+        returns = []
+        # the operand stack height at every call, where the callee's part of the stack begins
+        bases = []
+        handlers = self.handlers
+        check_pointer = self.check_pointer
+        initial_value = self.initial_value
+        countdown = self.countdown
+        check_limits = self.check_limits
+        count_call = self.count_call
+
+        LOAD_VAR = int(Op.LOAD_VAR)
+        LOAD_CONST = int(Op.LOAD_CONST)
+        STORE_VAR = int(Op.STORE_VAR)
+        JUMP_IF_FALSE = int(Op.JUMP_IF_FALSE)
+        JUMP = int(Op.JUMP)
+        TICK = int(Op.TICK)
+        ADD = int(Op.ADD)
+        SUB = int(Op.SUB)
+        MUL = int(Op.MUL)
+        EQ = int(Op.EQ)
+        NE = int(Op.NE)
+        LT = int(Op.LT)
+        LE = int(Op.LE)
+        GT = int(Op.GT)
+        GE = int(Op.GE)
+        AND = int(Op.AND)
+        OR = int(Op.OR)
+        INTEGER_DIV = int(Op.INTEGER_DIV)
+        MOD = int(Op.MOD)
+        REAL_DIV = int(Op.REAL_DIV)
+        IN = int(Op.IN)
+        NEG = int(Op.NEG)
+        POS = int(Op.POS)
+        NOT = int(Op.NOT)
+        LOAD_INDEX = int(Op.LOAD_INDEX)
+        STORE_INDEX = int(Op.STORE_INDEX)
+        FOR_TEST = int(Op.FOR_TEST)
+        FOR_STEP = int(Op.FOR_STEP)
+        CALL = int(Op.CALL)
+        RETURN = int(Op.RETURN)
+        BUILTIN_FUNCTION = int(Op.BUILTIN_FUNCTION)
+        WRITE = int(Op.WRITE)
+        LOAD_FIELD = int(Op.LOAD_FIELD)
+        STORE_FIELD = int(Op.STORE_FIELD)
+        LOAD_DEREF = int(Op.LOAD_DEREF)
+        STORE_DEREF = int(Op.STORE_DEREF)
+        CASE = int(Op.CASE)
+        GOTO = int(Op.GOTO)
+        RAISE_GOTO = int(Op.RAISE_GOTO)
+        HALT = int(Op.HALT)
+
+        pc = 0
+        while True:
+            op = ops[pc]
+            arg = args[pc]
+            pc += 1
+            if op == LOAD_VAR:
+                level, slot = arg
+                push(display[level].load(slot))
+            elif op == LOAD_CONST:
+                push(arg)
+            elif op == STORE_VAR:
+                level, slot = arg
+                display[level].store(slot, pop())
+            elif op == JUMP_IF_FALSE:
+                if not pop():
+                    pc = arg
+            elif op == JUMP:
+                pc = arg
+            elif op == TICK:
+                if arg:
+                    count_call()
+                else:
+                    countdown[0] -= 1
+                    if not countdown[0]:
+                        check_limits()
+            elif op == ADD:
+                rhs = pop()
+                stack[-1] = stack[-1] + rhs
+            elif op == SUB:
+                rhs = pop()
+                stack[-1] = stack[-1] - rhs
+            elif op == MUL:
+                rhs = pop()
+                stack[-1] = stack[-1] * rhs
+            elif op == EQ:
+                rhs = pop()
+                stack[-1] = stack[-1] == rhs
+            elif op == NE:
+                rhs = pop()
+                stack[-1] = stack[-1] != rhs
+            elif op == LT:
+                rhs = pop()
+                stack[-1] = stack[-1] < rhs
+            elif op == LE:
+                rhs = pop()
+                stack[-1] = stack[-1] <= rhs
+            elif op == GT:
+                rhs = pop()
+                stack[-1] = stack[-1] > rhs
+            elif op == GE:
+                rhs = pop()
+                stack[-1] = stack[-1] >= rhs
+            elif op == AND:
+                rhs = pop()
+                stack[-1] = stack[-1] and rhs
+            elif op == OR:
+                rhs = pop()
+                stack[-1] = stack[-1] or rhs
+            elif op == INTEGER_DIV:
+                rhs = pop()
+                stack[-1] = stack[-1] // rhs
+            elif op == MOD:
+                rhs = pop()
+                stack[-1] = stack[-1] % rhs
+            elif op == REAL_DIV:
+                rhs = pop()
+                stack[-1] = float(stack[-1] / rhs)
+            elif op == IN:
+                rhs = pop()
+                stack[-1] = stack[-1] in rhs
+            elif op == NEG:
+                stack[-1] = -stack[-1]
+            elif op == POS:
+                stack[-1] = +stack[-1]
+            elif op == NOT:
+                stack[-1] = not stack[-1]
+            elif op == LOAD_INDEX:
+                level, slot, count = arg
+                array_value = display[level].load(slot)
+                if count == 1:
+                    stack[-1] = array_value.get_index(stack[-1])
+                elif count == 2:
+                    column = pop()
+                    stack[-1] = array_value.get_pair(stack[-1], column)
+                else:
+                    indexes = stack[-count:]
+                    del stack[-count:]
+                    push(array_value.get_indexes(indexes))
+            elif op == STORE_INDEX:
+                level, slot, count = arg
+                array_value = display[level].load(slot)
+                if count == 1:
+                    index = pop()
+                    array_value.set(index, pop())
+                elif count == 2:
+                    column = pop()
+                    row = pop()
+                    array_value.set_pair(row, column, pop())
+                else:
+                    indexes = stack[-count:]
+                    del stack[-count:]
+                    array_value.set_indexes(indexes, pop())
+            elif op == FOR_TEST:
+                level, slot, step, exit_address = arg
+                if step > 0:
+                    running = display[level].load(slot) <= stack[-1]
+                else:
+                    running = display[level].load(slot) >= stack[-1]
+                if not running:
+                    pop()
+                    pc = exit_address
+            elif op == FOR_STEP:
+                level, slot, step = arg
+                ar = display[level]
+                ar.store(slot, ar.load(slot) + step)
+            elif op == CALL:
+                routine = arg.routine
+                ar = ActivationRecord(
+                    name=routine.name,
+                    ar_type=routine.ar_type,
+                    nesting_level=routine.nesting_level,
+                    parent_ar=display[routine.scope_level],
+                    layout=routine.layout,
+                )
+                slots = ar.slots
+                for slot, type_node in routine.layout.fresh:
+                    slots[slot] = initial_value(type_node)
+                value_count = arg.value_count
+                if value_count:
+                    for slot, value in zip(arg.value_slots, stack[-value_count:]):
+                        slots[slot] = value
+                    del stack[-value_count:]
+                for slot, level, target_slot in arg.references:
+                    ar.bind_reference(slot, display[level], target_slot)
+                push_frame(ar)
+                returns.append(pc)
+                bases.append(len(stack))
+                pc = routine.entry
+            elif op == RETURN:
+                ar = pop_frame()
+                if arg.result_slot is not None:
+                    push(ar.slots[arg.result_slot])
+                pc = returns.pop()
+                bases.pop()
+            elif op == BUILTIN_FUNCTION:
+                self.op_builtin_function(arg)
+            elif op == WRITE:
+                self.op_write(arg)
+            elif op == LOAD_FIELD:
+                stack[-1] = stack[-1].get(arg)
+            elif op == STORE_FIELD:
+                record = pop()
+                record[arg] = pop()
+            elif op == LOAD_DEREF:
+                pointer_value = stack[-1]
+                check_pointer(pointer_value)
+                stack[-1] = pointer_value.value
+            elif op == STORE_DEREF:
+                pointer_value = pop()
+                check_pointer(pointer_value)
+                pointer_value.value = pop()
+            elif op == CASE:
+                lookup, targets, pc = arg
+                branch = lookup(pop())
+                if branch is not None:
+                    pc = targets[branch]
+            elif op == GOTO:
+                pc, pops = arg
+                if pops:
+                    del stack[-pops:]
+            elif op == RAISE_GOTO:
+                pc = self.goto_label(code, arg, pc - 1, returns, bases)
+            elif op == HALT:
+                return pop_frame()
+            else:
+                handlers[op](arg)
+
+    def op_pop(self, arg):
+        self.stack.pop()
+
+    def op_swap(self, arg):
+        stack = self.stack
+        stack[-1], stack[-2] = stack[-2], stack[-1]
+
+    def op_enter_program(self, program):
+        ar = ActivationRecord(
+            name=program.name,
+            ar_type=ARType.PROGRAM,
+            nesting_level=1,
+            layout=program.frame_layout,
+        )
+        self.initialize_frame(ar)
+        self.call_stack.push(ar)
+
+    def goto_label(self, code, label, address, returns, bases):
+        """Carry out a GOTO at address to a label outside the compound statements of its routine, and
+        return the address to continue at.
+
+        As GotoSignal does on the tree engine, the GOTO goes to the innermost active compound with the
+        label: the current routine's, or else the one of the nearest caller whose call is inside such a
+        compound. The frames of the routines left are popped with their part of the operand stack."""
+        depth = len(returns)
+        scope = code.label_scope(address, label)
+        while scope is None:
+            if not depth:
+                raise PascalRuntimeError(
+                    error_code=ErrorCode.RUNTIME_ERROR,
+                    message=f"GOTO {label} has no active label to go to",
+                )
+            depth -= 1
+            # the CALL instruction is just before the return address
+            scope = code.label_scope(returns[depth] - 1, label)
+        while len(returns) > depth:
+            self.call_stack.pop()
+            returns.pop()
+            bases.pop()
+        del self.stack[(bases[-1] if bases else 0) + scope.loop_depth:]
+        return scope.addresses[label]
+
+    def pop_values(self, count):
+        if not count:
+            return []
+        stack = self.stack
+        values = stack[-count:]
+        del stack[-count:]
+        return values
+
+    def op_build_set(self, ranges):
+        self.stack.append(build_set(ranges, self.pop_values(sum(2 if is_range else 1 for is_range in ranges))))
+
+    def op_builtin_function(self, arg):
+        func_name, count, node = arg
+        values = self.pop_values(count)
+        function = BUILTIN_FUNCTIONS.get(func_name)
+        if function is not None:
+            result = function(*values)
+        elif func_name in ["PRED", "SUCC"]:
+            delta = -1 if func_name == "PRED" else 1
+            result = self.ordinal_step(values[0], delta, getattr(node, "ordinal_bounds", None))
+        elif func_name == "EOF":
+            if not values:
+                result = self.input.eof()
+            elif isinstance(values[0], PascalFile):
+                result = values[0].eof()
+            else:
+                result = values[0].input.eof()
+        elif func_name == "EOLN":
+            result = values[0].input.eoln() if values else self.input.eoln()
+        else:
+            result = None
+        self.stack.append(result)
+
+    def op_write(self, arg):
+        newline, fields, first_argument = arg
+        values = self.pop_values(sum(1 + has_width + has_precision for has_width, has_precision in fields))
+        output_target = self.output
+        if first_argument is not None and self.is_file_output_field(first_argument):
+            file_value = values[0]
+            if file_value.component_type is not None:
+                for record_value in values[1:]:
+                    file_value.write_record(record_value)
+                return
+            output_target = file_value.handle
+            values = values[1:]
+            fields = fields[1:]
+
+        parts = []
+        position = 0
+        for has_width, has_precision in fields:
+            value = values[position]
+            position += 1
+            width = None
+            if has_width:
+                width = values[position]
+                position += 1
+            if has_precision:
+                text = f"{float(value):.{values[position]}f}"
+                position += 1
+            else:
+                text = str(value)
+            if width is not None:
+                text = f"{text:>{width}}"
+            parts.append(text)
+        output_target.write("".join(parts))
+        if newline:
+            output_target.write('\n')
+
+        if self.debugger is not None and self.show_output():
+            self.debugger.notify_program_output()
+
+    def op_read_begin(self, arg):
+        if self.interactive_input:
+            self.show_output()
+        self.read_source = self.input
+        self.read_file = None
+
+    def op_read_is_file(self, argument):
+        self.stack.append(self.is_file_variable(argument))
+
+    def op_read_file_source(self, arg):
+        file_value = self.stack.pop()
+        if file_value.component_type is not None:
+            self.read_file = file_value
+        else:
+            self.read_source = file_value.input
+
+    def op_read_value(self, target):
+        if self.read_file is not None:
+            value = self.read_file.read_record()
+        else:
+            value = self.read_source.read_token()
+        self.stack.append(self.convert_input(value, self.variable_type(target)))
+
+    def op_read_end(self, readln):
+        if readln and self.read_file is None:
+            self.read_source.discard_line()
+        self.read_source = None
+        self.read_file = None
+
+    def op_file_method(self, arg):
+        method_name, count = arg
+        values = self.pop_values(count)
+        file_value = self.stack.pop()
+        getattr(file_value, method_name)(*values)
+
+    def op_new_pointer(self, referenced_type):
+        self.stack.append(PointerValue(self.initial_value(referenced_type)))
+
+    def op_dispose(self, arg):
+        pointer_value = self.stack.pop()
+        if pointer_value is not None:
+            pointer_value.disposed = True
+
+    def op_delete_string(self, arg):
+        value, start, count = self.pop_values(3)
+        index = max(start - 1, 0)
+        self.stack.append(value[:index] + value[index + count:])
+
+    def op_insert_string(self, arg):
+        source, value, start = self.pop_values(3)
+        index = min(max(start - 1, 0), len(value))
+        self.stack.append(value[:index] + source + value[index:])
+
+    def op_val_convert(self, target):
+        """Pop the text; push (0, converted, True) on success or (1, False) on failure."""
+        stack = self.stack
+        text = stack.pop().strip()
+        try:
+            if self.variable_type(target) == DataType.INTEGER:
+                converted = int(text)
+            else:
+                converted = float(text)
+        except ValueError:
+            stack.append(1)
+            stack.append(False)
+        else:
+            stack.append(0)
+            stack.append(converted)
+            stack.append(True)
+
+    def op_str(self, arg):
+        stack = self.stack
+        stack[-1] = str(stack[-1])
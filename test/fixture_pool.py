@@ -0,0 +1,70 @@
+"""Run the tests collected by run_tests.sh across a pool of worker processes.
+
+A test is sent to a worker as a small description (its module, class, and fixture file or test
+method) and rebuilt there. Every test runs in a fresh temporary working directory with empty
+standard input, so files a fixture leaves behind and input it does not declare cannot leak into
+the next test run by the same worker.
+"""
+import importlib
+import io
+import os
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+
+
+# tests handed to a worker at a time: small enough to keep the workers evenly loaded
+CHUNK_SIZE = 4
+
+
+def describe(test):
+    """A picklable description of test that rebuild() turns back into an equivalent test."""
+    test_class = type(test)
+    testfile = getattr(test, "testfile", None)
+    method = None if testfile is not None else test._testMethodName
+    return (test_class.__module__, test_class.__qualname__, testfile, method)
+
+
+def rebuild(description):
+    module_name, class_name, testfile, method = description
+    test_class = getattr(importlib.import_module(module_name), class_name)
+    if testfile is None:
+        return test_class(method)
+    test = test_class()
+    test.set_testfile(testfile)
+    return test
+
+
+def run_isolated(description):
+    """Run one test in its own temporary directory; returns (passed, seconds, failure reports)."""
+    test = rebuild(description)
+    result = unittest.TestResult()
+    original_stdin = sys.stdin
+    original_cwd = os.getcwd()
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            os.chdir(workdir)
+            sys.stdin = io.StringIO("")
+            test.run(result)
+        finally:
+            sys.stdin = original_stdin
+            os.chdir(original_cwd)
+    seconds = time.perf_counter() - start
+
+    reports = [
+        f"{kind}: {failed_test}\n{details}"
+        for kind, outcomes in (("FAIL", result.failures), ("ERROR", result.errors))
+        for failed_test, details in outcomes
+    ]
+    reports.extend(f"UNEXPECTED SUCCESS: {failed_test}" for failed_test in result.unexpectedSuccesses)
+    return (result.wasSuccessful(), seconds, reports)
+
+
+def run_parallel(tests, jobs):
+    """Run tests in jobs worker processes; returns one (passed, seconds, failure reports) per test, in order."""
+    descriptions = [describe(test) for test in tests]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(run_isolated, descriptions, chunksize=CHUNK_SIZE))
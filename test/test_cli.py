@@ -1,5 +1,7 @@
+import json
 import os
 import subprocess
+import tempfile
 import unittest
 from pathlib import Path
 
@@ -9,7 +11,7 @@ ROOT = Path(__file__).resolve().parents[1]
 
 class CLITestCase(unittest.TestCase):
 
-    def run_cli(self, *args, input_text=None):
+    def run_cli(self, *args, input_text=None, timeout=None):
         env = os.environ.copy()
         env["PYTHONPATH"] = f"{ROOT / 'src'}:{ROOT}{os.pathsep}{env.get('PYTHONPATH', '')}"
         return subprocess.run(
@@ -21,6 +23,7 @@ class CLITestCase(unittest.TestCase):
             stderr=subprocess.PIPE,
             env=env,
             check=False,
+            timeout=timeout,
         )
 
     def test_default_output_is_quiet(self):
@@ -30,6 +33,207 @@ class CLITestCase(unittest.TestCase):
         self.assertEqual(result.stdout, "25\n")
         self.assertEqual(result.stderr, "")
 
+    def test_closure_engine_matches_tree_output(self):
+        tree = self.run_cli("--engine", "tree", "test/test_files/programs/factorial.pas")
+        closure = self.run_cli("--engine", "closure", "test/test_files/programs/factorial.pas")
+
+        self.assertEqual(closure.returncode, 0)
+        self.assertEqual(closure.stdout, tree.stdout)
+        self.assertEqual(closure.stderr, "")
+
+    def test_vm_engine_matches_tree_output(self):
+        tree = self.run_cli("--engine", "tree", "test/test_files/programs/factorial.pas")
+        vm = self.run_cli("--engine", "vm", "test/test_files/programs/factorial.pas")
+
+        self.assertEqual(vm.returncode, 0)
+        self.assertEqual(vm.stdout, tree.stdout)
+        self.assertEqual(vm.stderr, "")
+
+    def test_python_engine_matches_tree_output(self):
+        tree = self.run_cli("--engine", "tree", "test/test_files/programs/factorial.pas")
+        python = self.run_cli("--engine", "python", "test/test_files/programs/factorial.pas")
+
+        self.assertEqual(python.returncode, 0)
+        self.assertEqual(python.stdout, tree.stdout)
+        self.assertEqual(python.stderr, "")
+
+    def test_no_optimize_matches_optimized_output(self):
+        optimized = self.run_cli("test/test_files/programs/constant_folding.pas")
+        unoptimized = self.run_cli("--no-optimize", "test/test_files/programs/constant_folding.pas")
+
+        self.assertEqual(unoptimized.returncode, 0)
+        self.assertEqual(unoptimized.stdout, optimized.stdout)
+        self.assertEqual(unoptimized.stderr, "")
+
+    def test_short_circuit_sets_default_evaluation(self):
+        for engine in ("tree", "closure", "vm", "python"):
+            with self.subTest(engine=engine):
+                complete = self.run_cli("--engine", engine, "test/test_files/programs/complete_evaluation.pas")
+                result = self.run_cli("--engine", engine, "--short-circuit",
+                                      "test/test_files/programs/complete_evaluation.pas")
+
+                self.assertEqual(complete.returncode, 1)
+                self.assertEqual(result.returncode, 0)
+                self.assertEqual(result.stdout, "6\n")
+                self.assertEqual(result.stderr, "")
+
+    def test_short_circuit_is_overridden_by_directives(self):
+        result = self.run_cli("--short-circuit", "test/test_files/programs/short_circuit.pas")
+
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, "6\n2\n6\n")
+
+    def test_unbuffered_output_matches_buffered_output(self):
+        buffered = self.run_cli("test/test_files/programs/factorial.pas")
+        unbuffered = self.run_cli("--output-buffer-size", "0", "test/test_files/programs/factorial.pas")
+
+        self.assertEqual(unbuffered.returncode, 0)
+        self.assertEqual(unbuffered.stdout, buffered.stdout)
+        self.assertEqual(unbuffered.stderr, "")
+
+    def test_output_written_before_runtime_error_is_kept(self):
+        result = self.run_cli("test/test_files/programs/output_before_runtime_error.pas")
+
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stdout, "1\n4\n9\n")
+        self.assertIn("PascalRuntimeError:", result.stderr)
+
+    def test_cache_dir_reuses_analyzed_program(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            first = self.run_cli("--verbose", "--cache-dir", cache_dir, "test/test_files/programs/factorial.pas")
+            second = self.run_cli("--verbose", "--cache-dir", cache_dir, "test/test_files/programs/factorial.pas")
+            entries = os.listdir(cache_dir)
+
+        self.assertEqual(second.returncode, 0)
+        self.assertEqual(second.stdout, first.stdout)
+        self.assertIn("Stored analyzed program in cache", first.stderr)
+        self.assertIn("Loaded analyzed program from cache", second.stderr)
+        self.assertNotIn("Parsing", second.stderr)
+        self.assertEqual(len(entries), 1)
+
+    def test_corrupt_cache_entry_is_replaced(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            expected = self.run_cli("--cache-dir", cache_dir, "test/test_files/programs/factorial.pas")
+            [entry] = os.listdir(cache_dir)
+            Path(cache_dir, entry).write_bytes(b"not a cache entry")
+            result = self.run_cli("--verbose", "--cache-dir", cache_dir, "test/test_files/programs/factorial.pas")
+
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, expected.stdout)
+        self.assertIn("Stored analyzed program in cache", result.stderr)
+
+    def test_cache_is_kept_under_max_size(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            result = self.run_cli("--cache-dir", cache_dir, "--cache-max-size", "1", "test/test_files/programs/factorial.pas")
+            entries = os.listdir(cache_dir)
+
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(entries, [])
+
+    def test_max_steps_stops_endless_loop(self):
+        result = self.run_cli("--max-steps", "500", "test/test_files/programs/limit_steps_endless_loop.pas", timeout=60)
+
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stdout, "")
+        self.assertIn("PascalRuntimeError: Step limit of 500 exceeded", result.stderr)
+        self.assertNotIn("Traceback", result.stderr)
+
+    def test_profile_writes_report_and_collapsed_stacks(self):
+        with tempfile.TemporaryDirectory() as profile_dir:
+            prefix = str(Path(profile_dir, "alpha"))
+            result = self.run_cli("--profile", prefix, "--engine", "vm", "test/test_files/programs/alpha.pas")
+            report = Path(prefix + ".txt").read_text()
+            stacks = Path(prefix + ".folded").read_text()
+
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, "30\n")
+        self.assertIn(f"Profile written to {prefix}.txt and {prefix}.folded", result.stderr)
+        self.assertRegex(report, r"\n +1 +[0-9.]+ +[0-9.]+ +[0-9.]+  ALPHA\n")
+        self.assertRegex(report, r"\n +6 +1 +[0-9.]+ +[0-9.]+    x := \(a \+ b\) \* 2;\n")
+        self.assertRegex(report, r"\n +4 {34}var x : integer;\n")
+        for line in stacks.splitlines():
+            self.assertRegex(line, r"^MAIN(;ALPHA)? [0-9]+$")
+
+    def test_profile_cannot_be_combined_with_debug(self):
+        result = self.run_cli("--profile", "unused", "--debug", "test/test_files/programs/alpha.pas")
+
+        self.assertEqual(result.returncode, 2)
+        self.assertIn("--profile cannot be combined with --judge or --debug", result.stderr)
+
+    def test_timings_json_goes_to_stderr(self):
+        result = self.run_cli("--timings", "--timings-format", "json", "test/test_files/programs/alpha.pas")
+        report = json.loads(result.stderr)
+
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, "30\n")
+        self.assertEqual([stage["stage"] for stage in report["stages"]],
+                         ["tokenize", "parse", "analyze", "optimize", "interpret", "output"])
+        self.assertEqual(report["steps"], 1)
+
+    def test_timings_reported_for_parser_failure(self):
+        result = self.run_cli("--timings", "test/test_files/programs/nestedscopes03.pas")
+
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("ParserError:", result.stderr)
+        self.assertRegex(result.stderr, r"\nparse +[0-9.]+ +[0-9]+\n")
+        self.assertNotIn("interpret", result.stderr)
+
+    def test_judge_reports_each_case(self):
+        result = self.run_cli(
+            "--judge", "test/test_files/judge/input_retry",
+            "--jobs", "2",
+            "test/test_files/programs/input_retry.pas",
+        )
+        summary = json.loads(result.stdout)
+        cases = {case["name"]: case for case in summary["cases"]}
+
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(sorted(cases), ["in_range", "retry", "unchecked", "wrong_answer"])
+        self.assertEqual((summary["passed"], summary["failed"], summary["unchecked"]), (2, 1, 1))
+        self.assertEqual(cases["retry"]["exitcode"], 0)
+        self.assertIs(cases["retry"]["passed"], True)
+        self.assertIsNone(cases["unchecked"]["passed"])
+        self.assertEqual(cases["unchecked"]["exitcode"], 0)
+        self.assertIs(cases["wrong_answer"]["passed"], False)
+        self.assertIs(cases["wrong_answer"]["stopped_early"], True)
+
+    def test_judge_stops_case_when_output_diverges(self):
+        result = self.run_cli(
+            "--judge", "test/test_files/judge/endless_output",
+            "test/test_files/judge/endless_output.pas",
+            timeout=60,
+        )
+        [case] = json.loads(result.stdout)["cases"]
+
+        self.assertEqual(result.returncode, 1)
+        self.assertIsNone(case["exitcode"])
+        self.assertIs(case["passed"], False)
+        self.assertIs(case["stopped_early"], True)
+
+    def test_judge_fails_cases_with_short_or_malformed_input(self):
+        result = self.run_cli(
+            "--judge", "test/test_files/judge/bad_input",
+            "test/test_files/programs/input_retry.pas",
+        )
+        summary = json.loads(result.stdout)
+        cases = {case["name"]: case for case in summary["cases"]}
+
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual((summary["passed"], summary["failed"], summary["unchecked"]), (1, 2, 0))
+        self.assertIs(cases["in_range"]["passed"], True)
+        self.assertIsNone(cases["in_range"]["error"])
+        self.assertEqual((cases["short"]["exitcode"], cases["short"]["passed"]), (1, False))
+        self.assertEqual(cases["short"]["error"], "EOFError: No more input")
+        self.assertEqual((cases["malformed"]["exitcode"], cases["malformed"]["passed"]), (1, False))
+        self.assertTrue(cases["malformed"]["error"].startswith("ValueError:"))
+
+    def test_judge_reports_compile_error(self):
+        result = self.run_cli("--judge", "test/test_files/judge/input_retry", "test/test_files/programs/nestedscopes03.pas")
+
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(result.stdout, "")
+        self.assertIn("ParserError:", result.stderr)
+
     def test_trace_tokens_goes_to_stderr(self):
         result = self.run_cli("--trace-tokens", "test/test_files/programs/writelntest.pas")
 
@@ -38,6 +242,15 @@ class CLITestCase(unittest.TestCase):
         self.assertIn("tokens", result.stderr)
         self.assertIn("Token(TokenType.PROGRAM", result.stderr)
 
+    def test_trace_tokens_stops_at_first_error(self):
+        result = self.run_cli("--trace-tokens", "test/test_files/programs/syntax_error_before_lexer_error.pas")
+
+        self.assertEqual(result.returncode, 1)
+        self.assertIn("Token(TokenType.INTEGER_CONST, 1", result.stderr)
+        self.assertIn("ParserError:", result.stderr)
+        self.assertNotIn("LexerError:", result.stderr)
+        self.assertNotIn("Token(TokenType.EOF", result.stderr)
+
     def test_parser_failure_returns_nonzero(self):
         result = self.run_cli("test/test_files/programs/nestedscopes03.pas")
 
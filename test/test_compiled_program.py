@@ -0,0 +1,261 @@
+import io
+import itertools
+import pickle
+import tempfile
+import unittest
+from pathlib import Path
+
+from pascal_interpreter.engines import ENGINES
+from pascal_interpreter.error_code import ParserError
+from pascal_interpreter.pascal import compile_program, run_program
+from pascal_interpreter.label_table import JUMP
+from pascal_interpreter.pascal_ast import AST, BinaryOp, UnaryOp, Compound, GotoStatement, slot_names
+from pascal_interpreter.profiler import Profiler
+from pascal_interpreter.timings import PhaseTimings
+
+
+ROOT = Path(__file__).resolve().parents[1]
+PROGRAMS_DIR = ROOT / "test" / "test_files" / "programs"
+
+
+def read_program(name):
+    return (PROGRAMS_DIR / name).read_text()
+
+
+def ast_nodes(tree):
+    """The AST nodes reachable from tree."""
+    nodes = {}
+    pending = [tree]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, AST) and id(value) not in nodes:
+            nodes[id(value)] = value
+            pending.extend(getattr(value, name, None) for name in slot_names(type(value)))
+    return list(nodes.values())
+
+
+def node_types(tree):
+    return {type(node).__name__ for node in ast_nodes(tree)}
+
+
+OPERATORS_PROGRAM = """
+program Operators;
+var
+   i, j : integer;
+   x : real;
+   s, t : set of 0..9;
+   done : boolean;
+begin
+   i := 7; j := 2; x := 1.5;
+   s := [1, 2, 3]; t := [3, 4];
+   done := not (i < j) and (i >= j) or (i = j);
+   writeln(i + j, ' ', i - j, ' ', i * j, ' ', i div j, ' ', i mod j, ' ', -i, ' ', +j);
+   writeln(x * x:0:2, ' ', x + x:0:2, ' ', i / j:0:2, ' ', -x:0:2);
+   writeln(3 in s + t, ' ', 3 in s - t, ' ', 4 in s * t, ' ', s <> t, ' ', i <= j, ' ', i > j, ' ', done);
+end.
+"""
+
+
+class CompiledProgramTestCase(unittest.TestCase):
+
+    def test_runs_with_different_inputs(self):
+        compiled = compile_program(read_program("input_retry.pas"))
+
+        for engine in sorted(ENGINES):
+            with self.subTest(engine=engine):
+                first = compiled.run(stdin="12\n7\n", engine=engine)
+                second = compiled.run(stdin="3\n", engine=engine)
+
+                self.assertEqual(first[2], 0)
+                self.assertEqual(first[0], {"NUMBER": 7})
+                self.assertTrue(first[1].endswith("Try again please, integer between 0 and 10\n7\n"))
+                self.assertEqual(second, ({"NUMBER": 3}, "Please enter an integer between 0 and 10\n3\n", 0))
+
+    def test_compiling_engines_compile_once(self):
+        compiled = compile_program(read_program("input_retry.pas"))
+
+        for engine in ("vm", "python"):
+            with self.subTest(engine=engine):
+                compiled.compiled_forms.clear()
+                compiled.run(stdin="3\n", engine=engine)
+                [first] = compiled.compiled_forms.values()
+                second = compiled.run(stdin="12\n7\n", engine=engine, max_steps=100)
+                compiled.run(stdin="4\n", engine=engine)
+
+                # a run counting steps compiles its own form, and the other runs share the first one
+                self.assertEqual(len(compiled.compiled_forms), 2)
+                self.assertIn(first, compiled.compiled_forms.values())
+                self.assertEqual(second, ({"NUMBER": 7}, "Please enter an integer between 0 and 10\n"
+                                          "Try again please, integer between 0 and 10\n7\n", 0))
+
+        copy = pickle.loads(pickle.dumps(compiled))
+        self.assertEqual(copy.compiled_forms, {})
+        self.assertEqual(copy.run(stdin="5\n", engine="python")[0], {"NUMBER": 5})
+
+    def test_stdin_accepts_a_stream(self):
+        compiled = compile_program(read_program("input_retry.pas"))
+
+        (memory, _, exitcode) = compiled.run(stdin=io.StringIO("4\n"))
+
+        self.assertEqual(exitcode, 0)
+        self.assertEqual(memory, {"NUMBER": 4})
+
+    def test_runtime_error_does_not_affect_next_run(self):
+        compiled = compile_program(read_program("output_before_runtime_error.pas"))
+
+        first = compiled.run()
+        second = compiled.run()
+
+        self.assertEqual(first, ({}, "109", 1))
+        self.assertEqual(second, first)
+
+    def test_files_are_opened_in_files_dir(self):
+        compiled = compile_program(read_program("file_source_relative_paths.pas"))
+
+        for value in (41, 99):
+            with tempfile.TemporaryDirectory() as files_dir:
+                Path(files_dir, "input.txt").write_text(f"{value}\n")
+                (_, output, exitcode) = compiled.run(files_dir=files_dir)
+                written = Path(files_dir, "nested", "output.txt").read_text()
+
+            self.assertEqual(exitcode, 0)
+            self.assertEqual(output, f"{value}\n")
+            self.assertEqual(written, f"{value + 1}\n")
+
+    def test_files_left_open_are_closed_after_run(self):
+        compiled = compile_program("\n".join([
+            "PROGRAM LeftOpen;",
+            "VAR f: TEXT;",
+            "BEGIN",
+            "  ASSIGN(f, 'left_open.txt');",
+            "  REWRITE(f);",
+            "  WRITELN(f, 42);",
+            "END.",
+        ]))
+
+        with tempfile.TemporaryDirectory() as files_dir:
+            (_, _, exitcode) = compiled.run(files_dir=files_dir, engine="python")
+            written = Path(files_dir, "left_open.txt").read_text()
+
+        self.assertEqual(exitcode, 0)
+        self.assertEqual(written, "42\n")
+
+    def test_output_stream_receives_program_output(self):
+        compiled = compile_program(read_program("factorial.pas"))
+        expected = compiled.run()[1]
+        stream = io.StringIO()
+
+        (_, output, exitcode) = compiled.run(output=stream)
+
+        self.assertEqual(exitcode, 0)
+        self.assertEqual(output, "")
+        self.assertEqual(stream.getvalue(), expected)
+
+    def test_compile_errors_are_raised(self):
+        with self.assertRaises(ParserError):
+            compile_program(read_program("nestedscopes03.pas"))
+
+    def test_profiler_counts_lines_and_routines(self):
+        compiled = compile_program(read_program("factorial.pas"))
+
+        for engine in sorted(ENGINES):
+            with self.subTest(engine=engine):
+                # a clock that advances one second per reading makes every event cost one second
+                seconds = itertools.count()
+                profiler = Profiler(clock=lambda: float(next(seconds)))
+                stacks = io.StringIO()
+
+                (_, output, exitcode) = compiled.run(engine=engine, profiler=profiler)
+                profiler.write_collapsed_stacks(stacks)
+
+                self.assertEqual((output, exitcode), ("24\n", 0))
+                self.assertEqual(profiler.line_hits, {12: 1, 6: 4, 8: 2})
+                self.assertEqual(profiler.routines, {"FACTORIAL": [1, 14.0, 3.0], "FACT": [3, 11.0, 11.0]})
+                self.assertEqual(stacks.getvalue(), "\n".join([
+                    "FACTORIAL 3000000",
+                    "FACTORIAL;FACT 4000000",
+                    "FACTORIAL;FACT;FACT 4000000",
+                    "FACTORIAL;FACT;FACT;FACT 3000000",
+                    "",
+                ]))
+
+    def test_profiler_closes_routines_of_stopped_run(self):
+        compiled = compile_program(read_program("limit_call_depth_recursion.pas"))
+        profiler = Profiler()
+
+        (_, output, exitcode) = compiled.run(profiler=profiler, max_call_depth=21)
+
+        self.assertEqual((output, exitcode), ("112", 1))
+        self.assertEqual(profiler.frames, [])
+        self.assertEqual({name: calls for name, (calls, _, _) in profiler.routines.items()},
+                         {"LIMITCALLDEPTHRECURSION": 1, "DEPTH": 42})
+
+    def test_timings_report_stages_and_counts(self):
+        for engine in sorted(ENGINES):
+            with self.subTest(engine=engine):
+                timings = PhaseTimings()
+                stream = io.StringIO()
+
+                (_, _, exitcode) = run_program(read_program("factorial.pas"), engine=engine, output=stream,
+                                               timings=timings)
+                report = timings.as_dict()
+
+                self.assertEqual((stream.getvalue(), exitcode), ("24\n", 0))
+                self.assertEqual([stage["stage"] for stage in report["stages"]],
+                                 ["tokenize", "parse", "analyze", "optimize", "interpret", "output"])
+                self.assertTrue(all(stage["seconds"] >= 0 for stage in report["stages"]))
+                self.assertTrue(all(stage["peak_bytes"] > 0 for stage in report["stages"][:-1]))
+                self.assertEqual((report["tokens"], report["ast_nodes"], report["steps"]), (49, 33, 3))
+
+    def test_timings_count_steps_of_run_stopped_by_step_limit(self):
+        for engine in sorted(ENGINES):
+            with self.subTest(engine=engine):
+                timings = PhaseTimings()
+
+                (_, _, exitcode) = run_program(read_program("limit_steps_endless_loop.pas"), engine=engine,
+                                               max_steps=3000, timings=timings)
+
+                self.assertEqual(exitcode, 1)
+                self.assertEqual(timings.as_dict()["steps"], 3001)
+
+    def test_operators_are_lowered_by_operand_type(self):
+        expected = "9 5 14 3 1 -7 2\n2.25 3.00 3.50 -1.50\nTrue False False True False True True\n"
+
+        for engine in sorted(ENGINES):
+            with self.subTest(engine=engine):
+                compiled = compile_program(OPERATORS_PROGRAM, engine=engine)
+                unoptimized = compile_program(OPERATORS_PROGRAM, engine=engine, optimize=False)
+
+                self.assertTrue({"Add", "Subtract", "Multiply", "RealDivide", "IntegerDivide", "Modulo", "Negate",
+                                 "Equal", "Less", "LessEqual", "Greater", "GreaterEqual", "NotEqual", "SetUnion",
+                                 "SetDifference", "SetIntersection", "SetMembership", "And", "Or", "Not"}
+                                <= node_types(compiled.tree))
+                self.assertFalse({"BinaryOp", "UnaryOp"} & node_types(compiled.tree))
+                self.assertEqual(compiled.run()[1:], (expected, 0))
+                self.assertEqual(unoptimized.run()[1:], (expected, 0))
+
+    def test_analyzer_records_operand_and_result_types(self):
+        compiled = compile_program(OPERATORS_PROGRAM, optimize=False)
+        operators = {}
+        for node in ast_nodes(compiled.tree):
+            if isinstance(node, (BinaryOp, UnaryOp)):
+                operators.setdefault(node.op.value, set()).add((node.operand_type.name, node.result_type.name))
+
+        self.assertEqual(operators["/"], {("INTEGER", "REAL")})
+        self.assertEqual(operators["<"], {("INTEGER", "BOOLEAN")})
+        self.assertEqual(operators["IN"], {("INTEGER", "BOOLEAN")})
+        self.assertEqual(operators["+"], {("INTEGER", "INTEGER"), ("REAL", "REAL"), ("SET", "SET")})
+        self.assertEqual(operators["NOT"], {("BOOLEAN", "BOOLEAN")})
+
+    def test_gotos_are_lowered_to_jumps(self):
+        compiled = compile_program(read_program("goto_jumps.pas"))
+        nodes = ast_nodes(compiled.tree)
+        tables = [node.table for node in nodes if isinstance(node, Compound) and node.table is not None]
+        jumps = {id(statement) for table in tables for operation, statement, _ in table.steps if operation == JUMP}
+        raised = sorted(node.label for node in nodes if isinstance(node, GotoStatement) and id(node) not in jumps)
+
+        self.assertEqual(len(tables), 3)
+        # the GOTO in the FOR loop, and the one leaving a compound with labels of its own, raise GotoSignal
+        self.assertEqual(raised, [4, 6])
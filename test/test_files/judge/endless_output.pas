@@ -0,0 +1,10 @@
+PROGRAM EndlessOutput;
+VAR count: INTEGER;
+BEGIN
+  count := 0;
+  WHILE TRUE DO
+  BEGIN
+    count := count + 1;
+    WRITELN(count);
+  END;
+END.
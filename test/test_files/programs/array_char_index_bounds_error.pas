@@ -0,0 +1,9 @@
+program ArrayCharIndexBoundsError;
+var
+   letters : array['a'..'e'] of integer;
+   c : char;
+begin
+   c := 'z';
+   letters[c] := 1;
+   writeln('unreachable');
+end.
@@ -0,0 +1,22 @@
+program ArrayOrdinalIndex;
+type
+   Color = (Red, Green, Blue);
+var
+   letters : array['a'..'e'] of integer;
+   counts : array[char] of integer;
+   shades : array[Color] of integer;
+   flags : array[boolean] of char;
+   i : integer;
+   k : Color;
+   total : integer;
+begin
+   for i := 0 to 4 do
+      letters[chr(ord('a') + i)] := i;
+   counts['x'] := 7;
+   for k := Red to Blue do
+      shades[k] := ord(k) * 10;
+   flags[false] := 'n';
+   flags[true] := 'y';
+   total := letters['e'] + counts['x'] + shades[Blue];
+   writeln(total, ' ', flags[3 > 2], flags[2 > 3]);
+end.
@@ -0,0 +1,54 @@
+program CaseDispatchTable;
+type
+   Color = (Red, Green, Blue, Black);
+var
+   i, total : integer;
+   hue : Color;
+   flag : boolean;
+   c : char;
+
+function Classify(n : integer) : integer;
+begin
+   case n of
+      5: Classify := 1;
+      0, 2, 4: Classify := 2;
+      10..20: Classify := 3;
+      1000..99999: Classify := 4;
+      100000..100000: Classify := 5;
+      9..7: Classify := 6
+   else
+      Classify := 0
+   end;
+end;
+
+begin
+   total := 0;
+   for i := -6 to 25 do
+      total := total * 3 mod 1000003 + Classify(i);
+   writeln(total);
+   writeln(Classify(999), Classify(1000), Classify(50000), Classify(99999), Classify(100000), Classify(100001), Classify(8));
+
+   for i := 0 to 5 do
+   begin
+      c := chr(ord('a') + i);
+      case c of
+         'a', 'c': write('x');
+         'd'..'e': write('y')
+      end
+   end;
+   writeln;
+
+   hue := Blue;
+   case hue of
+      Red: writeln('red');
+      Green..Blue: writeln('green or blue')
+   else
+      writeln('black')
+   end;
+
+   flag := false;
+   case flag of
+      true: writeln('yes');
+      false: writeln('no')
+   end;
+end.
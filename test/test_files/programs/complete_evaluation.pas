@@ -0,0 +1,14 @@
+program CompleteEvaluation;
+var
+   a : array[1..5] of integer;
+   i : integer;
+
+begin
+   for i := 1 to 5 do
+      a[i] := i * 2;
+   i := 1;
+   { without $B- both operands are evaluated, so the search reads a[6] }
+   while (i <= 5) and (a[i] <> 7) do
+      i := i + 1;
+   writeln(i);
+end.
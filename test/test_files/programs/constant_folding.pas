@@ -0,0 +1,26 @@
+PROGRAM ConstantFolding;
+CONST
+  Scale = 4;
+VAR
+  i, total, code : INTEGER;
+  circumference, radius : REAL;
+  c : CHAR;
+  lower : INTEGER;
+BEGIN
+  circumference := 0.0;
+  radius := 0.0;
+  FOR i := 1 TO 3 DO
+  BEGIN
+    radius := radius + 1.0;
+    circumference := circumference + 2.0 * PI * radius;
+  END;
+  total := SQR(Scale) + ORD('A') - MAXINT DIV 100 + -(3 * Scale);
+  c := CHR(ORD('a') + Scale - 1);
+  code := ORD(UPCASE(c));
+  lower := 0;
+  FOR i := 0 TO 9 DO
+    IF CHR(ORD('a') + i * 3) IN ['a'..'m', 'x'] THEN
+      lower := lower + 1;
+  WRITELN(TRUNC(circumference * 1000.0), ' ', total, ' ', c, ' ', code, ' ', lower);
+  WRITELN(c IN ['a'..'z'], ' ', SQRT(16.0):0:1, ' ', 7 MOD Scale = 3, ' ', NOT (Scale > 3));
+END.
@@ -0,0 +1,35 @@
+program FrameLocals;
+var
+   total : integer;
+   depth : integer;
+
+   function Sum(n : integer) : integer;
+   var
+      seen : array[1..3] of integer;
+      small : 0..9;
+      i : integer;
+   begin
+      for i := 1 to 3 do
+         seen[i] := n * i;
+      small := n;
+      if n > 1 then
+         Sum := seen[3] + Sum(n - 1) + seen[1]
+      else
+         Sum := seen[3] + seen[1] + small;
+   end;
+
+   procedure Count(var counter : integer; step : integer);
+   var
+      local : integer;
+   begin
+      local := counter + step;
+      counter := local;
+   end;
+
+begin
+   total := Sum(4);
+   depth := 0;
+   Count(depth, 5);
+   Count(depth, 7);
+   writeln(total, ' ', depth);
+end.
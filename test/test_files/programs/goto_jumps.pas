@@ -0,0 +1,92 @@
+program goto_jumps;
+
+label 1, 2, 3, 4, 5, 6, 7, 8, 9999;
+
+var i, j, total : Integer;
+
+procedure countdown(n : Integer);
+label 10, 20;
+begin
+10:
+  if n = 0 then
+    goto 20
+  else
+  begin
+    write(n);
+    n := n - 1
+  end;
+  goto 10;
+20:
+  writeln
+end;
+
+begin
+  { a loop written with a conditional GOTO back to a label }
+  i := 0;
+  total := 0;
+1:
+  i := i + 1;
+  total := total + i;
+  if i < 10 then
+    goto 1;
+  writeln(total);
+
+  { leaving a WHILE loop with a GOTO }
+  i := 0;
+  while True do
+  begin
+    i := i + 1;
+    if i * i > 50 then
+      goto 2
+  end;
+2:
+  writeln(i);
+
+  { leaving a REPEAT loop, and a GOTO from a nested compound statement }
+  i := 0;
+  repeat
+    i := i + 2;
+    begin
+      if i = 8 then
+        goto 3
+    end
+  until i > 100;
+3:
+  writeln(i);
+
+  { a GOTO out of a FOR loop }
+  total := 0;
+  for j := 1 to 100 do
+  begin
+    total := total + j;
+    if total > 20 then
+      goto 4
+  end;
+4:
+  writeln(j, ' ', total);
+
+  { a GOTO from a compound statement with labels of its own to the enclosing one }
+  i := 0;
+  begin
+  5:
+    i := i + 1;
+    if i < 3 then
+      goto 5;
+    if i = 3 then
+      goto 6;
+    writeln('not reached')
+  end;
+6:
+  writeln(i);
+
+  { forward jumps over statements }
+  goto 8;
+7:
+  writeln('seven');
+  goto 9999;
+8:
+  writeln('eight');
+  goto 7;
+9999:
+  countdown(5)
+end.
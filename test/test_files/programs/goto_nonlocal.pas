@@ -0,0 +1,66 @@
+program goto_nonlocal;
+
+label 1, 2, 99;
+
+var i, total : Integer;
+
+procedure search(k : Integer);
+begin
+  if k > 2 then
+    goto 99;
+  writeln('depth ', k);
+  search(k + 1);
+  writeln('not reached')
+end;
+
+function check(n : Integer) : Integer;
+begin
+  if n = 3 then
+    goto 1;
+  check := n * 10
+end;
+
+procedure outer;
+label 5;
+var count : Integer;
+
+  procedure leave;
+  begin
+    count := count + 1;
+    if count < 3 then
+      goto 5
+  end;
+
+begin
+  count := 0;
+5:
+  writeln('outer ', count);
+  if count < 3 then
+    leave
+end;
+
+begin
+  { a GOTO out of a recursive procedure to a label of the program }
+  search(1);
+  writeln('no');
+99:
+  writeln('yes');
+
+  { a GOTO out of a function called inside an expression, inside a FOR loop }
+  total := 0;
+  for i := 1 to 5 do
+    total := total + 100 + check(i);
+1:
+  writeln(i, ' ', total);
+
+  { a GOTO from a nested procedure to a label of the procedure enclosing it }
+  outer;
+
+  { the stack is still balanced: a FOR loop and calls after the jumps }
+  total := 0;
+  for i := 1 to 4 do
+    total := total + check(i mod 3);
+  goto 2;
+2:
+  writeln(total)
+end.
@@ -0,0 +1,22 @@
+program lexer_comments_and_quotes;
+(* a comment may mention f(x) or (y) before it ends *)
+var
+  quote : Char;
+  said : String;
+  shout : String;
+  total : Integer;
+  ratio : Real;
+  digits : array[1..3] of Integer;
+begin
+  { brace comments may span
+    more than one line }
+  quote := '''';
+  said := 'it''s a ""test""';
+  shout := "say ""hi"" to 'them'";
+  digits[1] := 10; digits[2] := 20; digits[3] := 30;
+  total := digits[1]+digits[2]*digits[3];(*no spaces around this comment*)total := total - 1;
+  ratio := 2.5*4.0;
+  writeln(quote, said);
+  writeln(shout);
+  writeln(total, ' ', ratio:0:1)
+end.
@@ -0,0 +1,43 @@
+program LexicalScope;
+var
+   x : integer;
+   answer : integer;
+
+   procedure Show;
+   begin
+      writeln(x);
+   end;
+
+   procedure Shadow;
+   var
+      x : integer;
+   begin
+      x := 99;
+      Show;
+   end;
+
+   function Outer(n : integer) : integer;
+   var
+      total : integer;
+
+      procedure Walk(k : integer);
+      begin
+         total := total + k;
+         if k > 1 then
+            Walk(k - 1);
+      end;
+
+   begin
+      total := 0;
+      Walk(n);
+      if n > 1 then
+         total := total + Outer(n - 1);
+      Outer := total;
+   end;
+
+begin
+   x := 1;
+   Shadow;
+   answer := Outer(4);
+   writeln(answer);
+end.
@@ -0,0 +1,17 @@
+PROGRAM LimitCallDepthRecursion;
+VAR result: INTEGER;
+
+FUNCTION Depth(n: INTEGER): INTEGER;
+BEGIN
+  IF n = 0 THEN
+    Depth := 0
+  ELSE
+    Depth := Depth(n - 1) + 1;
+END;
+
+BEGIN
+  result := Depth(20);
+  WRITELN(result);
+  result := Depth(21);
+  WRITELN(result);
+END.
@@ -0,0 +1,9 @@
+PROGRAM LimitStepsEndlessGoto;
+LABEL 1;
+VAR count: INTEGER;
+BEGIN
+  count := 0;
+1:
+  count := count + 1;
+  GOTO 1;
+END.
@@ -0,0 +1,7 @@
+PROGRAM LimitStepsEndlessLoop;
+VAR count: INTEGER;
+BEGIN
+  count := 0;
+  WHILE TRUE DO
+    count := count + 1;
+END.
@@ -0,0 +1,23 @@
+PROGRAM LimitStepsExact;
+{ 3 FOR iterations, 3 calls, 2 WHILE and 2 REPEAT iterations and 2 GOTOs: 12 steps }
+LABEL 1;
+VAR i, j, total: INTEGER;
+PROCEDURE Bump;
+BEGIN
+  total := total + 1;
+END;
+BEGIN
+  total := 0;
+  FOR i := 1 TO 3 DO
+    Bump;
+  j := 0;
+  WHILE j < 2 DO
+    j := j + 1;
+  REPEAT
+    j := j - 1;
+  UNTIL j = 0;
+1:
+  j := j + 1;
+  IF j < 3 THEN GOTO 1;
+  WRITELN(total, ' ', j);
+END.
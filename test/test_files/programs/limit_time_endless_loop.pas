@@ -0,0 +1,8 @@
+PROGRAM LimitTimeEndlessLoop;
+VAR count: INTEGER;
+BEGIN
+  count := 0;
+  REPEAT
+    count := count + 1;
+  UNTIL count < 0;
+END.
@@ -0,0 +1,25 @@
+program MultidimensionalArrayMixedIndex;
+type
+   Color = (Red, Green, Blue);
+var
+   board : array['a'..'c', 1..3] of integer;
+   cube : array[1..2, Color, boolean] of integer;
+   table : array[integer, 1..2] of integer;
+   i, j : integer;
+   k : Color;
+   total : integer;
+begin
+   for i := 0 to 2 do
+      for j := 1 to 3 do
+         board[chr(ord('a') + i), j] := i * 10 + j;
+   for i := 1 to 2 do
+      for k := Red to Blue do
+      begin
+         cube[i, k, false] := i * 100 + ord(k);
+         cube[i, k, true] := -(i * 100 + ord(k));
+      end;
+   table[-5, 2] := 7;
+   table[1000, 1] := 8;
+   total := board['c', 3] + cube[2, Blue, false] + cube[1, Green, true] + table[-5, 2] + table[1000, 1];
+   writeln(board['b', 2], ' ', cube[2, Blue, true], ' ', total);
+end.
@@ -0,0 +1,14 @@
+PROGRAM OutputBeforeRuntimeError;
+VAR
+  numbers: ARRAY[1..3] OF INTEGER;
+  i: INTEGER;
+BEGIN
+  FOR i := 1 TO 3 DO
+  BEGIN
+    numbers[i] := i * i;
+    WRITELN(numbers[i]);
+  END;
+  i := 4;
+  numbers[i] := 0;
+  WRITELN('unreachable');
+END.
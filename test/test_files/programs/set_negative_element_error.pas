@@ -0,0 +1,9 @@
+PROGRAM SetNegativeElementError;
+VAR
+  values: SET OF INTEGER;
+  low: INTEGER;
+BEGIN
+  low := -2;
+  values := [low..3];
+  WRITELN('unreachable');
+END.
@@ -0,0 +1,36 @@
+PROGRAM SetOrdinalTypes;
+TYPE
+  Color = (Red, Green, Blue, Yellow);
+VAR
+  warm, all, none: SET OF Color;
+  flags: SET OF BOOLEAN;
+  vowels, seen: SET OF CHAR;
+  c: CHAR;
+  i, count, low, high: INTEGER;
+  digits: SET OF 0..99;
+BEGIN
+  warm := [Red, Yellow];
+  all := [Red..Yellow];
+  none := [];
+  flags := [TRUE];
+  vowels := ['a', 'e', 'i', 'o', 'u'];
+  seen := [];
+  count := 0;
+  FOR i := 0 TO 39 DO
+  BEGIN
+    c := CHR(ORD('a') + (i * 7) MOD 30);
+    IF c IN vowels THEN
+      count := count + 1;
+    IF c IN ['a'..'z'] THEN
+      seen := seen + [c];
+  END;
+  low := 10;
+  high := 14;
+  digits := [low..high, 2 * high] - [12];
+
+  WRITELN(count, ' ', 'z' IN seen, ' ', '{' IN seen);
+  WRITELN(warm = [Yellow, Red], ' ', warm <> all, ' ', none = []);
+  WRITELN(Green IN all - warm, ' ', Green IN warm * all);
+  WRITELN(FALSE IN flags, ' ', TRUE IN flags);
+  WRITELN(12 IN digits, ' ', 28 IN digits, ' ', -1 IN digits, ' ', 500 IN digits);
+END.
@@ -0,0 +1,32 @@
+program ShortCircuit;
+var
+   a : array[1..5] of integer;
+   i, calls : integer;
+   found : boolean;
+
+function Touch(value : boolean) : boolean;
+begin
+   calls := calls + 1;
+   Touch := value;
+end;
+
+begin
+   for i := 1 to 5 do
+      a[i] := i * 2;
+   calls := 0;
+
+   {$B-}
+   i := 1;
+   { a[6] is never read: the bound check ends the search first }
+   while (i <= 5) and (a[i] <> 7) do
+      i := i + 1;
+   writeln(i);
+   found := Touch(false) and Touch(true);
+   found := Touch(true) or Touch(false);
+   writeln(calls);
+
+   {$B+}
+   found := Touch(false) and Touch(true);
+   found := Touch(true) or Touch(false);
+   writeln(calls);
+end.
@@ -0,0 +1,9 @@
+program syntax_error_before_lexer_error;
+
+var
+  count : integer;
+
+begin
+  count 1;
+  writeln('unterminated);
+end.
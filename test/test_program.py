@@ -7,6 +7,7 @@ import tempfile
 from pathlib import Path
 
 from pascal_interpreter.pascal_tester import run_program
+from pascal_interpreter.engines import DEFAULT_ENGINE
 
 
 def is_verbose():
@@ -14,6 +15,7 @@ def is_verbose():
 
 
 class ProgramTestCase(unittest.TestCase):
+    engine = DEFAULT_ENGINE
 
     def set_testfile(self, testfile):
         self.testfile = testfile
@@ -41,6 +43,7 @@ class ProgramTestCase(unittest.TestCase):
             expected_files = expect.get("expected_files", {})
             missing_files = expect.get("missing_files", [])
             source_dir = expect.get("source_dir")
+            limits = expect.get("limits", {})
 
             verbose = is_verbose()
             original_stdin = sys.stdin
@@ -63,7 +66,14 @@ class ProgramTestCase(unittest.TestCase):
                     source_path.parent.mkdir(parents=True, exist_ok=True)
                     source_path.write_text(prog)
                     source_name = str(source_path)
-                (memory, output, exitcode) = run_program(prog, trace_tokens=verbose, verbose=verbose, source_name=source_name)
+                (memory, output, exitcode) = run_program(
+                    prog,
+                    trace_tokens=verbose,
+                    verbose=verbose,
+                    source_name=source_name,
+                    engine=self.engine,
+                    **limits,
+                )
                 actual_files = {}
                 for name in expected_files:
                     actual_files[name] = Path(name).read_text()
@@ -90,3 +100,15 @@ class ProgramTestCase(unittest.TestCase):
             assert exitcode == expectexitcode, f"exitcode {exitcode} does not match {expectexitcode} for {self.testfile}"
             if verbose:
                 print(self.testfile, "Passed")
+
+
+class ClosureProgramTestCase(ProgramTestCase):
+    engine = "closure"
+
+
+class VMProgramTestCase(ProgramTestCase):
+    engine = "vm"
+
+
+class TranspiledProgramTestCase(ProgramTestCase):
+    engine = "python"